@@ -1,20 +1,24 @@
 # app.py - VERSIÓN PARA DOCKER
+import os
 import dash
 from dash import dcc, html, Input, Output, callback
 import warnings
 warnings.filterwarnings('ignore')
 
 # -------------------------
-# INICIALIZAR DATOS PRIMERO
+# INICIALIZAR DATOS EN SEGUNDO PLANO
 # -------------------------
-from utils.data_loader import initialize_data
-print("🔄 Inicializando datos...")
-initialize_data()
-print("✅ Datos inicializados correctamente")
+# El servidor atiende de inmediato; las páginas muestran un aviso de carga
+# hasta que los datos estén listos (ver get_data_status). Con gunicorn la
+# carga se difiere a cada worker (post_fork en gunicorn.conf.py)
+from utils.data_loader import (
+    start_background_initialization, get_data_status,
+    DATA_STATUS_READY, DATA_STATUS_FAILED
+)
+if os.environ.get('DATA_INIT_DEFERRED', 'false').lower() != 'true':
+    start_background_initialization()
 
-# -------------------------
-# IMPORTAR PÁGINAS DESPUÉS de inicializar datos
-# -------------------------
+# Las páginas no acceden a los datos al importarse
 from pages import (
     summary, univariate, timeseries, conclusions, prophet, desarrollo, missing
 )
@@ -29,6 +33,9 @@ app = dash.Dash(
 )
 app.title = "EDA PRSA - Análisis de Calidad del Aire"
 
+# Servidor WSGI para gunicorn (gunicorn -c gunicorn.conf.py app:server)
+server = app.server
+
 # Layout principal con tema oscuro
 app.layout = html.Div([
     # Header
@@ -97,6 +104,9 @@ app.layout = html.Div([
         ),
     ], style={'backgroundColor': '#0f1720', 'padding': '0px 20px'}),
     
+    # Sondeo del estado de carga (se desactiva cuando los datos están listos)
+    dcc.Interval(id='data-status-interval', interval=1000, n_intervals=0),
+    
     # Contenido de las pestañas
     html.Div(
         id='tab-content', 
@@ -109,25 +119,48 @@ app.layout = html.Div([
     )
 ], style={'backgroundColor': '#0f1720', 'minHeight': '100vh'})
 
+PAGES = {
+    'tab-summary': summary,
+    'tab-desarrollo': desarrollo,
+    'tab-univariate': univariate,
+    'tab-timeseries': timeseries,
+    'tab-prophet': prophet,
+    'tab-conclusions': conclusions,
+}
+
+def loading_layout(status):
+    """Contenido provisional mientras los datos se cargan (o si la carga falló)"""
+    if status['state'] == DATA_STATUS_FAILED:
+        return html.Div([
+            html.H3("❌ No se pudieron cargar los datos", style={'color': '#ef4444'}),
+            html.P(status['error'] or "Error desconocido", style={'color': '#94a3b8'}),
+        ], style={'textAlign': 'center', 'marginTop': '60px'})
+    
+    elapsed = status['elapsed'] or 0
+    return html.Div([
+        html.H3("⏳ Cargando datos...", style={'color': '#ffffff'}),
+        html.P(f"Preparando el dataset ({elapsed:.0f} s). La página se actualizará automáticamente.",
+               style={'color': '#94a3b8'}),
+    ], style={'textAlign': 'center', 'marginTop': '60px'})
+
 # Callback principal para cambiar pestañas
 @app.callback(
-    Output('tab-content', 'children'),
-    Input('main-tabs', 'value')
+    [Output('tab-content', 'children'),
+     Output('data-status-interval', 'disabled')],
+    [Input('main-tabs', 'value'),
+     Input('data-status-interval', 'n_intervals')]
 )
-def render_content(tab):
-    if tab == 'tab-summary':
-        return summary.layout
-    elif tab == 'tab-desarrollo':
-        return desarrollo.layout
-    elif tab == 'tab-univariate':
-        return univariate.layout
-    elif tab == 'tab-timeseries':
-        return timeseries.layout
-    elif tab == 'tab-prophet':
-        return prophet.layout
-    elif tab == 'tab-conclusions':
-        return conclusions.layout
-    return html.Div("Selecciona una pestaña")
+def render_content(tab, n_intervals):
+    status = get_data_status()
+    if status['state'] != DATA_STATUS_READY:
+        # Seguir sondeando solo mientras la carga está en curso
+        return loading_layout(status), status['state'] == DATA_STATUS_FAILED
+    
+    page = PAGES.get(tab)
+    if page is None:
+        return html.Div("Selecciona una pestaña"), True
+    # Las páginas con datos exponen layout como función (se construye al mostrarse)
+    return (page.layout() if callable(page.layout) else page.layout), True
 
 # Registrar callbacks de cada página
 summary.register_callbacks(app)
@@ -0,0 +1,33 @@
+# gunicorn.conf.py - Configuración para producción
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8050)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Importar la app una sola vez en el proceso maestro (módulos compartidos por
+# copy-on-write), pero sin cargar los datos allí: un hilo de carga iniciado
+# antes del fork no existe en los workers y cada uno la relanzaría (N + 1
+# cargas). Cada worker carga los datos tras el fork desde el snapshot local,
+# mapeado en memoria, así que el sistema comparte esas páginas entre workers.
+os.environ.setdefault('DATA_INIT_DEFERRED', 'true')
+preload_app = True
+
+
+def post_fork(server, worker):
+    from utils import data_loader
+    from utils.snapshot import try_process_lock
+    # Un solo worker precalcula ADF/KPSS y descomposiciones: el que tiene el
+    # bloqueo. Si ese worker se recicla o muere, el sistema libera el bloqueo
+    # y lo toma su reemplazo. Los demás leen los resultados del snapshot o
+    # los calculan bajo demanda
+    worker.precompute_lock = try_process_lock('analysis-precompute')
+    if worker.precompute_lock is None:
+        data_loader.ANALYSIS_PRECOMPUTE = False
+    data_loader.start_background_initialization()
+
+
+def worker_exit(server, worker):
+    from utils import data_loader
+    # Cancelar los análisis en curso para no superar graceful_timeout
+    data_loader.shutdown_analysis_pool()
@@ -4,9 +4,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 from utils.data_loader import get_data
-
-# Obtener datos
-df_original, df_imputed, analysis_cols = get_data()
+from utils.figure_cache import cached_callback, uncached
 
 # Layout de análisis bivariado
 layout = html.Div([
@@ -33,6 +31,8 @@ layout = html.Div([
 
 def render_scatter_plots():
     """Pestaña de scatter plots"""
+    df_original, df_imputed, analysis_cols = get_data()
+    
     return html.Div([
         html.H3("📊 Análisis de Dispersión", style={'color': '#ffffff'}),
         html.P("Explora las relaciones entre dos variables:"),
@@ -149,6 +149,7 @@ def register_callbacks(app):
          Input('bivariate-y', 'value'),
          Input('bivariate-type', 'value')]
     )
+    @cached_callback('update_bivariate')
     def update_bivariate(x, y, plot_type):
         if not x or not y:
             return {}, ""
@@ -234,6 +235,7 @@ def register_callbacks(app):
         [Input('correlation-vars-selector', 'value'),
          Input('correlation-method', 'value')]
     )
+    @cached_callback('update_correlation_matrix')
     def update_correlation_matrix(selected_vars, method):
         if not selected_vars or len(selected_vars) < 2:
             empty_fig = go.Figure()
@@ -331,4 +333,4 @@ def register_callbacks(app):
                 font_color='white',
                 height=400
             )
-            return error_fig, ""
\ No newline at end of file
+            return uncached(error_fig, "")
\ No newline at end of file
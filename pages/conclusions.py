@@ -2,125 +2,126 @@
 from dash import dcc, html
 from utils.data_loader import get_data
 
-# Obtener datos para el resumen
-df_original, df_imputed, analysis_cols = get_data()
-
-# Layout de conclusiones
-layout = html.Div([
-    html.H2("📋 Conclusiones del Análisis y Modelado Predictivo", 
-            style={'color': '#ffffff', 'marginBottom': '20px'}),
+# Layout de conclusiones (se construye al mostrar la pestaña)
+def layout():
+    # Obtener datos para el resumen
+    df_original, df_imputed, analysis_cols = get_data()
+    
+    return html.Div([
+        html.H2("📋 Conclusiones del Análisis y Modelado Predictivo", 
+                style={'color': '#ffffff', 'marginBottom': '20px'}),
     
-    html.Div([
-        dcc.Markdown("""
-        ## Resumen Ejecutivo
-
-        Este proyecto implementó un modelo de forecasting univariado utilizando Facebook Prophet para predecir 
-        concentraciones horarias de PM2.5 en la estación Dongsi de Beijing (Marzo 2013 - Febrero 2017). 
-        El enfoque se centró en capturar patrones temporales y desarrollar capacidades predictivas robustas.
-        """, style={'color': '#ffffff', 'lineHeight': '1.6'}),
+        html.Div([
+            dcc.Markdown("""
+            ## Resumen Ejecutivo
+
+            Este proyecto implementó un modelo de forecasting univariado utilizando Facebook Prophet para predecir 
+            concentraciones horarias de PM2.5 en la estación Dongsi de Beijing (Marzo 2013 - Febrero 2017). 
+            El enfoque se centró en capturar patrones temporales y desarrollar capacidades predictivas robustas.
+            """, style={'color': '#ffffff', 'lineHeight': '1.6'}),
         
-        html.Ul([
-            html.Li(f"Período analizado: {df_original['datetime'].min().strftime('%Y-%m-%d') if 'datetime' in df_original.columns else 'N/A'} a {df_original['datetime'].max().strftime('%Y-%m-%d') if 'datetime' in df_original.columns else 'N/A'}"),
-            html.Li(f"Total de observaciones: {len(df_original):,}"),
-            html.Li("Variable objetivo: PM2.5 (concentraciones horarias)"),
-            html.Li("Modelo: Facebook Prophet (enfoque univariado)"),
-            html.Li("División temporal: 80% entrenamiento (2013-2015), 20% prueba (2016-2017)"),
-        ], style={'color': '#e2e8f0', 'marginBottom': '20px'}),
+            html.Ul([
+                html.Li(f"Período analizado: {df_original['datetime'].min().strftime('%Y-%m-%d') if 'datetime' in df_original.columns else 'N/A'} a {df_original['datetime'].max().strftime('%Y-%m-%d') if 'datetime' in df_original.columns else 'N/A'}"),
+                html.Li(f"Total de observaciones: {len(df_original):,}"),
+                html.Li("Variable objetivo: PM2.5 (concentraciones horarias)"),
+                html.Li("Modelo: Facebook Prophet (enfoque univariado)"),
+                html.Li("División temporal: 80% entrenamiento (2013-2015), 20% prueba (2016-2017)"),
+            ], style={'color': '#e2e8f0', 'marginBottom': '20px'}),
         
-        dcc.Markdown("""
-        ##  Hallazgos Principales
-
-        ### 1. Patrones Temporales Identificados
-        - **Estacionalidad anual marcada**: Niveles más altos de PM2.5 en invierno debido a condiciones meteorológicas y calefacción
-        - **Patrón semanal claro**: Reducción los fines de semana por menor actividad industrial y vehicular
-        - **Ciclo diario evidente**: Picos en horas de mayor actividad humana y tráfico
-        - **Tendencia decreciente**: Posible efecto de políticas ambientales implementadas en Beijing
-
-        ### 2. Efectividad del Modelo Prophet
-        - **Captura adecuada de estacionalidades**: El modelo identificó correctamente patrones diarios, semanales y anuales
-        - **Transformación logarítmica exitosa**: Mejoró la estabilidad del modelo al manejar la asimetría en la distribución de PM2.5
-        - **Changepoints conservadores**: Configuración con prior scale 0.01 evitó sobreajuste y produjo transiciones suaves
-        - **Validación cruzada robusta**: Evaluación temporal con rolling origin proporcionó métricas confiables
-
-        ### 3. Performance Predictiva
-        - **Métricas consistentes**: MSE, RMSE y SMAPE mostraron performance estable en diferentes horizontes
-        - **Capacidad de generalización**: Buen rendimiento en datos de prueba no vistos
-        - **Intervalos de confianza útiles**: Proporcionaron rango probable para la toma de decisiones
-        """, style={'color': '#e2e8f0', 'lineHeight': '1.6'}),
-
-        dcc.Markdown("""
-        ## Configuración Técnica Exitosa
-
-        ### Preprocesamiento Optimizado
-        - **Transformación logarítmica**: Critical para manejar la distribución asimétrica de PM2.5
-        - **Imputación con mediana**: Preservó la estructura temporal de los datos
-        - **División temporal**: Respetó la naturaleza secuencial de la serie temporal
-
-        ### Hyperparámetros de Prophet
-        - **changepoint_prior_scale=0.01**: Balance óptimo entre flexibilidad y generalización
-        - **Estacionalidades múltiples**: Captura automática de patrones diarios, semanales y anuales
-        - **Crecimiento logístico**: Adecuado para series con posibles límites superiores
-
-        ### Validación Cruzada
-        - **initial='365 days'**: Período inicial suficiente para capturar estacionalidad anual
-        - **period='90 days'**: Espaciado apropiado entre cortes de validación
-        - **horizon='180 days'**: Horizonte de predicción relevante para planificación
-        """, style={'color': '#e2e8f0', 'lineHeight': '1.6'}),
-
-        dcc.Markdown("""
-        ## Limitaciones y Desafíos
-
-        ### Restricciones del Enfoque Univariado
-        - **Variables meteorológicas excluidas**: Temperatura, presión y viento no incorporadas como regresores
-        - **Eventos externos no considerados**: Festivales, políticas ambientales puntuales, lockdowns
-        - **Patrones espaciales ignorados**: Transporte de contaminación desde regiones vecinas
-
-        ### Limitaciones Técnicas
-        - **Recursos computacionales**: Validación cruzada extensiva requirió optimización de parámetros
-        - **Complejidad no lineal**: Algunos patrones complejos pueden requerir modelos más sofisticados
-        - **Episodios extremos**: Eventos de contaminación severa más difíciles de predecir con precisión
-        """, style={'color': '#e2e8f0', 'lineHeight': '1.6'}),
-
-        dcc.Markdown("""
-        ##  Mejoras Futuras y Extensiones
-
-        ### Mejoras Inmediatas al Modelo
-        - **Incorporar regresores externos**: Variables meteorológicas como temperatura, humedad, velocidad del viento
-        - **Efectos de festivos**: Especificar días festivos chinos que afectan patrones de contaminación
-        - **Ajuste fino de hiperparámetros**: Búsqueda en grid para optimizar seasonality_prior_scale y otros parámetros
-
-        ### Extensiones del Análisis
-        - **Modelado multivariado**: Incluir múltiples estaciones para análisis espacial-temporal
-        - **Ensemble methods**: Combinar Prophet con otros modelos (LSTM, XGBoost) para mejorar performance
-        - **Análisis de intervención**: Evaluar impacto de políticas ambientales específicas
-        - **Sistema de alerta temprana**: Implementar detección de episodios críticos de contaminación
-
-        ### Aplicaciones Prácticas
-        - **Planificación urbana**: Informar políticas de reducción de emisiones
-        - **Salud pública**: Alertas para poblaciones sensibles durante episodios de alta contaminación
-        - **Educación ambiental**: Herramientas visuales para concienciación pública
-        """, style={'color': '#e2e8f0', 'lineHeight': '1.6'}),
-
-        dcc.Markdown("""
-        ##  Valor del Enfoque Prophet
-
-        El uso de Facebook Prophet demostró ser particularmente adecuado para este caso de uso debido a:
-        - **Manejo automático de estacionalidades múltiples**
-        - **Robustez frente a datos faltantes y outliers**
-        - **Interpretabilidad de componentes (tendencia, estacionalidad)**
-        - **Validación cruzada temporal integrada**
-        - **Rápida implementación y ajuste**
-
-        Este proyecto establece una base sólida para sistemas de predicción de calidad del aire 
-        que pueden escalarse e integrarse con fuentes de datos adicionales.
-        """, style={'color': '#e2e8f0', 'lineHeight': '1.6'})
-    ], style={
-        'backgroundColor': '#1e293b', 
-        'padding': '30px', 
-        'borderRadius': '10px',
-        'border': '1px solid #334155'
-    })
-])
+            dcc.Markdown("""
+            ##  Hallazgos Principales
+
+            ### 1. Patrones Temporales Identificados
+            - **Estacionalidad anual marcada**: Niveles más altos de PM2.5 en invierno debido a condiciones meteorológicas y calefacción
+            - **Patrón semanal claro**: Reducción los fines de semana por menor actividad industrial y vehicular
+            - **Ciclo diario evidente**: Picos en horas de mayor actividad humana y tráfico
+            - **Tendencia decreciente**: Posible efecto de políticas ambientales implementadas en Beijing
+
+            ### 2. Efectividad del Modelo Prophet
+            - **Captura adecuada de estacionalidades**: El modelo identificó correctamente patrones diarios, semanales y anuales
+            - **Transformación logarítmica exitosa**: Mejoró la estabilidad del modelo al manejar la asimetría en la distribución de PM2.5
+            - **Changepoints conservadores**: Configuración con prior scale 0.01 evitó sobreajuste y produjo transiciones suaves
+            - **Validación cruzada robusta**: Evaluación temporal con rolling origin proporcionó métricas confiables
+
+            ### 3. Performance Predictiva
+            - **Métricas consistentes**: MSE, RMSE y SMAPE mostraron performance estable en diferentes horizontes
+            - **Capacidad de generalización**: Buen rendimiento en datos de prueba no vistos
+            - **Intervalos de confianza útiles**: Proporcionaron rango probable para la toma de decisiones
+            """, style={'color': '#e2e8f0', 'lineHeight': '1.6'}),
+
+            dcc.Markdown("""
+            ## Configuración Técnica Exitosa
+
+            ### Preprocesamiento Optimizado
+            - **Transformación logarítmica**: Critical para manejar la distribución asimétrica de PM2.5
+            - **Imputación con mediana**: Preservó la estructura temporal de los datos
+            - **División temporal**: Respetó la naturaleza secuencial de la serie temporal
+
+            ### Hyperparámetros de Prophet
+            - **changepoint_prior_scale=0.01**: Balance óptimo entre flexibilidad y generalización
+            - **Estacionalidades múltiples**: Captura automática de patrones diarios, semanales y anuales
+            - **Crecimiento logístico**: Adecuado para series con posibles límites superiores
+
+            ### Validación Cruzada
+            - **initial='365 days'**: Período inicial suficiente para capturar estacionalidad anual
+            - **period='90 days'**: Espaciado apropiado entre cortes de validación
+            - **horizon='180 days'**: Horizonte de predicción relevante para planificación
+            """, style={'color': '#e2e8f0', 'lineHeight': '1.6'}),
+
+            dcc.Markdown("""
+            ## Limitaciones y Desafíos
+
+            ### Restricciones del Enfoque Univariado
+            - **Variables meteorológicas excluidas**: Temperatura, presión y viento no incorporadas como regresores
+            - **Eventos externos no considerados**: Festivales, políticas ambientales puntuales, lockdowns
+            - **Patrones espaciales ignorados**: Transporte de contaminación desde regiones vecinas
+
+            ### Limitaciones Técnicas
+            - **Recursos computacionales**: Validación cruzada extensiva requirió optimización de parámetros
+            - **Complejidad no lineal**: Algunos patrones complejos pueden requerir modelos más sofisticados
+            - **Episodios extremos**: Eventos de contaminación severa más difíciles de predecir con precisión
+            """, style={'color': '#e2e8f0', 'lineHeight': '1.6'}),
+
+            dcc.Markdown("""
+            ##  Mejoras Futuras y Extensiones
+
+            ### Mejoras Inmediatas al Modelo
+            - **Incorporar regresores externos**: Variables meteorológicas como temperatura, humedad, velocidad del viento
+            - **Efectos de festivos**: Especificar días festivos chinos que afectan patrones de contaminación
+            - **Ajuste fino de hiperparámetros**: Búsqueda en grid para optimizar seasonality_prior_scale y otros parámetros
+
+            ### Extensiones del Análisis
+            - **Modelado multivariado**: Incluir múltiples estaciones para análisis espacial-temporal
+            - **Ensemble methods**: Combinar Prophet con otros modelos (LSTM, XGBoost) para mejorar performance
+            - **Análisis de intervención**: Evaluar impacto de políticas ambientales específicas
+            - **Sistema de alerta temprana**: Implementar detección de episodios críticos de contaminación
+
+            ### Aplicaciones Prácticas
+            - **Planificación urbana**: Informar políticas de reducción de emisiones
+            - **Salud pública**: Alertas para poblaciones sensibles durante episodios de alta contaminación
+            - **Educación ambiental**: Herramientas visuales para concienciación pública
+            """, style={'color': '#e2e8f0', 'lineHeight': '1.6'}),
+
+            dcc.Markdown("""
+            ##  Valor del Enfoque Prophet
+
+            El uso de Facebook Prophet demostró ser particularmente adecuado para este caso de uso debido a:
+            - **Manejo automático de estacionalidades múltiples**
+            - **Robustez frente a datos faltantes y outliers**
+            - **Interpretabilidad de componentes (tendencia, estacionalidad)**
+            - **Validación cruzada temporal integrada**
+            - **Rápida implementación y ajuste**
+
+            Este proyecto establece una base sólida para sistemas de predicción de calidad del aire 
+            que pueden escalarse e integrarse con fuentes de datos adicionales.
+            """, style={'color': '#e2e8f0', 'lineHeight': '1.6'})
+        ], style={
+            'backgroundColor': '#1e293b', 
+            'padding': '30px', 
+            'borderRadius': '10px',
+            'border': '1px solid #334155'
+        })
+    ])
 
 def register_callbacks(app):
     # No se necesitan callbacks para las conclusiones
@@ -2,11 +2,6 @@
 from dash import dcc, html, dash_table
 import plotly.express as px
 import pandas as pd
-from utils.data_loader import get_missing_analysis, get_ks_test_results
-
-# Obtener análisis de faltantes
-miss_before, miss_after, types = get_missing_analysis()
-ks_results = get_ks_test_results()
 
 # Layout de la pestaña de valores faltantes
 layout = html.Div([
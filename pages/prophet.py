@@ -5,7 +5,11 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 import os
+import threading
 from utils.database import load_table
+from utils.data_loader import get_data, get_resampled
+from utils.downsampling import downsample_series
+from utils.figure_cache import cached_callback, uncached
 
 def load_from_postgres(table_name):
     """Cargar datos desde PostgreSQL"""
@@ -18,17 +22,45 @@ def load_from_postgres(table_name):
         print(f"❌ Error cargando {table_name}: {e}")
         return None
 
-# Cargar los DataFrames desde PostgreSQL
-pred_df = load_from_postgres('pred')
-df_cv = load_from_postgres('df_cv')
-df_p = load_from_postgres('df_p')
+# DataFrames del modelo, cargados desde PostgreSQL al primer uso
+PROPHET_TABLES = ('pred', 'df_cv', 'df_p')
+_tables = {}
+_tables_lock = threading.Lock()
 
-from utils.data_loader import get_data
-df_original, df_imputed, analysis_cols = get_data()
+def _is_missing(df):
+    return df is None or getattr(df, 'empty', True)
+
+def get_prophet_tables():
+    """Retorna (pred_df, df_cv, df_p), cargándolos una sola vez por proceso
+
+    Solo se guardan las tablas que cargaron: una que faltó (error de la BD)
+    se vuelve a intentar en la siguiente llamada.
+    """
+    with _tables_lock:
+        for name in PROPHET_TABLES:
+            if _is_missing(_tables.get(name)):
+                df = load_from_postgres(name)
+                if not _is_missing(df):
+                    _tables[name] = df
+        return tuple(_tables.get(name) for name in PROPHET_TABLES)
+
+def prophet_tables_complete():
+    """True si las tres tablas del modelo están cargadas"""
+    return not any(_is_missing(_tables.get(name)) for name in PROPHET_TABLES)
+
+
+def _plot_points(series):
+    """Puntos a graficar: serie reducida (pirámide + LTTB) si el índice es datetime"""
+    if isinstance(series.index, pd.DatetimeIndex):
+        x, y, _ = downsample_series(series)
+        return x, y
+    return series.index, series
 
 
 # --- Figura: Predicción vs Actual (igual que en el notebook) ---
 def make_forecast_figure(agg='hourly'):
+    pred_df, _, _ = get_prophet_tables()
+    _, df_imputed, _ = get_data()
     if pred_df is None or getattr(pred_df, 'empty', True):
         return px.line(title='No se encontró `pred.pkl`')
 
@@ -54,20 +86,24 @@ def make_forecast_figure(agg='hourly'):
         p = p.resample('D').mean()
 
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=p.index, y=p[pred_col], mode='lines', name='Predicción', line=dict(color='#f59e0b')))
+    x, y = _plot_points(p[pred_col])
+    fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Predicción', line=dict(color='#f59e0b')))
 
     # Si hay datos reales, superponer (resample si daily)
     if df_imputed is not None and not getattr(df_imputed, 'empty', True):
         candidates = [c for c in df_imputed.columns if 'pm2' in c]
         if candidates:
             col = candidates[0]
-            dff = df_imputed.set_index('datetime') if 'datetime' in df_imputed.columns else df_imputed.set_index(df_imputed.columns[0])
-            dff.index = pd.to_datetime(dff.index, errors='coerce')
-            if agg == 'daily':
-                dff_plot = dff[[col]].resample('D').mean()
-            else:
-                dff_plot = dff[[col]]
-            fig.add_trace(go.Scatter(x=dff_plot.index, y=dff_plot[col], mode='lines', name='Actual', line=dict(color='#3b82f6')))
+            # Diario: medias compartidas calculadas al cargar los datos
+            actual = get_resampled('daily', col) if agg == 'daily' else None
+            if actual is None:
+                dff = df_imputed.set_index('datetime') if 'datetime' in df_imputed.columns else df_imputed.set_index(df_imputed.columns[0])
+                dff.index = pd.to_datetime(dff.index, errors='coerce')
+                actual = dff[col]
+                if agg == 'daily':
+                    actual = actual.resample('D').mean()
+            x, y = _plot_points(actual)
+            fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Actual', line=dict(color='#3b82f6')))
 
     fig.update_layout(title=f'PM2.5 - Actual vs Predicción (Prophet) [{"Daily" if agg=="daily" else "Hourly"}]', template='plotly_dark', xaxis_title='Fecha', yaxis_title='PM2.5 (µg/m³)', hovermode='x unified', height=600)
     return fig
@@ -75,6 +111,7 @@ def make_forecast_figure(agg='hourly'):
 
 # --- Figuras de cross-validation (métricas) ---
 def make_cv_metric_figures():
+    _, df_cv, df_p = get_prophet_tables()
     # Preferir usar df_p.csv (performance metrics precomputadas)
     if df_p is not None and not getattr(df_p, 'empty', True):
         d = df_p.copy()
@@ -148,12 +185,8 @@ def make_cv_metric_figures():
     return px.line(title='df_cv.csv no contiene las columnas esperadas (y, yhat, horizon)'), px.line(title='df_cv.csv no contiene las columnas esperadas (y, yhat, horizon)')
 
 
-forecast_fig = make_forecast_figure(agg='hourly')
-cv_series_fig, cv_scatter_fig = make_cv_metric_figures()
-
-
-
 def compute_kpis():
+    _, df_cv, df_p = get_prophet_tables()
     # Simplified: assume necessary columns exist in df_p or df_cv as requested
     k = {'mse': np.nan, 'rmse': np.nan, 'mape': np.nan, 'smape': np.nan}
     if df_p is not None and not getattr(df_p, 'empty', True):
@@ -165,6 +198,8 @@ def compute_kpis():
         return k
 
     # Otherwise compute basic global metrics from df_cv (assume y and yhat present)
+    if df_cv is None or getattr(df_cv, 'empty', True):
+        return k
     df = df_cv
     errs = df['y'] - df['yhat']
     k['mse'] = float((errs ** 2).mean())
@@ -174,50 +209,60 @@ def compute_kpis():
     return k
 
 
-kpis = compute_kpis()
+@cached_callback('prophet_layout')
+def layout():
+    """Layout de la pestaña (se construye al mostrarla, una vez por versión de datos)
 
-layout = html.Div([
-    html.H2("🔮 Predicciones Prophet - PM2.5", style={'textAlign': 'center', 'marginBottom': 20}),
+    Si falta alguna tabla del modelo el layout no se cachea: la próxima
+    visita reintenta la carga.
+    """
+    forecast_fig = make_forecast_figure(agg='hourly')
+    cv_series_fig, cv_scatter_fig = make_cv_metric_figures()
+    kpis = compute_kpis()
 
-    # KPI cards
-    html.Div([
-        html.Div([
-            html.H4(f"{kpis['mse']:.2f}" if not np.isnan(kpis['mse']) else "N/A", style={'color': '#ffffff', 'margin': 0}),
-            html.P("MSE", style={'margin': 0, 'color': '#94a3b8'})
-        ], style={'backgroundColor': '#111827', 'padding': '12px', 'borderRadius': '8px', 'flex': 1, 'margin': '6px', 'textAlign': 'center'}),
-        html.Div([
-            html.H4(f"{kpis['rmse']:.2f}" if not np.isnan(kpis['rmse']) else "N/A", style={'color': '#ffffff', 'margin': 0}),
-            html.P("RMSE", style={'margin': 0, 'color': '#94a3b8'})
-        ], style={'backgroundColor': '#111827', 'padding': '12px', 'borderRadius': '8px', 'flex': 1, 'margin': '6px', 'textAlign': 'center'}),
+    content = html.Div([
+        html.H2("🔮 Predicciones Prophet - PM2.5", style={'textAlign': 'center', 'marginBottom': 20}),
+
+        # KPI cards
         html.Div([
-            html.H4(f"{kpis['mape']:.2f}%" if not np.isnan(kpis['mape']) else "N/A", style={'color': '#ffffff', 'margin': 0}),
-            html.P("MAPE", style={'margin': 0, 'color': '#94a3b8'})
-        ], style={'backgroundColor': '#111827', 'padding': '12px', 'borderRadius': '8px', 'flex': 1, 'margin': '6px', 'textAlign': 'center'}),
+            html.Div([
+                html.H4(f"{kpis['mse']:.2f}" if not np.isnan(kpis['mse']) else "N/A", style={'color': '#ffffff', 'margin': 0}),
+                html.P("MSE", style={'margin': 0, 'color': '#94a3b8'})
+            ], style={'backgroundColor': '#111827', 'padding': '12px', 'borderRadius': '8px', 'flex': 1, 'margin': '6px', 'textAlign': 'center'}),
+            html.Div([
+                html.H4(f"{kpis['rmse']:.2f}" if not np.isnan(kpis['rmse']) else "N/A", style={'color': '#ffffff', 'margin': 0}),
+                html.P("RMSE", style={'margin': 0, 'color': '#94a3b8'})
+            ], style={'backgroundColor': '#111827', 'padding': '12px', 'borderRadius': '8px', 'flex': 1, 'margin': '6px', 'textAlign': 'center'}),
+            html.Div([
+                html.H4(f"{kpis['mape']:.2f}%" if not np.isnan(kpis['mape']) else "N/A", style={'color': '#ffffff', 'margin': 0}),
+                html.P("MAPE", style={'margin': 0, 'color': '#94a3b8'})
+            ], style={'backgroundColor': '#111827', 'padding': '12px', 'borderRadius': '8px', 'flex': 1, 'margin': '6px', 'textAlign': 'center'}),
+            html.Div([
+                html.H4(f"{kpis['smape']:.2f}%" if not np.isnan(kpis['smape']) else "N/A", style={'color': '#ffffff', 'margin': 0}),
+                html.P("SMAPE", style={'margin': 0, 'color': '#94a3b8'})
+            ], style={'backgroundColor': '#111827', 'padding': '12px', 'borderRadius': '8px', 'flex': 1, 'margin': '6px', 'textAlign': 'center'})
+        ], style={'display': 'flex', 'justifyContent': 'space-between', 'marginBottom': 20}),
+
+        # Selector de agregación: hourly o daily
         html.Div([
-            html.H4(f"{kpis['smape']:.2f}%" if not np.isnan(kpis['smape']) else "N/A", style={'color': '#ffffff', 'margin': 0}),
-            html.P("SMAPE", style={'margin': 0, 'color': '#94a3b8'})
-        ], style={'backgroundColor': '#111827', 'padding': '12px', 'borderRadius': '8px', 'flex': 1, 'margin': '6px', 'textAlign': 'center'})
-    ], style={'display': 'flex', 'justifyContent': 'space-between', 'marginBottom': 20}),
-
-    # Selector de agregación: hourly o daily
-    html.Div([
-        html.Label('Agrupar por:', style={'color': '#94a3b8', 'marginRight': '8px'}),
-        dcc.RadioItems(
-            id='time-agg',
-            options=[
-                {'label': 'Hourly', 'value': 'hourly'},
-                {'label': 'Daily (mean)', 'value': 'daily'}
-            ],
-            value='hourly',
-            labelStyle={'display': 'inline-block', 'marginRight': '12px', 'color': '#ffffff'}
-        )
-    ], style={'marginBottom': 10}),
-
-    dcc.Graph(figure=forecast_fig, id='prophet-forecast-plot'),
-    html.H4("📈 Métricas de Cross-Validation", style={'marginTop': 20}),
-    dcc.Graph(figure=cv_series_fig, id='cv-metrics-series'),
-    dcc.Graph(figure=cv_scatter_fig, id='cv-rmse-horizon')
-], style={'backgroundColor': '#0f1720', 'color': '#ffffff', 'padding': '10px'})
+            html.Label('Agrupar por:', style={'color': '#94a3b8', 'marginRight': '8px'}),
+            dcc.RadioItems(
+                id='time-agg',
+                options=[
+                    {'label': 'Hourly', 'value': 'hourly'},
+                    {'label': 'Daily (mean)', 'value': 'daily'}
+                ],
+                value='hourly',
+                labelStyle={'display': 'inline-block', 'marginRight': '12px', 'color': '#ffffff'}
+            )
+        ], style={'marginBottom': 10}),
+
+        dcc.Graph(figure=forecast_fig, id='prophet-forecast-plot'),
+        html.H4("📈 Métricas de Cross-Validation", style={'marginTop': 20}),
+        dcc.Graph(figure=cv_series_fig, id='cv-metrics-series'),
+        dcc.Graph(figure=cv_scatter_fig, id='cv-rmse-horizon')
+    ], style={'backgroundColor': '#0f1720', 'color': '#ffffff', 'padding': '10px'})
+    return content if prophet_tables_complete() else uncached(content)
 
 
 def register_callbacks(app):
@@ -226,8 +271,10 @@ def register_callbacks(app):
         Output('prophet-forecast-plot', 'figure'),
         Input('time-agg', 'value')
     )
+    @cached_callback('update_forecast_agg')
     def update_forecast_agg(agg_value):
         try:
-            return make_forecast_figure(agg=agg_value)
+            fig = make_forecast_figure(agg=agg_value)
+            return fig if prophet_tables_complete() else uncached(fig)
         except Exception as e:
-            return px.line(title=f'Error generando figura: {e}')
+            return uncached(px.line(title=f'Error generando figura: {e}'))
@@ -3,12 +3,9 @@ from dash import dcc, html, dash_table, Input, Output, callback
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from utils.data_loader import get_data
+from utils.data_loader import get_data, get_aggregate_cube, DATA_TABLE
 from utils.database import load_data_from_query
 
-# Obtener datos
-df_original, df_imputed, analysis_cols = get_data()
-
 # Cargar datos de estaciones (asumiendo que el archivo está en la raíz del proyecto)
 try:
     stations_df = pd.read_csv('stations_coordinates.csv')
@@ -46,6 +43,8 @@ variable_descriptions = {
     'datetime': 'Fecha y hora completa de la medición'
 }
 
+# Consultas SQL sobre la tabla de la estación por defecto ({table} = DATA_TABLE,
+# la misma estación que los cubos de agregados)
 QUERIES = {
     'pm25_stats': {
         'name': '🌫️ Estadísticas PM2.5',
@@ -59,7 +58,7 @@ QUERIES = {
             STDDEV("PM2.5") as pm25_desviacion,
             SUM(CASE WHEN "PM2.5" IS NULL THEN 1 ELSE 0 END) as nulos,
             100.0 * SUM(CASE WHEN "PM2.5" IS NULL THEN 1 ELSE 0 END) / COUNT(*) as porcentaje_nulos
-        FROM prsa_data_dongsi
+        FROM {table}
         """
     },
     'pollution_by_year': {
@@ -73,7 +72,7 @@ QUERIES = {
             AVG("PM10") as pm10_promedio,
             AVG("SO2") as so2_promedio,
             AVG("NO2") as no2_promedio
-        FROM prsa_data_dongsi
+        FROM {table}
         GROUP BY year
         HAVING COUNT("PM2.5") > 0
         ORDER BY year
@@ -89,7 +88,7 @@ QUERIES = {
             AVG("PM10") as pm10_promedio,
             AVG("TEMP") as temperatura_promedio,
             AVG("RAIN") as lluvia_promedio
-        FROM prsa_data_dongsi
+        FROM {table}
         WHERE "PM2.5" IS NOT NULL AND "TEMP" IS NOT NULL
         GROUP BY month
         ORDER BY month
@@ -104,7 +103,7 @@ QUERIES = {
             AVG("PM2.5") as pm25_promedio,
             AVG("PM10") as pm10_promedio,
             AVG("TEMP") as temperatura_promedio
-        FROM prsa_data_dongsi
+        FROM {table}
         WHERE "PM2.5" IS NOT NULL AND "TEMP" IS NOT NULL
         GROUP BY hour
         ORDER BY hour
@@ -119,7 +118,7 @@ QUERIES = {
             AVG("PM2.5") as pm25_promedio,
             AVG("PM10") as pm10_promedio,
             AVG("WSPM") as velocidad_viento_promedio
-        FROM prsa_data_dongsi
+        FROM {table}
         WHERE wd IS NOT NULL AND "PM2.5" IS NOT NULL
         GROUP BY wd
         HAVING COUNT(*) >= 10
@@ -137,7 +136,7 @@ QUERIES = {
             AVG("PM10") as pm10_promedio,
             AVG("TEMP") as temperatura_promedio,
             AVG("RAIN") as lluvia_promedio
-        FROM prsa_data_dongsi
+        FROM {table}
         WHERE "PM2.5" IS NOT NULL
         GROUP BY year, month, day
         HAVING COUNT(*) >= 18
@@ -155,7 +154,7 @@ QUERIES = {
             CORR("PM2.5", "DEWP") as corr_pm25_punto_rocio,
             CORR("PM2.5", "RAIN") as corr_pm25_lluvia,
             CORR("PM2.5", "WSPM") as corr_pm25_viento
-        FROM prsa_data_dongsi
+        FROM {table}
         WHERE "PM2.5" IS NOT NULL 
           AND "TEMP" IS NOT NULL 
           AND "PRES" IS NOT NULL
@@ -166,6 +165,56 @@ QUERIES = {
     },
 }
 
+# Consultas que se resuelven desde el cubo de agregados en memoria (mismo
+# resultado que el SQL, sin consultar la BD). Retornan None si el cubo no
+# está disponible y se usa la consulta SQL.
+def _cube_frame(cube, dim, key_name, columns):
+    """Medias por bucket con nombres de columna del resultado SQL"""
+    means = cube.stat(dim, 'mean', list(columns))
+    out = pd.DataFrame({key_name: cube.labels(dim)})
+    for col, name in columns.items():
+        out[name] = means[col].to_numpy()
+    return out
+
+def _pollution_by_year():
+    cube = get_aggregate_cube('original')
+    if cube is None:
+        return None
+    out = _cube_frame(cube, 'year', 'año', {
+        'pm2_5': 'pm25_promedio', 'pm10': 'pm10_promedio',
+        'so2': 'so2_promedio', 'no2': 'no2_promedio',
+    })
+    out.insert(1, 'total_mediciones', cube.rows('year').to_numpy())
+    out.insert(2, 'mediciones_pm25', cube.series('year', 'pm2_5', 'count').to_numpy().astype(int))
+    return out[out['mediciones_pm25'] > 0].reset_index(drop=True)
+
+def _seasonal_analysis():
+    cube = get_aggregate_cube('original_pm25_temp')
+    if cube is None:
+        return None
+    out = _cube_frame(cube, 'month', 'mes', {
+        'pm2_5': 'pm25_promedio', 'pm10': 'pm10_promedio',
+        'temp': 'temperatura_promedio', 'rain': 'lluvia_promedio',
+    })
+    out.insert(1, 'total_mediciones', cube.rows('month').to_numpy())
+    return out[out['total_mediciones'] > 0].reset_index(drop=True)
+
+def _daily_pattern():
+    cube = get_aggregate_cube('original_pm25_temp')
+    if cube is None:
+        return None
+    out = _cube_frame(cube, 'hour', 'hora', {
+        'pm2_5': 'pm25_promedio', 'pm10': 'pm10_promedio', 'temp': 'temperatura_promedio',
+    })
+    out.insert(1, 'mediciones', cube.rows('hour').to_numpy())
+    return out[out['mediciones'] > 0].reset_index(drop=True)
+
+CUBE_QUERIES = {
+    'pollution_by_year': _pollution_by_year,
+    'seasonal_analysis': _seasonal_analysis,
+    'daily_pattern': _daily_pattern,
+}
+
 # Crear mapa de estaciones
 def create_stations_map():
     # Agregar columna para resaltar Dongsi
@@ -213,199 +262,202 @@ def create_stations_map():
     
     return fig
 
-# Layout de la pestaña de resumen
-layout = html.Div([
-    html.H2("📊 Resumen General del Dataset", 
-            style={'color': '#ffffff', 'marginBottom': '20px'}),
+# Layout de la pestaña de resumen (se construye al mostrar la pestaña)
+def layout():
+    df_original, df_imputed, analysis_cols = get_data()
     
-    # Tarjetas de información
-    html.Div([
+    return html.Div([
+        html.H2("📊 Resumen General del Dataset", 
+                style={'color': '#ffffff', 'marginBottom': '20px'}),
+    
+        # Tarjetas de información
         html.Div([
-            html.H3(f"{df_original.shape[0]:,}", style={'color': '#3b82f6', 'margin': '0'}),
-            html.P("Total de Filas", style={'color': '#94a3b8', 'margin': '0'})
-        ], style={
-            'backgroundColor': '#1e293b', 
-            'padding': '20px', 
-            'borderRadius': '10px',
-            'textAlign': 'center',
-            'flex': '1',
-            'margin': '0 10px'
-        }),
+            html.Div([
+                html.H3(f"{df_original.shape[0]:,}", style={'color': '#3b82f6', 'margin': '0'}),
+                html.P("Total de Filas", style={'color': '#94a3b8', 'margin': '0'})
+            ], style={
+                'backgroundColor': '#1e293b', 
+                'padding': '20px', 
+                'borderRadius': '10px',
+                'textAlign': 'center',
+                'flex': '1',
+                'margin': '0 10px'
+            }),
+            html.Div([
+                html.H3(f"{df_original.shape[1]}", style={'color': '#10b981', 'margin': '0'}),
+                html.P("Total de Columnas", style={'color': '#94a3b8', 'margin': '0'})
+            ], style={
+                'backgroundColor': '#1e293b', 
+                'padding': '20px', 
+                'borderRadius': '10px',
+                'textAlign': 'center',
+                'flex': '1',
+                'margin': '0 10px'
+            }),
+            html.Div([
+                html.H3(f"{len(analysis_cols)}", style={'color': '#f59e0b', 'margin': '0'}),
+                html.P("Variables de Análisis", style={'color': '#94a3b8', 'margin': '0'})
+            ], style={
+                'backgroundColor': '#1e293b', 
+                'padding': '20px', 
+                'borderRadius': '10px',
+                'textAlign': 'center',
+                'flex': '1',
+                'margin': '0 10px'
+            }),
+        ], style={'display': 'flex', 'marginBottom': '30px', 'justifyContent': 'space-between'}),
+
+        # Información de la estación
         html.Div([
-            html.H3(f"{df_original.shape[1]}", style={'color': '#10b981', 'margin': '0'}),
-            html.P("Total de Columnas", style={'color': '#94a3b8', 'margin': '0'})
+            html.H3("🏢 Información de la Estación", style={'color': '#ffffff'}),
+            html.P(f"Estación: {df_original['station'].iloc[0] if 'station' in df_original.columns else 'No disponible'}", 
+                   style={'color': '#e2e8f0'}),
+            html.P(f"Rango temporal: {df_original['datetime'].min().strftime('%Y-%m-%d') if 'datetime' in df_original.columns else 'N/A'} a {df_original['datetime'].max().strftime('%Y-%m-%d') if 'datetime' in df_original.columns else 'N/A'}", 
+                   style={'color': '#e2e8f0'}),
         ], style={
             'backgroundColor': '#1e293b', 
             'padding': '20px', 
             'borderRadius': '10px',
-            'textAlign': 'center',
-            'flex': '1',
-            'margin': '0 10px'
+            'marginBottom': '20px'
         }),
+
+        # Mapa de estaciones
         html.Div([
-            html.H3(f"{len(analysis_cols)}", style={'color': '#f59e0b', 'margin': '0'}),
-            html.P("Variables de Análisis", style={'color': '#94a3b8', 'margin': '0'})
+            html.H3("🗺️ Red de Estaciones de Monitoreo - Beijing", style={'color': '#ffffff', 'marginBottom': '15px'}),
+            html.P("Ubicación de las 12 estaciones de monitoreo de calidad del aire en Beijing", 
+                   style={'color': '#94a3b8', 'marginBottom': '15px'}),
+        
+            # Leyenda del mapa
+            html.Div([
+                html.Div([
+                    html.Span("🔴", style={'fontSize': '20px', 'marginRight': '8px'}),
+                    html.Span("Dongsi (Estación actual)", style={'color': '#ffffff'})
+                ], style={'display': 'flex', 'alignItems': 'center', 'marginRight': '20px'}),
+                html.Div([
+                    html.Span("🔵", style={'fontSize': '20px', 'marginRight': '8px'}),
+                    html.Span("Otras estaciones", style={'color': '#ffffff'})
+                ], style={'display': 'flex', 'alignItems': 'center'})
+            ], style={'display': 'flex', 'marginBottom': '15px'}),
+        
+            dcc.Graph(
+                id='stations-map',
+                figure=create_stations_map(),
+                config={'displayModeBar': True, 'scrollZoom': True}
+            ),
         ], style={
             'backgroundColor': '#1e293b', 
-            'padding': '20px', 
+            'padding': '25px', 
             'borderRadius': '10px',
-            'textAlign': 'center',
-            'flex': '1',
-            'margin': '0 10px'
+            'marginBottom': '20px'
         }),
-    ], style={'display': 'flex', 'marginBottom': '30px', 'justifyContent': 'space-between'}),
 
-    # Información de la estación
-    html.Div([
-        html.H3("🏢 Información de la Estación", style={'color': '#ffffff'}),
-        html.P(f"Estación: {df_original['station'].iloc[0] if 'station' in df_original.columns else 'No disponible'}", 
-               style={'color': '#e2e8f0'}),
-        html.P(f"Rango temporal: {df_original['datetime'].min().strftime('%Y-%m-%d') if 'datetime' in df_original.columns else 'N/A'} a {df_original['datetime'].max().strftime('%Y-%m-%d') if 'datetime' in df_original.columns else 'N/A'}", 
-               style={'color': '#e2e8f0'}),
-    ], style={
-        'backgroundColor': '#1e293b', 
-        'padding': '20px', 
-        'borderRadius': '10px',
-        'marginBottom': '20px'
-    }),
-
-    # Mapa de estaciones
-    html.Div([
-        html.H3("🗺️ Red de Estaciones de Monitoreo - Beijing", style={'color': '#ffffff', 'marginBottom': '15px'}),
-        html.P("Ubicación de las 12 estaciones de monitoreo de calidad del aire en Beijing", 
-               style={'color': '#94a3b8', 'marginBottom': '15px'}),
-        
-        # Leyenda del mapa
+        # Explicación de variables
         html.Div([
-            html.Div([
-                html.Span("🔴", style={'fontSize': '20px', 'marginRight': '8px'}),
-                html.Span("Dongsi (Estación actual)", style={'color': '#ffffff'})
-            ], style={'display': 'flex', 'alignItems': 'center', 'marginRight': '20px'}),
-            html.Div([
-                html.Span("🔵", style={'fontSize': '20px', 'marginRight': '8px'}),
-                html.Span("Otras estaciones", style={'color': '#ffffff'})
-            ], style={'display': 'flex', 'alignItems': 'center'})
-        ], style={'display': 'flex', 'marginBottom': '15px'}),
-        
-        dcc.Graph(
-            id='stations-map',
-            figure=create_stations_map(),
-            config={'displayModeBar': True, 'scrollZoom': True}
-        ),
-    ], style={
-        'backgroundColor': '#1e293b', 
-        'padding': '25px', 
-        'borderRadius': '10px',
-        'marginBottom': '20px'
-    }),
-
-    # Explicación de variables
-    html.Div([
-        html.H3("📖 Diccionario de Variables", style={'color': '#ffffff', 'marginBottom': '15px'}),
-        html.P("Descripción de cada variable en el dataset:", style={'color': '#94a3b8', 'marginBottom': '15px'}),
+            html.H3("📖 Diccionario de Variables", style={'color': '#ffffff', 'marginBottom': '15px'}),
+            html.P("Descripción de cada variable en el dataset:", style={'color': '#94a3b8', 'marginBottom': '15px'}),
         
-        html.Div([
             html.Div([
-                html.H4("🕒 Variables Temporales", style={'color': '#3b82f6', 'marginBottom': '10px'}),
-                html.Ul([
-                    html.Li([html.Strong("year: "), variable_descriptions.get('year', 'No disponible')]),
-                    html.Li([html.Strong("month: "), variable_descriptions.get('month', 'No disponible')]),
-                    html.Li([html.Strong("day: "), variable_descriptions.get('day', 'No disponible')]),
-                    html.Li([html.Strong("hour: "), variable_descriptions.get('hour', 'No disponible')]),
-                    html.Li([html.Strong("datetime: "), variable_descriptions.get('datetime', 'No disponible')]),
-                ], style={'color': '#e2e8f0'})
-            ], style={'flex': '1', 'marginRight': '15px'}),
+                html.Div([
+                    html.H4("🕒 Variables Temporales", style={'color': '#3b82f6', 'marginBottom': '10px'}),
+                    html.Ul([
+                        html.Li([html.Strong("year: "), variable_descriptions.get('year', 'No disponible')]),
+                        html.Li([html.Strong("month: "), variable_descriptions.get('month', 'No disponible')]),
+                        html.Li([html.Strong("day: "), variable_descriptions.get('day', 'No disponible')]),
+                        html.Li([html.Strong("hour: "), variable_descriptions.get('hour', 'No disponible')]),
+                        html.Li([html.Strong("datetime: "), variable_descriptions.get('datetime', 'No disponible')]),
+                    ], style={'color': '#e2e8f0'})
+                ], style={'flex': '1', 'marginRight': '15px'}),
             
-            html.Div([
-                html.H4("🌫️ Contaminantes", style={'color': '#ef4444', 'marginBottom': '10px'}),
-                html.Ul([
-                    html.Li([html.Strong("PM2.5: "), variable_descriptions.get('PM2.5', 'No disponible')]),
-                    html.Li([html.Strong("PM10: "), variable_descriptions.get('PM10', 'No disponible')]),
-                    html.Li([html.Strong("SO2: "), variable_descriptions.get('SO2', 'No disponible')]),
-                    html.Li([html.Strong("NO2: "), variable_descriptions.get('NO2', 'No disponible')]),
-                    html.Li([html.Strong("CO: "), variable_descriptions.get('CO', 'No disponible')]),
-                    html.Li([html.Strong("O3: "), variable_descriptions.get('O3', 'No disponible')]),
-                ], style={'color': '#e2e8f0'})
-            ], style={'flex': '1', 'marginRight': '15px'}),
+                html.Div([
+                    html.H4("🌫️ Contaminantes", style={'color': '#ef4444', 'marginBottom': '10px'}),
+                    html.Ul([
+                        html.Li([html.Strong("PM2.5: "), variable_descriptions.get('PM2.5', 'No disponible')]),
+                        html.Li([html.Strong("PM10: "), variable_descriptions.get('PM10', 'No disponible')]),
+                        html.Li([html.Strong("SO2: "), variable_descriptions.get('SO2', 'No disponible')]),
+                        html.Li([html.Strong("NO2: "), variable_descriptions.get('NO2', 'No disponible')]),
+                        html.Li([html.Strong("CO: "), variable_descriptions.get('CO', 'No disponible')]),
+                        html.Li([html.Strong("O3: "), variable_descriptions.get('O3', 'No disponible')]),
+                    ], style={'color': '#e2e8f0'})
+                ], style={'flex': '1', 'marginRight': '15px'}),
             
+                html.Div([
+                    html.H4("🌤️ Variables Meteorológicas", style={'color': '#10b981', 'marginBottom': '10px'}),
+                    html.Ul([
+                        html.Li([html.Strong("TEMP: "), variable_descriptions.get('TEMP', 'No disponible')]),
+                        html.Li([html.Strong("PRES: "), variable_descriptions.get('PRES', 'No disponible')]),
+                        html.Li([html.Strong("DEWP: "), variable_descriptions.get('DEWP', 'No disponible')]),
+                        html.Li([html.Strong("RAIN: "), variable_descriptions.get('RAIN', 'No disponible')]),
+                        html.Li([html.Strong("wd: "), variable_descriptions.get('wd', 'No disponible')]),
+                        html.Li([html.Strong("WSPM: "), variable_descriptions.get('WSPM', 'No disponible')]),
+                    ], style={'color': '#e2e8f0'})
+                ], style={'flex': '1'})
+            ], style={'display': 'flex', 'justifyContent': 'space-between', 'marginBottom': '20px'}),
+        
             html.Div([
-                html.H4("🌤️ Variables Meteorológicas", style={'color': '#10b981', 'marginBottom': '10px'}),
+                html.H4("📍 Información de Estación", style={'color': '#f59e0b', 'marginBottom': '10px'}),
                 html.Ul([
-                    html.Li([html.Strong("TEMP: "), variable_descriptions.get('TEMP', 'No disponible')]),
-                    html.Li([html.Strong("PRES: "), variable_descriptions.get('PRES', 'No disponible')]),
-                    html.Li([html.Strong("DEWP: "), variable_descriptions.get('DEWP', 'No disponible')]),
-                    html.Li([html.Strong("RAIN: "), variable_descriptions.get('RAIN', 'No disponible')]),
-                    html.Li([html.Strong("wd: "), variable_descriptions.get('wd', 'No disponible')]),
-                    html.Li([html.Strong("WSPM: "), variable_descriptions.get('WSPM', 'No disponible')]),
+                    html.Li([html.Strong("station: "), variable_descriptions.get('station', 'No disponible')]),
                 ], style={'color': '#e2e8f0'})
-            ], style={'flex': '1'})
-        ], style={'display': 'flex', 'justifyContent': 'space-between', 'marginBottom': '20px'}),
-        
-        html.Div([
-            html.H4("📍 Información de Estación", style={'color': '#f59e0b', 'marginBottom': '10px'}),
-            html.Ul([
-                html.Li([html.Strong("station: "), variable_descriptions.get('station', 'No disponible')]),
-            ], style={'color': '#e2e8f0'})
-        ])
-    ], style={
-        'backgroundColor': '#1e293b', 
-        'padding': '25px', 
-        'borderRadius': '10px',
-        'marginBottom': '20px'
-    }),
+            ])
+        ], style={
+            'backgroundColor': '#1e293b', 
+            'padding': '25px', 
+            'borderRadius': '10px',
+            'marginBottom': '20px'
+        }),
     
-    # Primeras filas
-    html.Div([
-        html.H3("📋 Primeras Filas del Dataset", style={'color': '#ffffff'}),
-        dash_table.DataTable(
-            data=df_original.head(10).to_dict('records'),
-            columns=[{"name": col, "id": col} for col in df_original.columns],
-            page_size=10,
-            style_table={'overflowX': 'auto', 'borderRadius': '10px'},
-            style_cell={
-                'backgroundColor': '#1e293b',
-                'color': 'white',
-                'textAlign': 'left',
-                'padding': '10px',
-                'border': '1px solid #334155'
-            },
-            style_header={
-                'backgroundColor': '#334155',
-                'color': 'white',
-                'fontWeight': 'bold',
-                'border': '1px solid #475569'
-            },
-        )
-    ], style={'marginBottom': '30px'}),
+        # Primeras filas
+        html.Div([
+            html.H3("📋 Primeras Filas del Dataset", style={'color': '#ffffff'}),
+            dash_table.DataTable(
+                data=df_original.head(10).to_dict('records'),
+                columns=[{"name": col, "id": col} for col in df_original.columns],
+                page_size=10,
+                style_table={'overflowX': 'auto', 'borderRadius': '10px'},
+                style_cell={
+                    'backgroundColor': '#1e293b',
+                    'color': 'white',
+                    'textAlign': 'left',
+                    'padding': '10px',
+                    'border': '1px solid #334155'
+                },
+                style_header={
+                    'backgroundColor': '#334155',
+                    'color': 'white',
+                    'fontWeight': 'bold',
+                    'border': '1px solid #475569'
+                },
+            )
+        ], style={'marginBottom': '30px'}),
 
-    # Sección de consultas interactivas
-    html.Div([
-        html.H3("🔍 Consultas Interactivas de la Base de Datos", 
-                style={'color': '#ffffff', 'marginBottom': '15px'}),
-        html.P("Selecciona una consulta para explorar los datos:", 
-               style={'color': '#94a3b8', 'marginBottom': '15px'}),
-        
-        # Selector de consultas
+        # Sección de consultas interactivas
         html.Div([
-            dcc.Dropdown(
-                id='query-selector',
-                options=[{'label': query_info['name'], 'value': query_id} 
-                        for query_id, query_info in QUERIES.items()],
-                placeholder='Selecciona una consulta...',
-                style={'color': '#000000', 'marginBottom': '15px'}
-            ),
-        ]),
+            html.H3("🔍 Consultas Interactivas de la Base de Datos", 
+                    style={'color': '#ffffff', 'marginBottom': '15px'}),
+            html.P("Selecciona una consulta para explorar los datos:", 
+                   style={'color': '#94a3b8', 'marginBottom': '15px'}),
+        
+            # Selector de consultas
+            html.Div([
+                dcc.Dropdown(
+                    id='query-selector',
+                    options=[{'label': query_info['name'], 'value': query_id} 
+                            for query_id, query_info in QUERIES.items()],
+                    placeholder='Selecciona una consulta...',
+                    style={'color': '#000000', 'marginBottom': '15px'}
+                ),
+            ]),
         
-        # Resultados de la consulta
-        html.Div(id='query-results', style={'marginTop': '20px'})
+            # Resultados de la consulta
+            html.Div(id='query-results', style={'marginTop': '20px'})
         
-    ], style={
-        'backgroundColor': '#1e293b', 
-        'padding': '25px', 
-        'borderRadius': '10px',
-        'marginBottom': '20px'
-    }),
-])
+        ], style={
+            'backgroundColor': '#1e293b', 
+            'padding': '25px', 
+            'borderRadius': '10px',
+            'marginBottom': '20px'
+        }),
+    ])
 
 # Callbacks para las consultas interactivas
 @callback(
@@ -418,9 +470,16 @@ def update_query_results(selected_query):
                        style={'color': '#94a3b8', 'textAlign': 'center', 'padding': '20px'})
     
     try:
-        # Ejecutar la consulta
+        # Ejecutar la consulta (desde el cubo de agregados si es posible)
         query_info = QUERIES[selected_query]
-        df = load_data_from_query(query_info['query'])
+        df = None
+        if selected_query in CUBE_QUERIES:
+            try:
+                df = CUBE_QUERIES[selected_query]()
+            except (KeyError, ValueError) as e:
+                print(f"⚠️  Cubo no disponible para {selected_query}: {e}")
+        if df is None:
+            df = load_data_from_query(query_info['query'].format(table=DATA_TABLE))
         
         if df.empty:
             return html.Div("No se encontraron resultados para esta consulta.", 
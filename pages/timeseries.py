@@ -1,15 +1,23 @@
 # pages/timeseries.py - MODIFICADO para incluir descomposición y estacionalidad
-from dash import dcc, html, Input, Output, callback
+from dash import dcc, html, Input, Output, callback, ctx, no_update
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.seasonal import seasonal_decompose
-from utils.data_loader import get_data
+from utils.data_loader import (get_data, get_series_pyramid, get_decomposition, get_aggregate_cube,
+                               get_outlier_scores)
+from utils.downsampling import relayout_x_range
+from utils.figure_cache import cached_callback, uncached
+from utils.outliers import DEFAULT_OUTLIER_METHOD, OUTLIER_METHODS
 
-# Obtener datos
-df_original, df_imputed, analysis_cols = get_data()
+# Etiqueta del eje X por unidad de calendario de la pestaña de estacionalidad
+SEASONALITY_LABELS = {
+    'hour': 'Hora del Día',
+    'dayofweek': 'Día de la Semana (0=Lunes, 6=Domingo)',
+    'month': 'Mes del Año',
+    'season': 'Estación del Año',
+}
 
 # Layout de análisis de series de tiempo
 layout = html.Div([
@@ -42,6 +50,8 @@ layout = html.Div([
 
 def render_decomposition():
     """Pestaña de descomposición de series temporales"""
+    df_original, df_imputed, analysis_cols = get_data()
+    
     return html.Div([
         html.H3("🧩 Descomposición de Series Temporales", style={'color': '#ffffff'}),
         html.P("Selecciona una variable para descomponer en tendencia, estacionalidad y residual:"),
@@ -65,13 +75,24 @@ def render_decomposition():
                 inline=True,
                 style={'color': '#ffffff'}
             ),
+            html.Label("Método:", style={'color': '#ffffff', 'marginLeft': '20px', 'marginRight': '10px'}),
+            dcc.RadioItems(
+                id='decomposition-method',
+                options=[
+                    {'label': 'Clásica', 'value': 'classical'},
+                    {'label': 'STL (robusta)', 'value': 'stl'}
+                ],
+                value='classical',
+                inline=True,
+                style={'color': '#ffffff'}
+            ),
             html.Label("Período Estacional:", style={'color': '#ffffff', 'marginLeft': '20px', 'marginRight': '10px'}),
             dcc.Input(
                 id='seasonal-period',
                 type='number',
-                value=24,  # Por defecto 24 horas para datos horarios
-                min=1,
-                max=365,
+                value=24,  # Por defecto 24 horas; 168 = semana, 8760 = año
+                min=2,
+                max=8760,
                 style={'width': '100px', 'color': '#000000'}
             )
         ], style={'marginBottom': '20px'}),
@@ -81,6 +102,8 @@ def render_decomposition():
 
 def render_seasonality():
     """Pestaña de análisis de estacionalidad"""
+    df_original, df_imputed, analysis_cols = get_data()
+    
     return html.Div([
         html.H3("📅 Análisis de Estacionalidad", style={'color': '#ffffff'}),
         html.P("Selecciona una variable para analizar sus patrones estacionales:"),
@@ -112,6 +135,8 @@ def render_seasonality():
 
 def render_volatility_analysis():
     """Pestaña de análisis de volatilidad"""
+    df_original, df_imputed, analysis_cols = get_data()
+    
     if 'datetime' not in df_imputed.columns or df_imputed.empty:
         return html.Div([
             html.H3("📊 Análisis de Volatilidad", style={'color': '#ffffff'}),
@@ -160,6 +185,17 @@ def render_volatility_analysis():
                     value=2,
                     marks={1: '1σ', 2: '2σ', 3: '3σ'},
                 ),
+            ], style={'flex': '1', 'marginRight': '15px'}),
+            
+            html.Div([
+                html.Label("Método de detección:", style={'color': '#ffffff'}),
+                dcc.Dropdown(
+                    id='outlier-method',
+                    options=[{'label': label, 'value': key} for key, label in OUTLIER_METHODS.items()],
+                    value=DEFAULT_OUTLIER_METHOD,
+                    clearable=False,
+                    style={'color': '#000000'}
+                ),
             ], style={'flex': '1'}),
         ], style={'display': 'flex', 'marginBottom': '20px', 'alignItems': 'end'}),
         
@@ -188,81 +224,78 @@ def register_callbacks(app):
             return render_volatility_analysis()
         return html.Div("Selecciona una sub-pestaña")
     
-    # Callback para descomposición
+    # Callback para descomposición (re-consulta la ventana visible al hacer zoom)
     @app.callback(
         Output('decomposition-plot', 'figure'),
         [Input('decomposition-variable-selector', 'value'),
          Input('decomposition-model', 'value'),
-         Input('seasonal-period', 'value')]
+         Input('decomposition-method', 'value'),
+         Input('seasonal-period', 'value'),
+         Input('decomposition-plot', 'relayoutData')]
     )
-    def update_decomposition(selected_var, model, period):
+    @cached_callback('update_decomposition', use_trigger=True)
+    def update_decomposition(selected_var, model, method, period, relayout_data):
         if not selected_var or not period:
             return {}
-            
-        df_orig, df_imp, _ = get_data()
         
-        if 'datetime' not in df_imp.columns:
-            return {}
-            
-        series = df_imp.set_index('datetime')[selected_var].dropna()
-        
-        if series.empty:
-            return {}
+        visible = None
+        if ctx.triggered_id == 'decomposition-plot':
+            visible = relayout_x_range(relayout_data)
+            if visible is None:
+                return no_update
+        start, end = visible or (None, None)
         
         try:
-            # Realizar descomposición estacional
-            decomposition = seasonal_decompose(series, model=model, period=period)
+            # Descomposición cacheada por (variable, modelo, período, método, versión);
+            # los períodos comunes se precalculan en segundo plano al cargar
+            pyramids = get_decomposition(selected_var, model, int(period), method)
+            if pyramids is None:
+                return {}
             
-            # Crear subplots
+            # Crear subplots (eje X compartido: el zoom aplica a los 4 paneles)
             fig = make_subplots(
                 rows=4, cols=1,
                 subplot_titles=('Serie Original', 'Tendencia', 'Estacionalidad', 'Residual'),
-                vertical_spacing=0.05
-            )
-            
-            # Serie original
-            fig.add_trace(
-                go.Scatter(x=series.index, y=series, name='Original', line=dict(color='#3b82f6')),
-                row=1, col=1
+                vertical_spacing=0.05,
+                shared_xaxes=True
             )
             
-            # Tendencia
-            fig.add_trace(
-                go.Scatter(x=decomposition.trend.index, y=decomposition.trend, name='Tendencia', line=dict(color='#10b981')),
-                row=2, col=1
-            )
-            
-            # Estacionalidad
-            fig.add_trace(
-                go.Scatter(x=decomposition.seasonal.index, y=decomposition.seasonal, name='Estacionalidad', line=dict(color='#f59e0b')),
-                row=3, col=1
-            )
-            
-            # Residual
-            fig.add_trace(
-                go.Scatter(x=decomposition.resid.index, y=decomposition.resid, name='Residual', line=dict(color='#ef4444')),
-                row=4, col=1
-            )
+            # Cada componente se reduce (pirámide + LTTB) al tramo visible
+            components = [
+                ('Original', '#3b82f6'),
+                ('Tendencia', '#10b981'),
+                ('Estacionalidad', '#f59e0b'),
+                ('Residual', '#ef4444'),
+            ]
+            for row, (pyramid, (name, color)) in enumerate(zip(pyramids, components), start=1):
+                x, y, _ = pyramid.window(start, end)
+                fig.add_trace(
+                    go.Scatter(x=x, y=y, name=name, line=dict(color=color)),
+                    row=row, col=1
+                )
             
             fig.update_layout(
                 height=800,
-                title_text=f"Descomposición {model.capitalize()} - {selected_var}",
+                title_text=f"Descomposición {model.capitalize()} ({'STL' if method == 'stl' else 'clásica'}) - {selected_var}",
                 template='plotly_dark',
                 plot_bgcolor='#1e293b',
                 paper_bgcolor='#1e293b',
                 font_color='white',
-                showlegend=False
+                showlegend=False,
+                uirevision=f"{selected_var}-{model}-{method}-{period}"
             )
+            if start is not None:
+                fig.update_xaxes(range=[start, end])
             
             return fig
             
         except Exception as e:
-            return go.Figure().add_annotation(
+            return uncached(go.Figure().add_annotation(
                 text=f"Error en descomposición: {str(e)}",
                 xref="paper", yref="paper",
                 x=0.5, y=0.5, xanchor='center', yanchor='middle',
                 showarrow=False
-            )
+            ))
     
     # Callback para estacionalidad
     @app.callback(
@@ -270,54 +303,49 @@ def register_callbacks(app):
         [Input('seasonality-variable-selector', 'value'),
          Input('seasonality-type', 'value')]
     )
+    @cached_callback('update_seasonality')
     def update_seasonality(selected_var, seasonality_type):
         if not selected_var:
             return {}
             
-        df_orig, df_imp, _ = get_data()
-        
-        if 'datetime' not in df_imp.columns:
+        x_label = SEASONALITY_LABELS.get(seasonality_type)
+        cube = get_aggregate_cube('imputed')
+        if x_label is None or cube is None or selected_var not in cube.columns:
             return {}
-            
-        df = df_imp.copy()
-        series = df.set_index('datetime')[selected_var].dropna()
         
-        if series.empty:
+        # Cajas precalculadas en el cubo (cuartiles, bigotes 1.5 IQR y una
+        # muestra acotada de atípicos por bucket): no se envían datos crudos
+        boxes = [(label, box) for label, box in cube.box(seasonality_type, selected_var) if box is not None]
+        if not boxes:
             return {}
+        labels = [label for label, _ in boxes]
+        stats = [box for _, box in boxes]
         
-        # Extraer componentes temporales según el tipo de estacionalidad
-        if seasonality_type == 'hour':
-            df['time_unit'] = df['datetime'].dt.hour
-            x_label = 'Hora del Día'
-        elif seasonality_type == 'dayofweek':
-            df['time_unit'] = df['datetime'].dt.dayofweek
-            x_label = 'Día de la Semana (0=Lunes, 6=Domingo)'
-        elif seasonality_type == 'month':
-            df['time_unit'] = df['datetime'].dt.month
-            x_label = 'Mes del Año'
-        elif seasonality_type == 'season':
-            # Definir estaciones: 1=Invierno, 2=Primavera, 3=Verano, 4=Otoño
-            df['month'] = df['datetime'].dt.month
-            conditions = [
-                (df['month'].isin([12, 1, 2])),
-                (df['month'].isin([3, 4, 5])),
-                (df['month'].isin([6, 7, 8])),
-                (df['month'].isin([9, 10, 11]))
-            ]
-            choices = ['Invierno', 'Primavera', 'Verano', 'Otoño']
-            df['time_unit'] = np.select(conditions, choices)
-            x_label = 'Estación del Año'
-        
-        # Crear boxplot para mostrar la distribución por unidad temporal
-        if seasonality_type == 'season':
-            fig = px.box(df, x='time_unit', y=selected_var, 
-                        title=f"Distribución de {selected_var} por {x_label}",
-                        category_orders={'time_unit': ['Invierno', 'Primavera', 'Verano', 'Otoño']})
-        else:
-            fig = px.box(df, x='time_unit', y=selected_var, 
-                        title=f"Distribución de {selected_var} por {x_label}")
-        
+        fig = go.Figure()
+        fig.add_trace(go.Box(
+            x=labels,
+            q1=[b['q1'] for b in stats],
+            median=[b['median'] for b in stats],
+            q3=[b['q3'] for b in stats],
+            lowerfence=[b['lowerfence'] for b in stats],
+            upperfence=[b['upperfence'] for b in stats],
+            boxpoints=False,
+            name=selected_var,
+            marker_color='#636efa',
+            showlegend=False
+        ))
+        outlier_x = [label for label, b in boxes for _ in range(len(b['outliers']))]
+        if outlier_x:
+            fig.add_trace(go.Scatter(
+                x=outlier_x,
+                y=np.concatenate([b['outliers'] for b in stats]),
+                mode='markers',
+                name='Atípicos',
+                marker=dict(color='#636efa', size=4),
+                showlegend=False
+            ))
         fig.update_layout(
+            title=f"Distribución de {selected_var} por {x_label}",
             template='plotly_dark',
             plot_bgcolor='#1e293b',
             paper_bgcolor='#1e293b',
@@ -336,53 +364,59 @@ def register_callbacks(app):
         Output('volatility-stats', 'children')],
         [Input('volatility-variable', 'value'),
         Input('volatility-window', 'value'),
-        Input('outlier-threshold', 'value')]
+        Input('outlier-threshold', 'value'),
+        Input('outlier-method', 'value'),
+        Input('volatility-plot', 'relayoutData')]
     )
-    def update_volatility_analysis(selected_var, window, threshold):
+    @cached_callback('update_volatility_analysis', use_trigger=True)
+    def update_volatility_analysis(selected_var, window, threshold, method, relayout_data):
         if not selected_var:
             return {}, {}, ""
         
-        df_orig, df_imp, _ = get_data()
+        # Zoom sobre el gráfico de volatilidad: solo se re-sirve ese gráfico
+        visible = None
+        if ctx.triggered_id == 'volatility-plot':
+            visible = relayout_x_range(relayout_data)
+            if visible is None:
+                return no_update, no_update, no_update
+        start, end = visible or (None, None)
         
-        if df_imp.empty or selected_var not in df_imp.columns or 'datetime' not in df_imp.columns:
+        # Puntajes de todos los métodos sobre las medias diarias, cacheados
+        # por (variable, ventana): el umbral y el método solo filtran
+        scores = get_outlier_scores(selected_var, window)
+        if scores is None:
             return {}, {}, html.Div("❌ Variable no disponible.")
+        method = method if method in OUTLIER_METHODS else DEFAULT_OUTLIER_METHOD
         
         try:
-            # Preparar datos
-            df_temp = df_imp[['datetime', selected_var]].copy()
-            df_temp = df_temp.set_index('datetime').sort_index()
-            
-            # Resample diario para mejor visualización
-            df_daily = df_temp.resample('D').mean().reset_index()
-            
-            # Calcular volatilidad (desviación estándar rolling)
-            df_daily['volatility'] = df_daily[selected_var].rolling(window=window).std()
-            
-            # Calcular z-score para outliers
-            mean_val = df_daily[selected_var].mean()
-            std_val = df_daily[selected_var].std()
-            df_daily['z_score'] = (df_daily[selected_var] - mean_val) / std_val
-            
-            # Identificar outliers
-            df_daily['is_outlier'] = abs(df_daily['z_score']) > threshold
+            outlier_idx = scores.outlier_indices(method, threshold)
             
             # GRÁFICO 1: Serie con volatilidad
             fig_volatility = go.Figure()
             
-            # Serie principal
+            # Serie principal: medias diarias en la vista completa; con zoom,
+            # la resolución que permita el tramo visible (hasta horaria)
+            pyramid = get_series_pyramid(selected_var)
+            x, y, _ = pyramid.window(start, end, level='daily' if start is None else None)
             fig_volatility.add_trace(go.Scatter(
-                x=df_daily['datetime'],
-                y=df_daily[selected_var],
+                x=x,
+                y=y,
                 mode='lines',
                 name=selected_var,
                 line=dict(color='#3b82f6', width=1),
                 opacity=0.7
             ))
             
-            # Banda de volatilidad (mean ± std)
+            # Banda de volatilidad (mean ± std), recortada al tramo visible
+            overall_mean = np.nanmean(scores.values)
+            band = slice(None)
+            if start is not None:
+                band = slice(np.searchsorted(scores.times, start, side='left'),
+                             np.searchsorted(scores.times, end, side='right'))
+            band_times, band_volatility = scores.times[band], scores.volatility[band]
             fig_volatility.add_trace(go.Scatter(
-                x=df_daily['datetime'],
-                y=df_daily[selected_var].mean() + df_daily['volatility'],
+                x=band_times,
+                y=overall_mean + band_volatility,
                 mode='lines',
                 name='Volatilidad +',
                 line=dict(color='#ef4444', width=1, dash='dash'),
@@ -390,8 +424,8 @@ def register_callbacks(app):
             ))
             
             fig_volatility.add_trace(go.Scatter(
-                x=df_daily['datetime'],
-                y=df_daily[selected_var].mean() - df_daily['volatility'],
+                x=band_times,
+                y=overall_mean - band_volatility,
                 mode='lines',
                 name='Volatilidad -',
                 line=dict(color='#ef4444', width=1, dash='dash'),
@@ -405,30 +439,33 @@ def register_callbacks(app):
                 plot_bgcolor='#1e293b',
                 paper_bgcolor='#1e293b',
                 font_color='white',
-                height=400
+                height=400,
+                uirevision=f"{selected_var}-{window}"
             )
+            if start is not None:
+                fig_volatility.update_xaxes(range=[start, end])
+                return fig_volatility, no_update, no_update
             
             # GRÁFICO 2: Eventos extremos
             fig_outliers = go.Figure()
             
-            # Puntos normales
-            normal_data = df_daily[~df_daily['is_outlier']]
+            # Serie de fondo reducida con LTTB
+            base_x, base_y = scores.baseline
             fig_outliers.add_trace(go.Scatter(
-                x=normal_data['datetime'],
-                y=normal_data[selected_var],
+                x=base_x,
+                y=base_y,
                 mode='markers',
-                name='Valores normales',
+                name='Valores diarios',
                 marker=dict(color='#3b82f6', size=4),
                 opacity=0.6
             ))
             
             # Outliers
-            outlier_data = df_daily[df_daily['is_outlier']]
             fig_outliers.add_trace(go.Scatter(
-                x=outlier_data['datetime'],
-                y=outlier_data[selected_var],
+                x=scores.times[outlier_idx],
+                y=scores.values[outlier_idx],
                 mode='markers',
-                name=f'Outliers (> {threshold}σ)',
+                name=f'Outliers (> {threshold}σ, {OUTLIER_METHODS[method]})',
                 marker=dict(color='#ef4444', size=8, line=dict(width=2, color='white')),
                 opacity=0.8
             ))
@@ -443,12 +480,13 @@ def register_callbacks(app):
             )
             
             # ESTADÍSTICAS
-            outliers_count = df_daily['is_outlier'].sum()
-            total_count = len(df_daily)
-            outlier_percentage = (outliers_count / total_count) * 100
+            outliers_count = len(outlier_idx)
+            total_count = scores.valid_count
+            outlier_percentage = (outliers_count / total_count) * 100 if total_count else 0.0
             
-            max_volatility = df_daily['volatility'].max()
-            avg_volatility = df_daily['volatility'].mean()
+            volatility = pd.Series(scores.volatility)
+            max_volatility = volatility.max()
+            avg_volatility = volatility.mean()
             
             stats_content = html.Div([
                 html.Div([
@@ -471,6 +509,7 @@ def register_callbacks(app):
                         html.P(f"Total de puntos: {total_count}"),
                         html.P(f"Porcentaje de outliers: {outlier_percentage:.1f}%"),
                         html.P(f"Umbral: {threshold} desviaciones estándar"),
+                        html.P(f"Método: {OUTLIER_METHODS[method]}"),
                     ], style={
                         'backgroundColor': '#1e293b',
                         'padding': '15px',
@@ -506,4 +545,4 @@ def register_callbacks(app):
                 template='plotly_dark',
                 height=400
             )
-            return error_fig, error_fig, html.Div(f"❌ Error: {str(e)}")
\ No newline at end of file
+            return uncached(error_fig, error_fig, html.Div(f"❌ Error: {str(e)}"))
\ No newline at end of file
@@ -1,19 +1,21 @@
 # pages/univariate.py - VERSIÓN CORREGIDA
-from dash import dcc, html, Input, Output, callback, dash_table
-import plotly.express as px
+from dash import dcc, html, Input, Output, callback, dash_table, ctx, no_update
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.stattools import adfuller, kpss
 from statsmodels.graphics.tsaplots import plot_acf, plot_pacf
 import matplotlib.pyplot as plt
 import io
 import base64
 
-from utils.data_loader import get_data
-
-# Obtener datos
-df_original, df_imputed, analysis_cols = get_data()
+from utils.data_loader import (get_data, get_aggregate_cube, get_series_pyramid, get_sorted_values,
+                               get_autocorrelation, get_stationarity_result)
+from utils.aggregates import histogram_from_sorted, box_stats_from_sorted
+from utils.autocorrelation import ACF_MAX_LAGS, slice_lags
+from utils.downsampling import relayout_x_range, lttb_indices, LEVEL_LABELS, PLOT_POINT_BUDGET
+from utils.rolling import ROLLING_WINDOWS, DEFAULT_ROLLING_WINDOW, hourly_grid, rolling_mean_std
+from utils.figure_cache import cached_callback, uncached
 
 # Layout principal de análisis univariado
 layout = html.Div([
@@ -52,6 +54,8 @@ layout = html.Div([
 
 def render_distributions():
     """Pestaña de distribuciones"""
+    df_original, df_imputed, analysis_cols = get_data()
+    
     return html.Div([
         html.H3("📊 Distribuciones de Variables", style={'color': '#ffffff'}),
         html.P("Selecciona una variable para ver su distribución:"),
@@ -73,6 +77,8 @@ def render_distributions():
 
 def render_timeseries():
     """Pestaña de series temporales univariadas"""
+    df_original, df_imputed, analysis_cols = get_data()
+    
     if 'datetime' not in df_imputed.columns or df_imputed.empty:
         return html.Div([
             html.H3("📈 Series Temporales Individuales", style={'color': '#ffffff'}),
@@ -97,7 +103,9 @@ def render_timeseries():
     ])
 
 def render_stationarity():
-    """Pestaña de estacionariedad - Versión visual liviana"""
+    """Pestaña de estacionariedad - Métricas visuales + ADF/KPSS en segundo plano"""
+    df_original, df_imputed, analysis_cols = get_data()
+    
     return html.Div([
         html.H3("📊 Análisis Visual de Estacionariedad", style={'color': '#ffffff'}),
         html.P("🔍 Evaluación mediante gráficos y métricas simples", 
@@ -110,19 +118,33 @@ def render_stationarity():
                 options=[{'label': col, 'value': col} for col in analysis_cols],
                 value='PM2.5' if 'PM2.5' in analysis_cols else analysis_cols[0],
                 style={'width': '300px', 'color': '#000000'}
+            ),
+            html.Label("Ventana móvil:", style={'color': '#ffffff', 'marginRight': '10px', 'marginLeft': '20px'}),
+            dcc.Dropdown(
+                id='stationarity-window',
+                options=[{'label': label, 'value': hours} for hours, label in ROLLING_WINDOWS.items()],
+                value=DEFAULT_ROLLING_WINDOW,
+                clearable=False,
+                style={'width': '200px', 'color': '#000000'}
             )
-        ], style={'marginBottom': '20px'}),
+        ], style={'marginBottom': '20px', 'display': 'flex', 'alignItems': 'center'}),
         
         # Gráficos de análisis visual
         dcc.Graph(id='rolling-stats-plot'),
         dcc.Graph(id='seasonal-pattern-plot'),
         
         # Métricas visuales
-        html.Div(id='visual-stationarity-metrics', style={'marginTop': '20px'})
+        html.Div(id='visual-stationarity-metrics', style={'marginTop': '20px'}),
+        
+        # Pruebas formales (ADF/KPSS), calculadas en segundo plano
+        html.Div(id='formal-stationarity-tests', style={'marginTop': '20px'}),
+        dcc.Interval(id='stationarity-interval', interval=2000, n_intervals=0)
     ])
 
 def render_autocorrelation():
     """Pestaña de autocorrelación"""
+    df_original, df_imputed, analysis_cols = get_data()
+    
     if 'datetime' not in df_imputed.columns or df_imputed.empty:
         return html.Div([
             html.H3("🔄 Análisis de Autocorrelación", style={'color': '#ffffff'}),
@@ -147,10 +169,10 @@ def render_autocorrelation():
         dcc.Slider(
             id='acf-lags-slider',
             min=10,
-            max=100,
+            max=ACF_MAX_LAGS,
             step=5,
             value=40,
-            marks={i: str(i) for i in range(10, 101, 10)},
+            marks={i: str(i) for i in range(10, ACF_MAX_LAGS + 1, 10)},
         ),
         
         html.Div([
@@ -159,6 +181,84 @@ def render_autocorrelation():
         ], style={'display': 'flex', 'flexDirection': 'column', 'gap': '20px'})
     ])
 
+def _stationarity_tests_block(result):
+    """Tarjetas con el resultado de ADF y KPSS"""
+    if 'error' in result:
+        return html.Div(f"❌ Pruebas formales no disponibles: {result['error']}", style={'color': '#ef4444'})
+    
+    verdict_colors = {
+        'estacionaria': '#10b981',
+        'no estacionaria': '#ef4444',
+        'estacionaria en tendencia': '#f59e0b',
+        'estacionaria en diferencias': '#f59e0b',
+    }
+    card_style = {
+        'backgroundColor': '#1e293b',
+        'padding': '15px',
+        'borderRadius': '8px',
+        'flex': 1,
+        'margin': '5px'
+    }
+    adf, kpss_res = result['adf'], result['kpss']
+    
+    return html.Div([
+        html.H4("🧪 Pruebas Formales de Estacionariedad", style={'color': '#ffffff'}),
+        html.Div([
+            html.Div([
+                html.H5("ADF (H0: raíz unitaria)", style={'color': '#3b82f6'}),
+                html.P(f"Estadístico: {adf['stat']:.4f}"),
+                html.P(f"Valor p: {adf['pvalue']:.4g}"),
+                html.P(f"Lags: {adf['lags']}"),
+                html.P("Críticos: " + ", ".join(f"{k}: {v:.3f}" for k, v in adf['critical'].items()),
+                       style={'color': '#94a3b8', 'fontSize': '12px'}),
+            ], style=card_style),
+            html.Div([
+                html.H5("KPSS (H0: estacionaria)", style={'color': '#3b82f6'}),
+                html.P(f"Estadístico: {kpss_res['stat']:.4f}"),
+                html.P(f"Valor p: {kpss_res['pvalue']:.4g}"),
+                html.P(f"Lags: {kpss_res['lags']}"),
+                html.P("Críticos: " + ", ".join(f"{k}: {v:.3f}" for k, v in kpss_res['critical'].items()),
+                       style={'color': '#94a3b8', 'fontSize': '12px'}),
+            ], style=card_style),
+            html.Div([
+                html.H5("🔍 Conclusión", style={'color': '#3b82f6'}),
+                html.P(result['verdict'].upper(),
+                       style={'color': verdict_colors.get(result['verdict'], '#ffffff'),
+                              'fontWeight': 'bold', 'fontSize': '16px'}),
+                html.P(f"α = 0.05 sobre {result['nobs']} observaciones", 
+                       style={'color': '#94a3b8', 'fontSize': '12px'}),
+            ], style=card_style),
+        ], style={'display': 'flex', 'gap': '10px'}),
+    ])
+
+def _add_confidence_band(fig, lags_range, band):
+    """Banda de confianza del 95% alrededor de cero (como plot_acf)"""
+    fig.add_trace(go.Scatter(
+        x=lags_range[1:], y=band[1:], mode='lines', line=dict(width=0),
+        showlegend=False, hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=lags_range[1:], y=-band[1:], mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor='rgba(148, 163, 184, 0.25)',
+        name='IC 95%', hoverinfo='skip'
+    ))
+
+def _distribution_figure(selected_var):
+    """Histograma con bins calculados en el servidor a partir de los valores ordenados"""
+    edges, counts = histogram_from_sorted(get_sorted_values('imputed', selected_var), nbins=40)
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+        name=selected_var, showlegend=False, marker_color='#636efa',
+        hovertemplate='%{x}<br>count=%{y}<extra></extra>'
+    ))
+    fig.update_layout(
+        title=f'Distribución de {selected_var}',
+        template='plotly_dark',
+        bargap=0,
+        height=400
+    )
+    return fig
+
 def register_callbacks(app):
     from utils.data_loader import get_data
     
@@ -184,6 +284,7 @@ def register_callbacks(app):
          Output('distribution-stats', 'children')],
         Input('dist-variable-selector', 'value')
     )
+    @cached_callback('update_distribution')
     def update_distribution(selected_var):
         if not selected_var:
             return {}, ""
@@ -193,28 +294,57 @@ def register_callbacks(app):
         if df_imp.empty or selected_var not in df_imp.columns:
             return {}, ""
             
-        data = df_imp[selected_var].dropna()
+        # Valores ordenados (cacheados por versión): bins y cuartiles salen
+        # por búsqueda binaria y la respuesta no crece con el número de filas
+        data = get_sorted_values('imputed', selected_var)
         
         if len(data) == 0:
             return {}, html.Div("No hay datos disponibles para esta variable.")
         
-        # Crear histograma
-        fig = px.histogram(
-            data, x=data, nbins=40, 
-            title=f"Distribución de {selected_var}",
-            marginal="box",
-            template='plotly_dark'
-        )
+        edges, counts = histogram_from_sorted(data, nbins=40)
+        box = box_stats_from_sorted(data)
+        
+        # Histograma (barras) con caja marginal, como px.histogram(marginal='box')
+        fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
+                            row_heights=[0.2, 0.8], vertical_spacing=0.02)
+        fig.add_trace(go.Box(
+            q1=[box['q1']], median=[box['median']], q3=[box['q3']],
+            lowerfence=[box['lowerfence']], upperfence=[box['upperfence']],
+            mean=[box['mean']], y=[selected_var], orientation='h',
+            boxpoints=False, name=selected_var, showlegend=False,
+            marker_color='#636efa'
+        ), row=1, col=1)
+        if len(box['outliers']):
+            fig.add_trace(go.Scatter(
+                x=box['outliers'], y=[selected_var] * len(box['outliers']),
+                mode='markers', name=f"Atípicos ({box['n_outliers']})",
+                marker=dict(color='#636efa', size=4), showlegend=False
+            ), row=1, col=1)
+        fig.add_trace(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+            name=selected_var, showlegend=False, marker_color='#636efa',
+            hovertemplate='%{x}<br>count=%{y}<extra></extra>'
+        ), row=2, col=1)
         fig.update_layout(
+            title=f"Distribución de {selected_var}",
+            template='plotly_dark',
+            bargap=0,
             plot_bgcolor='#1e293b',
             paper_bgcolor='#1e293b',
             font_color='white',
             height=500
         )
+        fig.update_yaxes(title_text='count', row=2, col=1)
+        fig.update_yaxes(showticklabels=False, row=1, col=1)
+        fig.update_xaxes(title_text=selected_var, row=2, col=1)
         
-        # Estadísticas
-        stats_df = df_imp[selected_var].describe().reset_index()
-        stats_df.columns = ['Estadístico', 'Valor']
+        # Estadísticas (mismas filas que describe())
+        stats_df = pd.DataFrame({
+            'Estadístico': ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+            'Valor': [float(len(data)), box['mean'],
+                      float(data.std(ddof=1)) if len(data) > 1 else np.nan,
+                      float(data[0]), box['q1'], box['median'], box['q3'], float(data[-1])],
+        })
         
         stats_table = dash_table.DataTable(
             data=stats_df.to_dict('records'),
@@ -238,40 +368,55 @@ def register_callbacks(app):
             stats_table
         ])
     
-    # Callback para actualizar series temporales
+    # Callback para actualizar series temporales (re-consulta la ventana visible al hacer zoom)
     @app.callback(
         Output('timeseries-plot', 'figure'),
-        Input('ts-variable-selector', 'value')
+        [Input('ts-variable-selector', 'value'),
+         Input('timeseries-plot', 'relayoutData')]
     )
-    def update_timeseries(selected_var):
+    @cached_callback('update_timeseries', use_trigger=True)
+    def update_timeseries(selected_var, relayout_data):
         if not selected_var:
             return {}
-            
-        df_orig, df_imp, _ = get_data()
         
-        if df_imp.empty or selected_var not in df_imp.columns or 'datetime' not in df_imp.columns:
+        # Vista completa al cambiar de variable; con zoom, solo el tramo visible
+        visible = None
+        if ctx.triggered_id == 'timeseries-plot':
+            visible = relayout_x_range(relayout_data)
+            if visible is None:
+                return no_update
+        start, end = visible or (None, None)
+        
+        pyramid = get_series_pyramid(selected_var)
+        if pyramid is None:
             return {}
         
         try:
-            # Resample diario para mejor visualización
-            dfts = df_imp.set_index('datetime').resample('D')[selected_var].mean().reset_index()
+            # Vista inicial con medias diarias; al hacer zoom, la resolución según el tramo
+            level = 'daily' if start is None else None
+            x, y, level = pyramid.window(start, end, level=level)
             
-            fig = px.line(
-                dfts, x='datetime', y=selected_var, 
-                title=f"Serie Temporal Diaria de {selected_var}",
-                template='plotly_dark'
-            )
+            fig = go.Figure(go.Scatter(x=x, y=y, mode='lines', name=selected_var,
+                                       line=dict(color='#636efa')))
             fig.update_layout(
+                title=f"Serie Temporal {LEVEL_LABELS[level]} de {selected_var}",
+                template='plotly_dark',
                 plot_bgcolor='#1e293b',
                 paper_bgcolor='#1e293b',
                 font_color='white',
-                height=500
+                height=500,
+                xaxis_title='datetime',
+                yaxis_title=selected_var,
+                # Conservar el zoom del usuario mientras no cambie la variable
+                uirevision=selected_var
             )
+            if start is not None:
+                fig.update_xaxes(range=[start, end])
             
             return fig
         except Exception as e:
             print(f"Error en update_timeseries: {e}")
-            return {}
+            return uncached({})
     
     # Callback para tests de estacionariedad
     # Callback para análisis visual de estacionariedad
@@ -279,9 +424,11 @@ def register_callbacks(app):
         [Output('rolling-stats-plot', 'figure'),
         Output('seasonal-pattern-plot', 'figure'),
         Output('visual-stationarity-metrics', 'children')],
-        Input('stationarity-variable-selector', 'value')
+        [Input('stationarity-variable-selector', 'value'),
+         Input('stationarity-window', 'value')]
     )
-    def update_visual_stationarity(selected_var):
+    @cached_callback('update_visual_stationarity')
+    def update_visual_stationarity(selected_var, window):
         if not selected_var:
             return {}, {}, ""
         
@@ -290,7 +437,12 @@ def register_callbacks(app):
         if df_imp.empty or selected_var not in df_imp.columns:
             return {}, {}, ""
         
-        data = df_imp[selected_var].dropna()
+        # Serie completa en orden temporal (nivel horario de la pirámide, sin NaN)
+        pyramid = get_series_pyramid(selected_var)
+        if pyramid is None:
+            return {}, {}, ""
+        times, values = pyramid.level('hourly')
+        data = pd.Series(values, index=times)
         
         if len(data) < 100:
             empty_fig = go.Figure()
@@ -302,30 +454,28 @@ def register_callbacks(app):
             return empty_fig, empty_fig, "❌ Datos insuficientes para análisis"
         
         try:
-            # Sample para hacerlo más liviano (máximo 5000 puntos)
-            if len(data) > 5000:
-                data = data.sample(5000, random_state=42)
-            
             # --- GRÁFICO 1: Estadísticas Móviles ---
             fig_rolling = go.Figure()
             
-            # Calcular ventana adaptativa
-            window_size = min(168, len(data)//10)  # Máximo 1 semana, mínimo 10% de datos
-            
-            # Media móvil
-            rolling_mean = data.rolling(window=window_size, center=True).mean()
-            # Desviación estándar móvil
-            rolling_std = data.rolling(window=window_size, center=True).std()
+            # Media y desviación móviles en O(n) sobre una grilla horaria:
+            # la ventana cubre `window_size` horas aunque falten datos
+            window_size = int(window or DEFAULT_ROLLING_WINDOW)
+            window_label = ROLLING_WINDOWS.get(window_size, f"{window_size} h")
+            grid_times, grid_values = hourly_grid(times, values)
+            mean_values, std_values = rolling_mean_std(grid_values, window_size)
+            valid = ~np.isnan(mean_values)
+            grid_times, mean_values, std_values = grid_times[valid], mean_values[valid], std_values[valid]
             
-            # Serie original (muestreada para mejor visualización)
-            if len(data) > 1000:
-                display_data = data.iloc[::len(data)//1000]
-            else:
-                display_data = data
+            # Reducción para graficar: LTTB sobre la media, la banda usa los mismos puntos
+            keep = lttb_indices(grid_times.astype(np.int64).astype(np.float64), mean_values, PLOT_POINT_BUDGET)
+            rolling_times = grid_times[keep]
+            rolling_mean = mean_values[keep]
+            rolling_std = std_values[keep]
+            display_times, display_values, _ = pyramid.window()
             
             fig_rolling.add_trace(go.Scatter(
-                x=display_data.index,
-                y=display_data,
+                x=display_times,
+                y=display_values,
                 mode='lines',
                 name='Serie Original',
                 line=dict(color='#3b82f6', width=1),
@@ -333,16 +483,16 @@ def register_callbacks(app):
             ))
             
             fig_rolling.add_trace(go.Scatter(
-                x=rolling_mean.index,
+                x=rolling_times,
                 y=rolling_mean,
                 mode='lines',
-                name=f'Media Móvil ({window_size} puntos)',
+                name=f'Media Móvil ({window_label})',
                 line=dict(color='#ef4444', width=3)
             ))
             
             # Banda de desviación estándar
             fig_rolling.add_trace(go.Scatter(
-                x=rolling_mean.index,
+                x=rolling_times,
                 y=rolling_mean + rolling_std,
                 mode='lines',
                 line=dict(width=0),
@@ -350,7 +500,7 @@ def register_callbacks(app):
             ))
             
             fig_rolling.add_trace(go.Scatter(
-                x=rolling_mean.index,
+                x=rolling_times,
                 y=rolling_mean - rolling_std,
                 mode='lines',
                 fill='tonexty',
@@ -371,13 +521,12 @@ def register_callbacks(app):
             # --- GRÁFICO 2: Patrones Estacionales ---
             fig_seasonal = go.Figure()
             
-            # Extraer componentes temporales si existe datetime
-            if 'datetime' in df_imp.columns:
+            # Patrones desde el cubo de agregados precalculado
+            cube = get_aggregate_cube('imputed')
+            if cube is not None and selected_var in cube.columns:
                 try:
-                    # Agrupar por hora del día para ver patrón diario
-                    df_temp = df_imp.copy()
-                    df_temp['hour'] = pd.to_datetime(df_temp['datetime']).dt.hour
-                    hourly_pattern = df_temp.groupby('hour')[selected_var].mean()
+                    # Media por hora del día para ver patrón diario
+                    hourly_pattern = cube.series('hour', selected_var, 'mean')
                     
                     fig_seasonal.add_trace(go.Scatter(
                         x=hourly_pattern.index,
@@ -388,9 +537,8 @@ def register_callbacks(app):
                         marker=dict(size=6)
                     ))
                     
-                    # Agrupar por mes para ver patrón anual
-                    df_temp['month'] = pd.to_datetime(df_temp['datetime']).dt.month
-                    monthly_pattern = df_temp.groupby('month')[selected_var].mean()
+                    # Media por mes para ver patrón anual
+                    monthly_pattern = cube.series('month', selected_var, 'mean')
                     
                     fig_seasonal.add_trace(go.Scatter(
                         x=monthly_pattern.index,
@@ -411,20 +559,10 @@ def register_callbacks(app):
                     
                 except Exception as e:
                     # Fallback: gráfico de distribución
-                    fig_seasonal = px.histogram(
-                        data, x=data, 
-                        title=f'Distribución de {selected_var}',
-                        template='plotly_dark'
-                    )
-                    fig_seasonal.update_layout(height=400)
+                    fig_seasonal = _distribution_figure(selected_var)
             else:
                 # Sin datos temporales, mostrar distribución
-                fig_seasonal = px.histogram(
-                    data, x=data, 
-                    title=f'Distribución de {selected_var}',
-                    template='plotly_dark'
-                )
-                fig_seasonal.update_layout(height=400)
+                fig_seasonal = _distribution_figure(selected_var)
             
             # --- MÉTRICAS VISUALES ---
             # Calcular métricas simples
@@ -525,7 +663,24 @@ def register_callbacks(app):
                 template='plotly_dark',
                 height=300
             )
-            return error_fig, error_fig, html.Div(f"❌ Error: {str(e)}", style={'color': '#ef4444'})
+            return uncached(error_fig, error_fig, html.Div(f"❌ Error: {str(e)}", style={'color': '#ef4444'}))
+    
+    # Pruebas ADF/KPSS: se consultan hasta que el pool de fondo las termine
+    @app.callback(
+        [Output('formal-stationarity-tests', 'children'),
+         Output('stationarity-interval', 'disabled')],
+        [Input('stationarity-variable-selector', 'value'),
+         Input('stationarity-interval', 'n_intervals')]
+    )
+    def update_formal_stationarity(selected_var, n_intervals):
+        if not selected_var:
+            return "", True
+        
+        result = get_stationarity_result(selected_var)
+        if result is None:
+            return html.P("⏳ Calculando pruebas ADF y KPSS en segundo plano...",
+                          style={'color': '#94a3b8'}), False
+        return _stationarity_tests_block(result), True
     
     # Callback para autocorrelación
     @app.callback(
@@ -534,28 +689,21 @@ def register_callbacks(app):
         [Input('acf-variable-selector', 'value'),
          Input('acf-lags-slider', 'value')]
     )
+    @cached_callback('update_autocorrelation')
     def update_autocorrelation(selected_var, lags):
         if not selected_var:
             return {}, {}
             
-        df_orig, df_imp, _ = get_data()
+        # ACF/PACF calculadas una vez por variable hasta ACF_MAX_LAGS;
+        # mover el slider solo recorta
+        full = get_autocorrelation(selected_var)
         
-        if df_imp.empty or selected_var not in df_imp.columns:
-            return {}, {}
-        
-        data = df_imp[selected_var].dropna()
-        
-        if len(data) < lags:
+        if full is None or full['nobs'] <= lags:
             return {}, {}
         
         try:
-            # Crear figura ACF con Plotly
-            from statsmodels.tsa.stattools import acf, pacf
-            
-            # Calcular ACF y PACF
-            acf_values = acf(data, nlags=lags)
-            pacf_values = pacf(data, nlags=lags)
-            
+            result = slice_lags(full, lags)
+            acf_values, pacf_values = result['acf'], result['pacf']
             lags_range = list(range(len(acf_values)))
             
             # Crear gráfico ACF
@@ -566,6 +714,7 @@ def register_callbacks(app):
                 name='ACF',
                 marker_color='#3b82f6'
             ))
+            _add_confidence_band(acf_fig, lags_range, result['acf_band'])
             acf_fig.update_layout(
                 title=f'Función de Autocorrelación (ACF) - {selected_var}',
                 xaxis_title='Lag',
@@ -585,6 +734,7 @@ def register_callbacks(app):
                 name='PACF',
                 marker_color='#10b981'
             ))
+            _add_confidence_band(pacf_fig, lags_range, result['pacf_band'])
             pacf_fig.update_layout(
                 title=f'Función de Autocorrelación Parcial (PACF) - {selected_var}',
                 xaxis_title='Lag',
@@ -610,4 +760,4 @@ def register_callbacks(app):
                 font_color='white',
                 height=400
             )
-            return empty_fig, empty_fig
\ No newline at end of file
+            return uncached(empty_fig, empty_fig)
\ No newline at end of file
@@ -0,0 +1,67 @@
+# tests/test_copy_parser.py - Parser de COPY CSV contra un volcado grabado
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import Column, Float, Integer, MetaData, Table, Text, create_engine
+
+from utils.database import _numpy_dtype, load_table, parse_copy_csv
+
+# Salida de COPY prsa_data_dongsi TO STDOUT WITH (FORMAT csv, HEADER true, NULL '\N')
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'prsa_dongsi_copy.csv')
+
+# Mismo esquema que la tabla en PostgreSQL
+metadata = MetaData()
+prsa_table = Table(
+    'prsa_data_dongsi', metadata,
+    Column('No', Integer), Column('year', Integer), Column('month', Integer),
+    Column('day', Integer), Column('hour', Integer), Column('PM2.5', Float),
+    Column('TEMP', Float), Column('wd', Text), Column('station', Text),
+)
+ROWS = [
+    (1, 2013, 3, 1, 0, 4.0, -0.7, 'NNW', 'Dongsi'),
+    (2, 2013, 3, 1, 1, None, -1.1, '', 'Dongsi'),
+    (3, 2013, 3, 1, 2, None, -1.1, None, 'Dongsi'),
+    (4, 2013, 3, 1, 3, 6.0, -1.4, 'NW', 'Dongsi'),
+]
+
+
+def _parse_fixture():
+    dtypes = {col.name: _numpy_dtype(col.type) for col in prsa_table.columns}
+    with open(FIXTURE, 'rb') as stream:
+        return parse_copy_csv(stream, dtypes)
+
+
+@pytest.fixture
+def sql_frame(tmp_path, monkeypatch):
+    """La misma tabla cargada con method='sql' desde SQLite (sustituto de PostgreSQL)"""
+    url = f"sqlite:///{tmp_path / 'prsa.db'}"
+    engine = create_engine(url)
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(prsa_table.insert(), [dict(zip(prsa_table.columns.keys(), row)) for row in ROWS])
+    engine.dispose()
+    monkeypatch.setenv('DATABASE_URL', url)
+    return load_table('prsa_data_dongsi', method='sql')
+
+
+def test_quoted_empty_string_is_kept():
+    df = _parse_fixture()
+    assert df.loc[1, 'wd'] == ''
+
+
+def test_null_marker_and_nan_are_null():
+    df = _parse_fixture()
+    assert np.isnan(df.loc[1, 'PM2.5'])
+    assert np.isnan(df.loc[2, 'PM2.5'])
+    assert pd.isna(df.loc[2, 'wd'])
+    assert df['PM2.5'].notna().tolist() == [True, False, False, True]
+
+
+def test_dtypes_match_sql_path(sql_frame):
+    df = _parse_fixture()
+    assert list(df.columns) == list(sql_frame.columns)
+    assert df.dtypes.to_dict() == sql_frame.dtypes.to_dict()
+    pd.testing.assert_frame_equal(df.drop(columns='wd'), sql_frame.drop(columns='wd'))
+    assert df['wd'].isna().tolist() == sql_frame['wd'].isna().tolist()
@@ -0,0 +1,59 @@
+# tests/test_figure_cache.py - Nivel en disco de la caché de figuras
+import os
+
+from utils.figure_cache import FigureCache, make_key
+
+
+def _disk_keys(cache):
+    return sorted(name[:-len('.json')] for name in os.listdir(cache.directory))
+
+
+def test_new_version_prunes_previous_versions(tmp_path):
+    cache = FigureCache(directory=str(tmp_path))
+    old = [make_key('cb', 'v1', [i]) for i in range(3)]
+    for key in old:
+        cache.put(key, '{}')
+    assert _disk_keys(cache) == sorted(old)
+
+    new = make_key('cb', 'v2', [0])
+    cache.put(new, '{}')
+    assert _disk_keys(cache) == [new]
+
+
+def test_size_cap_removes_least_recently_used(tmp_path):
+    cache = FigureCache(directory=str(tmp_path), disk_max_bytes=250)
+    keys = [make_key('cb', 'v1', [i]) for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, 'x' * 100)
+        # mtime creciente: keys[0] es el más antiguo
+        os.utime(cache._disk_path(key), (age, age))
+    cache.prune_disk()
+    assert _disk_keys(cache) == sorted(keys[1:])
+
+
+def test_clear_empties_disk(tmp_path):
+    cache = FigureCache(directory=str(tmp_path))
+    key = make_key('cb', 'v1', [])
+    cache.put(key, '{}')
+    cache.clear()
+    assert cache.get(key) is None
+    assert _disk_keys(cache) == []
+
+
+def test_uncached_outputs_are_not_stored(monkeypatch):
+    from utils import figure_cache as fc
+    monkeypatch.setattr(fc, 'get_data_version', lambda: 'v1')
+    monkeypatch.setattr(fc, 'FIGURE_CACHE_ENABLED', True)
+    calls = []
+
+    @fc.cached_callback('flaky', cache=FigureCache())
+    def flaky(x):
+        calls.append(x)
+        if len(calls) == 1:
+            return fc.uncached({'error': 'transitorio'}, '')
+        return {'data': []}, 'ok'
+
+    assert flaky(1) == ({'error': 'transitorio'}, '')
+    assert flaky(1) == ({'data': []}, 'ok')
+    assert flaky(1) == ({'data': []}, 'ok')
+    assert len(calls) == 2
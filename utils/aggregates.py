@@ -0,0 +1,250 @@
+# utils/aggregates.py - Cubo de agregados por variable y unidad de calendario
+import numpy as np
+import pandas as pd
+
+# Dimensiones de calendario del cubo
+CALENDAR_DIMENSIONS = ('hour', 'dayofweek', 'month', 'season', 'year')
+# Estaciones del año: 0=Invierno (dic-feb), 1=Primavera, 2=Verano, 3=Otoño
+SEASON_LABELS = ['Invierno', 'Primavera', 'Verano', 'Otoño']
+# Cuantiles guardados por bucket y su nombre en stat()
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+QUANTILE_NAMES = ('q05', 'q25', 'median', 'q75', 'q95')
+
+_BASE_STATS = ('count', 'sum', 'sumsq', 'min', 'max')
+# Atípicos guardados por bucket en las cajas del cubo
+BOX_OUTLIERS_PER_BUCKET = 50
+
+
+def calendar_keys(datetimes):
+    """Componentes de calendario (arrays enteros) de una columna datetime
+
+    Retorna (keys, valid): keys es un dict {dimensión: array} calculado solo
+    sobre las filas con fecha válida (valid).
+    """
+    idx = pd.DatetimeIndex(datetimes)
+    valid = ~np.asarray(idx.isna())
+    idx = idx[valid]
+    month = idx.month.to_numpy(dtype=np.int64)
+    keys = {
+        'hour': idx.hour.to_numpy(dtype=np.int64),
+        'dayofweek': idx.dayofweek.to_numpy(dtype=np.int64),
+        'month': month,
+        'season': (month % 12) // 3,
+        'year': idx.year.to_numpy(dtype=np.int64),
+    }
+    return keys, valid
+
+def _bucket_codes(dim, keys):
+    """Etiquetas del bucket y código 0..n-1 de cada fila"""
+    values = keys[dim]
+    if dim == 'hour':
+        return np.arange(24), values
+    if dim == 'dayofweek':
+        return np.arange(7), values
+    if dim == 'month':
+        return np.arange(1, 13), values - 1
+    if dim == 'season':
+        return np.array(SEASON_LABELS, dtype=object), values
+    if dim == 'year':
+        if len(values) == 0:
+            return np.array([], dtype=np.int64), values
+        first = values.min()
+        return np.arange(first, values.max() + 1), values - first
+    raise ValueError(f"Dimensión desconocida: {dim}")
+
+
+class AggregateCube:
+    """Estadísticos precalculados por variable × bucket de calendario
+
+    Para cada dimensión guarda count, sum, sumsq, min, max, los cuantiles de
+    QUANTILES y una caja de Tukey con atípicos acotados; media, varianza y
+    desviación se derivan al consultar. Las consultas cuestan O(buckets),
+    independiente del número de filas.
+    """
+
+    def __init__(self, columns, dimensions):
+        self.columns = list(columns)
+        self._dims = dimensions
+
+    @classmethod
+    def build(cls, df, columns, mask=None, datetime_col='datetime'):
+        """Construir el cubo a partir de un DataFrame horario
+
+        mask (opcional) restringe las filas usadas, p. ej. a las que tienen
+        varias variables presentes a la vez.
+        """
+        columns = [c for c in columns if c in df.columns]
+        keys, valid = calendar_keys(df[datetime_col])
+        if mask is not None:
+            keep = np.asarray(mask, dtype=bool)[valid]
+            keys = {dim: values[keep] for dim, values in keys.items()}
+            valid = valid.copy()
+            valid[valid] = keep
+
+        block = np.empty((int(valid.sum()), len(columns)), dtype=np.float64)
+        for j, col in enumerate(columns):
+            block[:, j] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)[valid]
+        ok = ~np.isnan(block)
+        filled = np.where(ok, block, 0.0)
+        # Orden por valor de cada variable (NaN al final), compartido por todas las dimensiones
+        value_order = np.argsort(np.ascontiguousarray(block.T), axis=1)
+
+        dimensions = {}
+        for dim in CALENDAR_DIMENSIONS:
+            labels, codes = _bucket_codes(dim, keys)
+            dimensions[dim] = cls._aggregate(labels, codes, block, ok, filled, value_order)
+        return cls(columns, dimensions)
+
+    @staticmethod
+    def _aggregate(labels, codes, block, ok, filled, value_order):
+        nb, nv = len(labels), block.shape[1]
+        stats = {
+            'labels': labels,
+            'rows': np.bincount(codes, minlength=nb)[:nb],
+            'count': np.zeros((nb, nv), dtype=np.int64),
+            'sum': np.zeros((nb, nv)),
+            'sumsq': np.zeros((nb, nv)),
+            'min': np.full((nb, nv), np.nan),
+            'max': np.full((nb, nv), np.nan),
+            'quantiles': np.full((nb, len(QUANTILES), nv), np.nan),
+            'box': [[None] * nb for _ in range(nv)],
+        }
+        if nb == 0 or len(codes) == 0:
+            return stats
+
+        for j in range(nv):
+            stats['count'][:, j] = np.bincount(codes, weights=ok[:, j], minlength=nb)[:nb]
+            stats['sum'][:, j] = np.bincount(codes, weights=filled[:, j], minlength=nb)[:nb]
+            stats['sumsq'][:, j] = np.bincount(codes, weights=filled[:, j] ** 2, minlength=nb)[:nb]
+
+        # Reordenar de forma estable por bucket las filas ya ordenadas por valor:
+        # cada bucket queda como un segmento contiguo y ordenado (NaN al final)
+        starts = np.concatenate(([0], np.cumsum(stats['rows'])[:-1]))
+        small_codes = codes.astype(np.int16)  # radix sort
+        q = np.asarray(QUANTILES)
+        for j in range(nv):
+            ordered = value_order[j]
+            ordered = ordered[np.argsort(small_codes[ordered], kind='stable')]
+            values = block[ordered, j]
+            count = stats['count'][:, j]
+            has = count > 0
+            last = starts + np.maximum(count - 1, 0)
+            stats['min'][has, j] = values[starts[has]]
+            stats['max'][has, j] = values[last[has]]
+            # Interpolación lineal, como np.nanquantile
+            pos = q[None, :] * np.maximum(count - 1, 0)[:, None]
+            lo = np.floor(pos).astype(np.int64)
+            frac = pos - lo
+            lo = lo + starts[:, None]
+            hi = np.minimum(lo + 1, last[:, None])
+            lo, hi = np.minimum(lo, len(values) - 1), np.minimum(hi, len(values) - 1)
+            quant = values[lo] + (values[hi] - values[lo]) * frac
+            quant[~has] = np.nan
+            stats['quantiles'][:, :, j] = quant
+            stats['box'][j] = [
+                box_stats_from_sorted(values[start:start + c], BOX_OUTLIERS_PER_BUCKET) if c else None
+                for start, c in zip(starts, count)
+            ]
+        return stats
+
+    def _values(self, dim, stat):
+        d = self._dims[dim]
+        if stat in _BASE_STATS:
+            return d[stat].astype(np.float64)
+        if stat in QUANTILE_NAMES:
+            return d['quantiles'][:, QUANTILE_NAMES.index(stat), :]
+
+        count = d['count'].astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, d['sum'] / count, np.nan)
+            if stat == 'mean':
+                return mean
+            # Varianza muestral (ddof=1), como pandas/SQL STDDEV
+            var = np.where(count > 1, (d['sumsq'] - d['sum'] * mean) / (count - 1), np.nan)
+            var = np.maximum(var, 0.0)
+        if stat == 'var':
+            return var
+        if stat == 'std':
+            return np.sqrt(var)
+        raise ValueError(f"Estadístico desconocido: {stat}")
+
+    def labels(self, dim):
+        """Etiquetas de los buckets de una dimensión"""
+        return self._dims[dim]['labels']
+
+    def rows(self, dim):
+        """Filas (con fecha válida) por bucket"""
+        d = self._dims[dim]
+        return pd.Series(d['rows'], index=pd.Index(d['labels'], name=dim), name='rows')
+
+    def stat(self, dim, stat='mean', columns=None):
+        """DataFrame bucket × variable con un estadístico
+
+        stat: count, sum, sumsq, min, max, mean, var, std, q05, q25, median,
+        q75 o q95.
+        """
+        columns = self.columns if columns is None else list(columns)
+        positions = [self.columns.index(c) for c in columns]
+        values = self._values(dim, stat)[:, positions]
+        return pd.DataFrame(values, index=pd.Index(self.labels(dim), name=dim), columns=columns)
+
+    def box(self, dim, column):
+        """[(etiqueta, caja)] por bucket; caja como box_stats_from_sorted o None si está vacío"""
+        boxes = self._dims[dim]['box'][self.columns.index(column)]
+        return list(zip(self.labels(dim), boxes))
+
+    def series(self, dim, column, stat='mean'):
+        """Serie por bucket de un estadístico para una variable"""
+        return self.stat(dim, stat, [column])[column]
+
+
+# Máximo de valores atípicos enviados por caja
+MAX_BOX_OUTLIERS = 200
+
+def histogram_from_sorted(sorted_values, nbins=40):
+    """Histograma de ancho fijo sobre valores ya ordenados: (bordes, conteos)
+
+    Con los valores ordenados cada borde se ubica por búsqueda binaria, así
+    el costo es O(nbins · log n) y el resultado no depende del tamaño.
+    """
+    if len(sorted_values) == 0:
+        return np.array([]), np.array([], dtype=np.int64)
+    lo, hi = float(sorted_values[0]), float(sorted_values[-1])
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    edges = np.linspace(lo, hi, nbins + 1)
+    # Intervalos [a, b) salvo el último, que incluye el máximo (como np.histogram)
+    positions = np.searchsorted(sorted_values, edges, side='left')
+    positions[-1] = len(sorted_values)
+    return edges, np.diff(positions)
+
+def box_stats_from_sorted(sorted_values, max_outliers=MAX_BOX_OUTLIERS):
+    """Estadísticos de caja (Tukey, 1.5 IQR) sobre valores ya ordenados
+
+    Retorna un dict con q1, median, q3, mean, lowerfence, upperfence, los
+    atípicos (a lo sumo max_outliers, repartidos entre ambas colas e
+    incluyendo siempre los extremos) y n_outliers, el total real.
+    """
+    n = len(sorted_values)
+    if n == 0:
+        return None
+    q1, median, q3 = np.quantile(sorted_values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    lo_pos = int(np.searchsorted(sorted_values, q1 - 1.5 * iqr, side='left'))
+    hi_pos = int(np.searchsorted(sorted_values, q3 + 1.5 * iqr, side='right'))
+    low, high = sorted_values[:lo_pos], sorted_values[hi_pos:]
+    outliers = np.concatenate([low, high])
+    if len(outliers) > max_outliers:
+        # Muestra equiespaciada por rango: conserva la forma de las colas
+        idx = np.unique(np.linspace(0, len(outliers) - 1, max_outliers).round().astype(np.int64))
+        outliers = outliers[idx]
+    return {
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+        'mean': float(sorted_values.mean()),
+        'lowerfence': float(sorted_values[lo_pos]),
+        'upperfence': float(sorted_values[hi_pos - 1]),
+        'outliers': outliers,
+        'n_outliers': len(low) + len(high),
+    }
@@ -0,0 +1,70 @@
+# utils/autocorrelation.py - ACF por FFT y PACF por Durbin–Levinson
+import numpy as np
+from scipy.fft import next_fast_len
+from scipy.stats import norm
+
+# Lag máximo calculado una sola vez por variable (tope del slider)
+ACF_MAX_LAGS = 100
+ACF_ALPHA = 0.05
+
+
+def acovf_sums(values, nlags):
+    """Sumas de productos cruzados de la serie centrada, lags 0..nlags, vía FFT"""
+    x = np.asarray(values, dtype=np.float64)
+    x = x - x.mean()
+    n = len(x)
+    size = next_fast_len(2 * n - 1)
+    spectrum = np.fft.rfft(x, size)
+    sums = np.fft.irfft(spectrum * np.conj(spectrum), size)[:nlags + 1]
+    return sums
+
+def durbin_levinson(acov, nlags):
+    """PACF a partir de autocovarianzas (recursión de Durbin–Levinson)
+
+    Equivale a resolver Yule-Walker para cada orden y quedarse con el último
+    coeficiente, en O(nlags²) en lugar de un sistema por lag.
+    """
+    pacf = np.zeros(nlags + 1)
+    pacf[0] = 1.0
+    if nlags == 0 or acov[0] == 0:
+        return pacf
+    phi = np.zeros(nlags + 1)
+    error = acov[0]
+    for k in range(1, nlags + 1):
+        reflection = (acov[k] - np.dot(phi[1:k], acov[k - 1:0:-1])) / error
+        previous = phi[1:k].copy()
+        phi[1:k] = previous - reflection * previous[::-1]
+        phi[k] = reflection
+        pacf[k] = reflection
+        error *= 1.0 - reflection ** 2
+        if error <= 0:
+            break
+    return pacf
+
+def autocorrelation(values, nlags=ACF_MAX_LAGS, alpha=ACF_ALPHA):
+    """ACF y PACF hasta nlags con sus bandas de confianza
+
+    Mismos resultados que statsmodels acf(fft=True) y pacf(method='ywadjusted'):
+    una sola FFT da las sumas de productos; la ACF las normaliza por n y la
+    PACF usa las autocovarianzas ajustadas (divididas por n - k). Las bandas
+    (semiancho alrededor de cero) son de Bartlett para la ACF y ±z/√n para
+    la PACF. Retorna un dict de arrays de largo nlags + 1.
+    """
+    n = len(values)
+    nlags = int(min(nlags, n - 1))
+    sums = acovf_sums(values, nlags)
+    acf = sums / sums[0] if sums[0] != 0 else np.zeros(nlags + 1)
+    adjusted = sums / (n - np.arange(nlags + 1))
+    pacf = durbin_levinson(adjusted, nlags)
+
+    z = norm.ppf(1 - alpha / 2)
+    acf_band = np.zeros(nlags + 1)
+    acf_band[1:] = z * np.sqrt((1 + 2 * np.concatenate(([0.0], np.cumsum(acf[1:nlags] ** 2)))) / n)
+    pacf_band = np.zeros(nlags + 1)
+    pacf_band[1:] = z / np.sqrt(n)
+    return {'acf': acf, 'acf_band': acf_band, 'pacf': pacf, 'pacf_band': pacf_band, 'nobs': n}
+
+def slice_lags(result, lags):
+    """Recortar un resultado de autocorrelation() a los primeros lags"""
+    return {key: value[:lags + 1] if isinstance(value, np.ndarray) else value
+            for key, value in result.items()}
@@ -1,77 +1,591 @@
 # utils/data_loader.py - Manejo centralizado de datos
 import pandas as pd
 import numpy as np
-from scipy.stats import ks_2samp
-from utils.database import load_table, load_data_from_query
+from scipy.stats import ks_2samp, kstwo
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
+import functools
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from utils.database import (
+    load_table, load_data_from_query, load_rows_after, get_table_fingerprint,
+    DEFAULT_CHUNKSIZE, DEFAULT_LOAD_METHOD
+)
+from utils.aggregates import AggregateCube
+from utils.downsampling import ResampleStore, TimePyramid
+from utils.autocorrelation import ACF_MAX_LAGS, autocorrelation
+from utils.stationarity import stationarity_tests
+from utils.outliers import OutlierScores
+from utils.decomposition import COMPONENTS, DECOMPOSITION_METHODS, DECOMPOSITION_MODELS, decompose
+from utils.snapshot import (
+    load_snapshot, save_snapshot, snapshot_lock, read_meta,
+    load_artifact, save_artifact, SNAPSHOT_ENABLED
+)
 import os
 
+# Estaciones del dataset PRSA (una tabla prsa_data_<estación> por estación)
+STATIONS = [
+    'Aotizhongxin', 'Changping', 'Dingling', 'Dongsi', 'Guanyuan', 'Gucheng',
+    'Huairou', 'Nongzhanguan', 'Shunyi', 'Tiantan', 'Wanliu', 'Wanshouxigong',
+]
+DEFAULT_STATION = os.environ.get('DEFAULT_STATION', 'Dongsi')
+# Estaciones adicionales a cargar al iniciar, separadas por coma (vacío = solo la por defecto)
+PRELOAD_STATIONS = [s.strip() for s in os.environ.get('PRELOAD_STATIONS', '').split(',') if s.strip()]
+STATION_LOAD_WORKERS = int(os.environ.get('STATION_LOAD_WORKERS', 4))
+# Análisis pesados en segundo plano (ADF/KPSS, descomposiciones): procesos del
+# pool y si se precalculan al terminar la carga
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 2))
+ANALYSIS_PRECOMPUTE = os.environ.get('ANALYSIS_PRECOMPUTE', 'True').lower() == 'true'
+# Períodos de descomposición precalculados y sus variables (por defecto la
+# primera variable de análisis, la que abre la pestaña)
+DECOMPOSITION_PERIODS = (24, 168, 8760)
+DECOMPOSITION_PRECOMPUTE_COLUMNS = [
+    c.strip() for c in os.environ.get('DECOMPOSITION_PRECOMPUTE_COLUMNS', '').split(',') if c.strip()
+]
+DECOMPOSITION_CACHE_SIZE = int(os.environ.get('DECOMPOSITION_CACHE_SIZE', 16))
+# Puntajes de atípicos por (estación, versión, columna, ventana) en memoria
+OUTLIER_CACHE_SIZE = int(os.environ.get('OUTLIER_CACHE_SIZE', 64))
+
+def station_table(station):
+    """Nombre de la tabla de una estación"""
+    return f"prsa_data_{station.lower()}"
+
+DATA_TABLE = station_table(DEFAULT_STATION)
+
+# Versión del procesamiento (carga + esquema + imputación). Forma parte de la
+# huella del snapshot: incrementarla invalida los snapshots existentes.
+DATA_PIPELINE_VERSION = 3
+
+# Filas finales del histórico que se re-imputan junto con las lecturas nuevas
+INCREMENTAL_CONTEXT_ROWS = 48
+
+# Esquema compacto de columnas (nombres ya normalizados)
+PRSA_SCHEMA = {
+    'no': 'int32',
+    'year': 'int16',
+    'month': 'int8',
+    'day': 'int8',
+    'hour': 'int8',
+    'pm2_5': 'float32',
+    'pm10': 'float32',
+    'so2': 'float32',
+    'no2': 'float32',
+    'co': 'float32',
+    'o3': 'float32',
+    'temp': 'float32',
+    'pres': 'float32',
+    'dewp': 'float32',
+    'rain': 'float32',
+    'wspm': 'float32',
+    'wd': 'category',
+    'station': 'category',
+}
+
 # Variables globales para los datasets
 df_original = None
 df_imputed = None
 analysis_cols = []
+# Identificador de la versión de los datos cargados (clave de cachés derivados)
+data_version = None
+
+# Estado de la carga en segundo plano: idle / loading / ready / failed
+DATA_STATUS_IDLE = 'idle'
+DATA_STATUS_LOADING = 'loading'
+DATA_STATUS_READY = 'ready'
+DATA_STATUS_FAILED = 'failed'
+_data_status = {'state': DATA_STATUS_IDLE, 'error': None, 'pid': None, 'started': None, 'elapsed': None}
+_init_lock = threading.Lock()
+
+# Estaciones cargadas en este proceso: {estación: registro de _load_station_frames}
+_stations = {}
+_stations_lock = threading.Lock()
+_station_locks = {}
+
+# Cachés en proceso, todas con (estación, versión) al inicio de la clave.
+# Prueba KS y valores ordenados por (frame, columna)
+_ks_cache = {}
+_sorted_cache = {}
+# Pirámides temporales por (frame, columna) para los gráficos con zoom
+_pyramid_cache = {}
+# ACF/PACF hasta ACF_MAX_LAGS por columna
+_autocorrelation_cache = {}
+# Resultados ADF/KPSS por columna y tareas en curso
+_stationarity_cache = {}
+_stationarity_pending = {}
+# Descomposiciones por (columna, modelo, período, método): pirámides en un
+# LRU, tareas en curso y errores (p. ej. multiplicativo con ceros)
+_decomposition_cache = OrderedDict()
+_decomposition_pending = {}
+_decomposition_errors = {}
+# Puntajes de atípicos (ver utils.outliers) en un LRU
+_outlier_cache = OrderedDict()
+_outlier_lock = threading.Lock()
+_analysis_pool = None
+_analysis_lock = threading.Lock()
+
+def _version_of(fingerprint):
+    """Versión corta y estable derivada de la huella de la tabla"""
+    if not fingerprint:
+        return f"local-{int(time.time())}"
+    payload = json.dumps(fingerprint, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()[:12]
+
+def _set_status(state, error=None):
+    _data_status['state'] = state
+    _data_status['error'] = error
+    if state == DATA_STATUS_LOADING:
+        _data_status['pid'] = os.getpid()
+        _data_status['started'] = time.time()
+        _data_status['elapsed'] = None
+    elif _data_status['started'] is not None:
+        _data_status['elapsed'] = time.time() - _data_status['started']
 
 def initialize_data():
-    """Inicializa y carga todos los datos desde PostgreSQL"""
-    global df_original, df_imputed, analysis_cols
+    """Inicializa y carga todos los datos (snapshot local o PostgreSQL)
+
+    Carga la estación por defecto (y PRELOAD_STATIONS, en paralelo). Retorna
+    True si los datos quedaron disponibles. El resultado queda registrado en
+    get_data_status().
+    """
+    global df_original, df_imputed, analysis_cols, data_version
+    if _data_status['state'] != DATA_STATUS_LOADING or _data_status['pid'] != os.getpid():
+        _set_status(DATA_STATUS_LOADING)
     try:
-        print("📂 Cargando datos desde PostgreSQL...")
-        
-        # Cargar los datos principales desde la tabla PRSA
-        df_original = load_data()
+        records = load_stations([DEFAULT_STATION] + PRELOAD_STATIONS)
+        record = records.get(station_key(DEFAULT_STATION))
         
-        if df_original.empty:
+        if record is None:
             print("❌ No se pudieron cargar datos desde PostgreSQL")
-            return
-            
-        print(f"✅ Datos cargados. Dimensiones: {df_original.shape}")
+            _set_status(DATA_STATUS_FAILED, "No se pudieron cargar datos desde PostgreSQL")
+            return False
         
-        # Procesar los datos (el resto del código se mantiene igual)
-        df_imputed = impute_dataframe(df_original)
-        analysis_cols = get_analysis_columns(df_imputed)
+        # Publicar todo junto: los callbacks pueden leer desde otros hilos
+        data_version = record['version']
+        analysis_cols = record['analysis_cols']
+        df_original, df_imputed = record['original'], record['imputed']
         
+        print(f"✅ Datos cargados. Dimensiones: {df_original.shape}")
         print(f"🔢 Variables de análisis: {len(analysis_cols)}")
         print("🎯 Inicialización completada exitosamente")
+        _set_status(DATA_STATUS_READY)
+        if ANALYSIS_PRECOMPUTE:
+            request_decompositions()
+            request_stationarity_tests()
+        return True
         
     except Exception as e:
         print(f"❌ Error durante la inicialización: {str(e)}")
         import traceback
         traceback.print_exc()
+        _set_status(DATA_STATUS_FAILED, str(e))
+        return False
+
+def station_key(station):
+    """Nombre canónico de una estación (sin distinguir mayúsculas); None si no existe"""
+    lookup = {name.lower(): name for name in STATIONS}
+    return lookup.get(str(station).strip().lower())
+
+def _load_station_frames(station):
+    """Cargar, imputar y cachear (snapshot) una estación de forma independiente"""
+    table = station_table(station)
+    fingerprint = get_table_fingerprint(table)
+    if fingerprint is not None:
+        fingerprint['pipeline'] = DATA_PIPELINE_VERSION
+    
+    if SNAPSHOT_ENABLED:
+        # Un solo proceso (p. ej. worker de gunicorn) construye el snapshot;
+        # el resto espera y mapea los mismos archivos en memoria
+        with snapshot_lock(table):
+            frames = _load_or_build_snapshot(fingerprint, table)
+    else:
+        frames = _build_frames(table)
+    
+    if frames is None:
+        return None
+    if fingerprint is None and SNAPSHOT_ENABLED:
+        # Snapshot aceptado sin consultar la BD: usar la huella con la que se guardó
+        fingerprint = (read_meta(table) or {}).get('fingerprint')
+    
+    cols = get_analysis_columns(frames[1])
+    return {
+        'station': station,
+        'table': table,
+        'original': frames[0],
+        'imputed': frames[1],
+        'analysis_cols': cols,
+        'version': _version_of(fingerprint),
+        'cubes': build_aggregate_cubes(frames[0], frames[1], cols),
+        'resampled': (ResampleStore.from_frame(frames[1], cols)
+                      if 'datetime' in frames[1].columns else None),
+    }
+
+def build_aggregate_cubes(df_orig, df_imp, columns):
+    """Cubos de agregados por calendario de una estación
+
+    'original' e 'imputed' usan todas las filas; 'original_pm25_temp' solo las
+    filas originales con PM2.5 y TEMP presentes (filtro de las consultas
+    de patrón diario y estacional del resumen).
+    """
+    if 'datetime' not in df_orig.columns:
+        return {}
+    cubes = {
+        'original': AggregateCube.build(df_orig, columns),
+        'imputed': AggregateCube.build(df_imp, columns),
+    }
+    if {'pm2_5', 'temp'}.issubset(df_orig.columns):
+        complete = df_orig['pm2_5'].notna().to_numpy() & df_orig['temp'].notna().to_numpy()
+        cubes['original_pm25_temp'] = AggregateCube.build(df_orig, columns, mask=complete)
+    return cubes
+
+def load_station(station):
+    """Registro de una estación, cargándola la primera vez que se pide
 
-def load_data():
+    Retorna None si la estación no existe o no se pudo cargar. Cada estación
+    tiene su propio bloqueo: cargas de estaciones distintas no se esperan.
+    """
+    key = station_key(station)
+    if key is None:
+        print(f"❌ Estación desconocida: {station}")
+        return None
+    record = _stations.get(key)
+    if record is not None:
+        return record
+    
+    with _stations_lock:
+        lock = _station_locks.setdefault(key, threading.Lock())
+    with lock:
+        record = _stations.get(key)
+        if record is None:
+            print(f"📡 Cargando estación {key}...")
+            record = _load_station_frames(key)
+            if record is not None:
+                _stations[key] = record
+    return record
+
+def load_stations(stations, max_workers=None):
+    """Cargar varias estaciones en paralelo; retorna {estación: registro}
+
+    Las estaciones que no se pudieron cargar no aparecen en el resultado.
+    """
+    keys = list(dict.fromkeys(k for k in (station_key(s) for s in stations) if k))
+    if not keys:
+        return {}
+    workers = min(len(keys), max_workers or STATION_LOAD_WORKERS)
+    if workers <= 1:
+        records = [load_station(k) for k in keys]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='station-load') as pool:
+            records = list(pool.map(load_station, keys))
+    return {k: r for k, r in zip(keys, records) if r is not None}
+
+def loaded_stations():
+    """Estaciones actualmente en memoria en este proceso"""
+    return list(_stations)
+
+def release_station(station):
+    """Liberar de memoria una estación cargada (excepto la estación por defecto)
+
+    Quita también todo lo derivado de ella (valores ordenados, pirámides,
+    ACF, pruebas, descomposiciones, atípicos, KS) y cancela sus análisis
+    encolados; los cubos y medias remuestreadas se van con el registro.
+    """
+    key = station_key(station)
+    if key is None or key == station_key(DEFAULT_STATION):
+        return False
+    released = _stations.pop(key, None) is not None
+    _evict_station_caches(key)
+    return released
+
+def _evict_station_caches(station):
+    """Borrar de las cachés derivadas las entradas de una estación (clave[0])"""
+    def evict(cache):
+        return [cache.pop(k, None) for k in [k for k in cache if k[0] == station]]
+
+    for cache in (_ks_cache, _sorted_cache, _pyramid_cache, _autocorrelation_cache):
+        evict(cache)
+    with _analysis_lock:
+        evict(_stationarity_cache)
+        evict(_decomposition_cache)
+        evict(_decomposition_errors)
+        pending = evict(_stationarity_pending) + evict(_decomposition_pending)
+    with _outlier_lock:
+        evict(_outlier_cache)
+    # Fuera del bloqueo: cancel() ejecuta los callbacks, que lo toman
+    for future in pending:
+        future.cancel()
+
+def start_background_initialization():
+    """Lanzar initialize_data en un hilo daemon y retornar de inmediato
+
+    Es idempotente dentro de un proceso: no relanza una carga en curso o ya
+    terminada. Tras un fork (gunicorn con preload_app) el hilo del proceso
+    padre no existe en el hijo, por lo que la carga se relanza allí.
+    """
+    if multiprocessing.parent_process() is not None:
+        # Proceso de un pool (spawn reimporta el módulo principal): no cargar
+        return
+    with _init_lock:
+        same_process = _data_status['pid'] == os.getpid()
+        if _data_status['state'] == DATA_STATUS_READY:
+            return
+        if _data_status['state'] == DATA_STATUS_LOADING and same_process:
+            return
+        _set_status(DATA_STATUS_LOADING)
+        threading.Thread(target=initialize_data, name='data-init', daemon=True).start()
+    print("🔄 Carga de datos iniciada en segundo plano")
+
+def get_data_status():
+    """Estado de la carga de datos: dict con state, error y elapsed (segundos)"""
+    if _data_status['state'] == DATA_STATUS_LOADING and _data_status['pid'] != os.getpid():
+        # Proceso hijo creado a mitad de la carga del padre
+        start_background_initialization()
+    status = dict(_data_status)
+    if status['state'] == DATA_STATUS_LOADING and status['started'] is not None:
+        status['elapsed'] = time.time() - status['started']
+    return status
+
+def is_data_ready():
+    return _data_status['state'] == DATA_STATUS_READY
+
+def _reset_init_lock_after_fork():
+    global _init_lock, _stations_lock, _analysis_lock, _analysis_pool
+    _init_lock = threading.Lock()
+    _stations_lock = threading.Lock()
+    _station_locks.clear()
+    # El pool del padre no sirve en el hijo: se recrea al primer uso
+    _analysis_lock = threading.Lock()
+    _analysis_pool = None
+    _stationarity_pending.clear()
+    _decomposition_pending.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_init_lock_after_fork)
+
+def _build_frames(table=DATA_TABLE):
+    """Cargar desde PostgreSQL e imputar"""
+    print(f"📂 Cargando {table} desde PostgreSQL...")
+    
+    # Cargar los datos principales desde la tabla PRSA
+    df_orig = load_data(table)
+    if df_orig.empty:
+        return None
+    
+    return df_orig, impute_dataframe(df_orig)
+
+def _load_or_build_snapshot(fingerprint, table=DATA_TABLE):
+    """Mapear el snapshot vigente, actualizarlo o reconstruirlo desde PostgreSQL
+
+    Los DataFrames retornados apuntan a arrays de solo lectura mapeados desde
+    disco, compartidos por todos los procesos a través del page cache.
+    """
+    # Sin huella (BD no disponible) se acepta el último snapshot
+    cached = load_snapshot(table, fingerprint)
+    if cached is not None:
+        print(f"⚡ {table} cargada desde snapshot local")
+        return cached['original'], cached['imputed']
+    
+    frames = _update_stale_snapshot(fingerprint, table)
+    if frames is None:
+        frames = _build_frames(table)
+    if frames is None or fingerprint is None:
+        return frames
+    
+    try:
+        save_snapshot(table, {'original': frames[0], 'imputed': frames[1]}, fingerprint)
+        print(f"💾 Snapshot local de {table} actualizado")
+    except Exception as e:
+        print(f"⚠️  No se pudo guardar el snapshot: {e}")
+        return frames
+    
+    # Reabrir desde disco para no conservar una copia privada en este proceso
+    cached = load_snapshot(table, fingerprint)
+    if cached is None:
+        return frames
+    return cached['original'], cached['imputed']
+
+def _update_stale_snapshot(fingerprint, table=DATA_TABLE):
+    """Extender un snapshot desactualizado solo con las lecturas nuevas
+
+    Aplica cuando la tabla únicamente creció al final (mismo esquema, más filas
+    y una marca temporal máxima mayor). Retorna None si hace falta recargar todo.
+    """
+    meta = read_meta(table)
+    old = meta.get('fingerprint') if meta else None
+    if not old or fingerprint is None:
+        return None
+    if old.get('schema') != fingerprint['schema'] or old.get('pipeline') != fingerprint.get('pipeline'):
+        return None
+    if old.get('max_key') is None or fingerprint['max_key'] is None:
+        return None
+    if fingerprint['rows'] <= old['rows'] or fingerprint['max_key'] <= old['max_key']:
+        return None
+    
+    new_rows = load_rows_after(table, old['max_key'])
+    if new_rows is None or len(new_rows) != fingerprint['rows'] - old['rows']:
+        # Cambiaron filas históricas: se requiere imputación completa
+        return None
+    
+    cached = load_snapshot(table, old)
+    if cached is None:
+        return None
+    
+    print(f"🔁 Actualización incremental de {table}: {len(new_rows)} lecturas nuevas")
+    df_new = prepare_dataframe(new_rows, verbose=False)
+    df_orig = apply_schema(pd.concat([cached['original'], df_new], ignore_index=True), verbose=False)
+    df_imp = impute_incremental(df_new, cached['original'], cached['imputed'])
+    return df_orig, df_imp
+
+def load_data(table=DATA_TABLE):
     """Cargar y preparar el dataset desde PostgreSQL"""
-    df = load_table('prsa_data_dongsi')
+    df = load_table(table, chunksize=DEFAULT_CHUNKSIZE, method=DEFAULT_LOAD_METHOD)
     
     if df.empty:
         print("❌ No se pudieron cargar datos desde PostgreSQL")
         return df
     
+    return prepare_dataframe(df)
+
+def prepare_dataframe(df, verbose=True):
+    """Normalizar columnas, construir datetime y aplicar el esquema compacto"""
     # Normalizar nombres de columnas
     df.columns = df.columns.str.strip().str.lower().str.replace('.', '_', regex=False).str.replace(' ', '_', regex=False)
     
     # Construir datetime si existen las columnas temporales
     cols = df.columns
     if set(['year','month','day','hour']).issubset(cols):
-        try:
-            df['datetime'] = pd.to_datetime(dict(
-                year=df['year'].astype(int),
-                month=df['month'].astype(int),
-                day=df['day'].astype(int),
-                hour=df['hour'].astype(int)
-            ))
-        except Exception:
-            # Fallback: intentar combinar como string
-            df['datetime'] = pd.to_datetime(
-                df[['year','month','day','hour']].astype(str).agg(' '.join, axis=1), 
-                errors='coerce'
-            )
+        df['datetime'] = build_datetime(df['year'], df['month'], df['day'], df['hour'])
+        invalid = int(df['datetime'].isna().sum())
+        if invalid:
+            print(f"⚠️  {invalid} filas con fecha/hora inválida (NaT)")
     else:
         # Si hay columnas de fecha, intentar parsearlas
         date_cols = [c for c in cols if 'date' in c]
         if date_cols:
             df['datetime'] = pd.to_datetime(df[date_cols[0]], errors='coerce')
     
+    return apply_schema(df, verbose=verbose)
+
+def _fits_integer(series, dtype):
+    """Verifica que una columna sin nulos quepa en el tipo entero destino"""
+    if series.isna().any():
+        return False
+    info = np.iinfo(dtype)
+    return series.min() >= info.min and series.max() <= info.max
+
+def apply_schema(df, schema=PRSA_SCHEMA, verbose=True):
+    """Convertir columnas a tipos compactos (float32, category, enteros pequeños)
+
+    Las columnas enteras con nulos o fuera de rango pasan a float32. Con verbose
+    imprime la memoria antes/después por columna.
+    """
+    before = df.memory_usage(deep=True, index=False) if verbose else None
+    
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'category':
+            df[col] = df[col].astype('category')
+        elif np.dtype(dtype).kind == 'i':
+            if _fits_integer(df[col], dtype):
+                df[col] = df[col].astype(dtype)
+            else:
+                df[col] = df[col].astype('float32')
+        else:
+            df[col] = df[col].astype(dtype)
+    
+    if verbose:
+        after = df.memory_usage(deep=True, index=False)
+        print(memory_report(before, after).to_string())
+        total_before, total_after = before.sum(), after.sum()
+        print(f"💾 Memoria: {total_before / 1e6:.1f} MB → {total_after / 1e6:.1f} MB "
+              f"({100 * (1 - total_after / total_before):.0f}% menos)")
     return df
 
+def memory_report(before, after):
+    """Tabla de memoria por columna (KB) antes y después del esquema"""
+    report = pd.DataFrame({
+        'antes_kb': before / 1024,
+        'despues_kb': after.reindex(before.index) / 1024,
+    })
+    report['reduccion_%'] = 100 * (1 - report['despues_kb'] / report['antes_kb'])
+    return report.round(1)
+
+# Días por mes (año no bisiesto), indexado por mes 1-12
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+
+def build_datetime(year, month, day, hour):
+    """Construir datetime64[ns] desde año/mes/día/hora con aritmética entera
+
+    Calcula los días desde 1970-01-01 (algoritmo days_from_civil) y suma las
+    horas, todo vectorizado. Las filas inválidas (nulos, valores no enteros,
+    mes/día/hora fuera de rango) quedan como NaT.
+    """
+    parts = [np.asarray(p) for p in (year, month, day, hour)]
+    valid = np.ones(len(parts[0]), dtype=bool)
+    for i, p in enumerate(parts):
+        if p.dtype.kind not in 'iu':
+            # Flotantes (enteros con nulos): descartar NaN y valores no enteros
+            p = p.astype(np.float64)
+            valid &= np.isfinite(p) & (p == np.floor(p))
+            parts[i] = np.where(valid, p, 1)
+    y, m, d, h = (p.astype(np.int64, copy=False) for p in parts)
+
+    valid &= (m >= 1) & (m <= 12) & (h >= 0) & (h <= 23) & (d >= 1)
+    m = np.where(valid, m, 1)
+    leap = ((y % 4 == 0) & (y % 100 != 0)) | (y % 400 == 0)
+    valid &= d <= _DAYS_IN_MONTH[m] + ((m == 2) & leap)
+
+    # Año que empieza en marzo: el día bisiesto queda al final
+    y_adj = y - (m <= 2)
+    era = np.floor_divide(y_adj, 400)
+    yoe = y_adj - era * 400
+    doy = (153 * ((m + 9) % 12) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    days = era * 146097 + doe - 719468
+
+    ns = (days * 86400 + h * 3600) * 1_000_000_000
+    result = ns.view('datetime64[ns]')
+    result[~valid] = np.datetime64('NaT')
+    return result
+
+def benchmark_datetime_builder(n_rows=2_000_000, repeat=3, seed=0):
+    """Micro-benchmark de build_datetime frente a pd.to_datetime(dict(...))
+
+    Usa un frame sintético horario tipo PRSA de n_rows filas.
+    """
+    import time
+    rng = np.random.default_rng(seed)
+    t = pd.date_range('2013-03-01', periods=n_rows, freq='H')
+    df = pd.DataFrame({'year': t.year, 'month': t.month, 'day': t.day, 'hour': t.hour})
+    df.loc[rng.random(n_rows) < 0.001, 'day'] = np.nan
+
+    def best(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    valid = df.dropna()
+    t_vectorized = best(lambda: build_datetime(df['year'], df['month'], df['day'], df['hour']))
+    # pandas no acepta nulos en to_datetime(dict): se mide solo sobre filas válidas
+    t_pandas = best(lambda: pd.to_datetime(dict(
+        year=valid['year'].astype(int), month=valid['month'].astype(int),
+        day=valid['day'].astype(int), hour=valid['hour'].astype(int)
+    )))
+    return {
+        'rows': n_rows,
+        'build_datetime_s': t_vectorized,
+        'pd_to_datetime_s': t_pandas,
+        'speedup': t_pandas / t_vectorized,
+    }
+
 def get_analysis_columns(df, exclude_datetime_components=True):
     """Retorna columnas para análisis, excluyendo componentes de datetime"""
     base_exclude = ['station', 'no']  # Columnas identificadoras
@@ -85,60 +599,204 @@ def get_analysis_columns(df, exclude_datetime_components=True):
     
     return analysis_cols
 
+# Estrategias de imputación por variable
+#   'time'        interpolación temporal (los NaN iniciales se mantienen)
+#   'time_fill'   interpolación temporal + ffill + bfill
+#   'zero'        rellenar con 0
+#   'ffill_bfill' propagar el último valor válido (y el primero hacia atrás)
+IMPUTATION_STRATEGIES = {
+    'pm2_5': 'time_fill',
+    'pm10': 'time_fill',
+    'so2': 'time_fill',
+    'no2': 'time_fill',
+    'co': 'time_fill',
+    'o3': 'time_fill',
+    'temp': 'time',
+    'pres': 'time',
+    'dewp': 'time',
+    'wspm': 'zero',
+    'rain': 'zero',
+    'wd': 'ffill_bfill',
+}
+# Para cualquier otra variable numérica no cubierta
+DEFAULT_NUMERIC_STRATEGY = 'time_fill'
+_STRATEGY_CODES = {'time': 0, 'time_fill': 1, 'zero': 2, 'ffill_bfill': 3}
+
+def _column_values(series, order=None):
+    """Valores de una columna (opcionalmente reordenados) sin pasar por el índice"""
+    values = series.array if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) else series.to_numpy()
+    return values if order is None else values.take(order)
+
+def _fill_sources(ok):
+    """Índice del último válido previo y del siguiente válido por fila/columna
+
+    ok: matriz booleana (n, k). Retorna (prev, next) con -1 / n donde no existen.
+    """
+    n = ok.shape[0]
+    idx_type = np.int32 if n < np.iinfo(np.int32).max else np.int64
+    rows = np.arange(n, dtype=idx_type).reshape((n,) + (1,) * (ok.ndim - 1))
+    prev = np.where(ok, rows, -1)
+    np.maximum.accumulate(prev, axis=0, out=prev)
+    nxt = np.where(ok, rows, n)[::-1]
+    nxt = np.minimum.accumulate(nxt, axis=0)[::-1]
+    return prev, nxt
+
+def _impute_block(block, times, row_ok, strategies):
+    """Imputar en sitio un bloque 2-D float64 (filas ordenadas por tiempo)
+
+    Una sola pasada para todas las columnas: se ubica el vecino válido anterior
+    y siguiente de cada faltante y se aplica la estrategia de su columna.
+    """
+    missing = np.isnan(block)
+    prev, nxt = _fill_sources(~missing)
+    r, c = np.nonzero(missing)
+    if len(r) == 0:
+        return block
+    
+    n = block.shape[0]
+    p, q = prev[r, c], nxt[r, c]
+    has_prev, has_next = p >= 0, q < n
+    x0 = block[np.where(has_prev, p, 0), c]
+    x1 = block[np.where(has_next, q, 0), c]
+    
+    codes = np.array([_STRATEGY_CODES[s] for s in strategies], dtype=np.int8)
+    strategy = codes[c]
+    is_time = strategy <= _STRATEGY_CODES['time_fill']
+    backfill = (strategy == _STRATEGY_CODES['time_fill']) | (strategy == _STRATEGY_CODES['ffill_bfill'])
+    
+    values = np.full(len(r), np.nan)
+    # Interpolación lineal en el tiempo entre los dos vecinos válidos
+    t0 = times[np.where(has_prev, p, 0)]
+    t1 = times[np.where(has_next, q, 0)]
+    interp = is_time & has_prev & has_next & row_ok[r] & (t1 > t0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = (times[r] - t0) / (t1 - t0)
+    values[interp] = (x0 + (x1 - x0) * frac)[interp]
+    # Sin vecino posterior (o sin tiempo): último valor válido
+    forward = ~interp & has_prev & (is_time | backfill)
+    values[forward] = x0[forward]
+    # Sin vecino anterior: primer valor válido
+    backward = ~interp & ~has_prev & has_next & backfill
+    values[backward] = x1[backward]
+    values[strategy == _STRATEGY_CODES['zero']] = 0.0
+    
+    block[r, c] = values
+    return block
+
+def _ffill_bfill_values(values):
+    """ffill + bfill de una columna no numérica (p. ej. categórica)"""
+    missing = pd.isna(values)
+    if not missing.any():
+        return values
+    prev, nxt = _fill_sources(~missing)
+    n = len(values)
+    src = np.where(prev >= 0, prev, np.where(nxt < n, nxt, np.arange(n)))
+    return values.take(src)
+
 def impute_dataframe(df_in):
-    """Aplica imputación inteligente según el tipo de variable"""
+    """Aplica imputación inteligente según el tipo de variable
+
+    Ordena una sola vez por datetime y resuelve todas las columnas numéricas con
+    faltantes en un único bloque 2-D, según IMPUTATION_STRATEGIES. Las columnas
+    que no cambian se comparten con df_in en lugar de copiarse.
+    """
     if df_in.empty:
         return df_in
     
-    df_out = df_in.copy()
-    
-    if 'datetime' not in df_out.columns or df_out['datetime'].isna().all():
+    if 'datetime' not in df_in.columns or df_in['datetime'].isna().all():
         print("⚠️  No hay columna datetime válida, usando métodos básicos")
-        return impute_fallback(df_out)
-    
-    df_out = df_out.sort_values('datetime').set_index('datetime')
+        return impute_fallback(df_in.copy())
     
-    # ESTRATEGIAS ESPECÍFICAS POR TIPO DE VARIABLE
-    if 'pm2_5' in df_out.columns:
-        df_out['pm2_5'] = df_out['pm2_5'].interpolate(method='time').ffill().bfill()
+    datetimes = df_in['datetime'].to_numpy()
+    # Los datos suelen venir ya ordenados: evitar reordenar todas las columnas
+    order = None
+    if not pd.Index(datetimes).is_monotonic_increasing:
+        order = np.argsort(datetimes, kind='stable')
+        datetimes = datetimes[order]
+    row_ok = ~np.isnat(datetimes)
+    times = datetimes.view('int64').astype(np.float64)
     
-    if 'pm10' in df_out.columns:
-        df_out['pm10'] = df_out['pm10'].interpolate(method='time').ffill().bfill()
-    
-    # Para gases (SO2, NO2, CO, O3) - interpolación temporal
-    gases = ['so2', 'no2', 'co', 'o3']
-    for gas in gases:
-        if gas in df_out.columns:
-            df_out[gas] = df_out[gas].interpolate(method='time').ffill().bfill()
+    # datetime primero, como al restablecer el índice temporal
+    columns = {'datetime': datetimes}
+    numeric_cols, strategies = [], []
+    for col in df_in.columns:
+        if col == 'datetime':
+            continue
+        series = df_in[col]
+        values = _column_values(series, order)
+        strategy = IMPUTATION_STRATEGIES.get(col)
+        if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            if series.isna().any():
+                numeric_cols.append(col)
+                strategies.append(strategy or DEFAULT_NUMERIC_STRATEGY)
+        elif strategy == 'ffill_bfill':
+            values = _ffill_bfill_values(values)
+        columns[col] = values
     
-    # Variables meteorológicas - estrategias específicas
-    if 'temp' in df_out.columns:
-        df_out['temp'] = df_out['temp'].interpolate(method='time')
+    if numeric_cols:
+        block = np.empty((len(datetimes), len(numeric_cols)), dtype=np.float64)
+        for j, col in enumerate(numeric_cols):
+            block[:, j] = columns[col]
+        _impute_block(block, times, row_ok, strategies)
+        for j, col in enumerate(numeric_cols):
+            dtype = df_in[col].dtype
+            columns[col] = block[:, j].astype(dtype if dtype.kind == 'f' else np.float64)
     
-    if 'pres' in df_out.columns:
-        df_out['pres'] = df_out['pres'].interpolate(method='time')
+    return pd.DataFrame(columns, copy=False)
+
+def impute_incremental(df_new, df_hist, df_hist_imputed, context_rows=INCREMENTAL_CONTEXT_ROWS):
+    """Imputar solo lecturas nuevas y anexarlas al histórico ya imputado
+
+    df_new debe ser posterior a todo df_hist. Se re-imputa una ventana final del
+    histórico (context_rows filas, extendida hasta el último valor válido de cada
+    variable con interpolación temporal) junto con las filas nuevas, porque los
+    faltantes al final del histórico se habían rellenado sin conocer el futuro.
+    En la ventana solo cambian los valores posteriores a ese último válido.
+    """
+    if df_new.empty:
+        return df_hist_imputed
+    if df_hist_imputed is None or df_hist_imputed.empty:
+        return impute_dataframe(df_new)
     
-    if 'dewp' in df_out.columns:
-        df_out['dewp'] = df_out['dewp'].interpolate(method='time')
+    hist_times = df_hist['datetime']
+    if hist_times.isna().any() or df_new['datetime'].isna().any():
+        # Sin marca temporal no se puede ubicar la ventana: imputación completa
+        return impute_dataframe(pd.concat([df_hist, df_new], ignore_index=True))
     
-    if 'wspm' in df_out.columns:
-        df_out['wspm'] = df_out['wspm'].fillna(0)
+    imputed_times = df_hist_imputed['datetime']
+    cutoff = imputed_times.iloc[-min(context_rows, len(imputed_times))]
     
-    if 'wd' in df_out.columns:
-        df_out['wd'] = df_out['wd'].ffill().bfill()
+    # Último valor válido por variable con interpolación temporal
+    last_valid = {}
+    for col in df_hist.columns:
+        strategy = IMPUTATION_STRATEGIES.get(col, DEFAULT_NUMERIC_STRATEGY)
+        if col == 'datetime' or strategy not in ('time', 'time_fill'):
+            continue
+        if not pd.api.types.is_numeric_dtype(df_hist[col].dtype):
+            continue
+        valid_times = hist_times[df_hist[col].notna()]
+        if not valid_times.empty:
+            last_valid[col] = valid_times.max()
+            cutoff = min(cutoff, last_valid[col])
     
-    if 'rain' in df_out.columns:
-        df_out['rain'] = df_out['rain'].fillna(0)
+    context = df_hist[hist_times >= cutoff]
+    tail = impute_dataframe(pd.concat([context, df_new], ignore_index=True))
     
-    # Para cualquier otra variable numérica no cubierta
-    remaining_numeric = df_out.select_dtypes(include=[np.number]).columns.difference(
-        ['pm2_5', 'pm10', 'so2', 'no2', 'co', 'o3', 'temp', 'pres', 'dewp', 'wspm', 'rain']
-    )
-    for col in remaining_numeric:
-        df_out[col] = df_out[col].interpolate(method='time').ffill().bfill()
+    in_window = (imputed_times >= cutoff).to_numpy()
+    cached_window = df_hist_imputed[in_window]
+    n_window = len(cached_window)
+    tail_times = tail['datetime'].iloc[:n_window].to_numpy()
+    for col, last in last_valid.items():
+        # Hasta el último válido el valor imputado no depende de datos futuros
+        keep = np.zeros(len(tail), dtype=bool)
+        keep[:n_window] = tail_times <= last.to_datetime64()
+        if keep.any():
+            values = tail[col].to_numpy(copy=True)
+            values[keep] = cached_window[col].to_numpy()[keep[:n_window]]
+            tail[col] = values
     
-    df_out = df_out.reset_index()
-    return df_out
+    result = pd.concat([df_hist_imputed[~in_window], tail], ignore_index=True)
+    return apply_schema(result, verbose=False)
 
 def impute_fallback(df_out):
     """Fallback cuando no hay datetime"""
@@ -158,27 +816,10 @@ def impute_fallback(df_out):
     
     return df_out
 
-def classify_missing_type(col_name, df_obj):
-    """Clasifica el tipo de valores faltantes (MCAR, MAR, MNAR)"""
-    if df_obj.empty:
-        return "Sin datos"
-        
-    p = df_obj[col_name].isna().mean()
-    if p == 0:
-        return "Sin faltantes"
-    
-    numeric = df_obj.select_dtypes(include=[np.number])
-    
-    if col_name in numeric.columns:
-        numeric = numeric.drop(columns=[col_name])
-    
-    if numeric.shape[1] == 0:
+def _label_missing_type(p, max_abs_corr, has_other_numeric):
+    """Etiqueta MCAR/MAR/MNAR a partir de la proporción y la correlación máxima"""
+    if not has_other_numeric:
         return "MCAR" if p < 0.2 else "MNAR"
-    
-    indicator = df_obj[col_name].isna().astype(int)
-    cors = numeric.apply(lambda x: indicator.corr(x) if x.notna().any() else np.nan)
-    max_abs_corr = cors.abs().max(skipna=True)
-    
     if pd.isna(max_abs_corr):
         return "MCAR"
     if max_abs_corr > 0.3:
@@ -187,8 +828,132 @@ def classify_missing_type(col_name, df_obj):
         return "MNAR"
     return "MCAR"
 
-def get_data():
-    """Retorna los datasets para usar en otras páginas"""
+def missing_indicator_correlations(df_obj, columns):
+    """Correlación de Pearson entre el indicador de faltante de cada columna y
+    cada variable numérica, con un solo producto matricial enmascarado
+
+    Equivale a indicator.corr(x) por pares (solo filas donde x es válida).
+    Retorna un DataFrame (columns × numéricas); la propia columna queda en NaN.
+    """
+    numeric = df_obj.select_dtypes(include=[np.number])
+    indicators = df_obj[columns].isna().to_numpy(dtype=np.float64)
+    
+    X = numeric.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(X)
+    n = valid.sum(axis=0).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Centrar cada variable mejora la estabilidad numérica (la correlación
+        # no cambia con desplazamientos)
+        X = np.where(valid, X, 0.0)
+        X = np.where(valid, X - X.sum(axis=0) / np.maximum(n, 1), 0.0)
+        
+        s_i = indicators.T @ valid.astype(np.float64)   # Σ I  sobre filas válidas de x
+        s_ix = indicators.T @ X                          # Σ I·x
+        mean_x = X.sum(axis=0) / n
+        var_x = (X * X).sum(axis=0) / n - mean_x ** 2
+        mean_i = s_i / n
+        var_i = mean_i - mean_i ** 2                    # indicador binario
+        cov = s_ix / n - mean_i * mean_x
+        denom = np.sqrt(var_i * var_x)
+        corr = np.where((denom > 0) & (n > 1), cov / denom, np.nan)
+    
+    corr = pd.DataFrame(corr, index=columns, columns=numeric.columns)
+    for col in columns:
+        if col in corr.columns:
+            corr.loc[col, col] = np.nan
+    return corr
+
+def classify_missing_types(df_obj):
+    """Clasifica el tipo de valores faltantes (MCAR, MAR, MNAR) de todas las
+    columnas con faltantes a la vez"""
+    if df_obj.empty:
+        return {}
+    
+    p = df_obj.isna().mean()
+    columns = [col for col in df_obj.columns if p[col] > 0]
+    if not columns:
+        return {}
+    
+    corr = missing_indicator_correlations(df_obj, columns)
+    max_abs_corr = corr.abs().max(axis=1, skipna=True)
+    numeric_cols = set(corr.columns)
+    
+    return {
+        col: _label_missing_type(
+            p[col], max_abs_corr[col], len(numeric_cols - {col}) > 0
+        )
+        for col in columns
+    }
+
+def classify_missing_type(col_name, df_obj):
+    """Clasifica el tipo de valores faltantes (MCAR, MAR, MNAR)"""
+    if df_obj.empty:
+        return "Sin datos"
+    if not df_obj[col_name].isna().any():
+        return "Sin faltantes"
+    return classify_missing_types(df_obj[[col_name] + [c for c in df_obj.columns if c != col_name]])[col_name]
+
+def get_data_version(station=None):
+    """Versión de los datos cargados, para indexar resultados cacheados"""
+    if station is None:
+        return data_version
+    record = load_station(station)
+    return record['version'] if record else None
+
+def _station_record(station=None):
+    """Registro de una estación (None = la estación por defecto, solo si ya cargó)"""
+    if station is None:
+        if not is_data_ready():
+            return None
+        station = DEFAULT_STATION
+    return load_station(station)
+
+def get_aggregate_cube(name='imputed', station=None):
+    """Cubo de agregados por calendario (ver build_aggregate_cubes)
+
+    Retorna None si los datos aún no están cargados o el cubo no existe.
+    """
+    record = _station_record(station)
+    if record is None:
+        return None
+    return record['cubes'].get(name)
+
+def get_resampled(level='daily', col=None, station=None):
+    """Medias diarias/semanales/mensuales del frame imputado (ver ResampleStore)
+
+    Se calculan una vez al cargar la estación. Con col retorna la Serie de esa
+    columna (vista sin copia); sin col, el ResampleStore. None si los datos
+    no están listos o la columna no existe.
+    """
+    record = _station_record(station)
+    store = record.get('resampled') if record else None
+    if store is None or col is None:
+        return store
+    return store.column(level, col) if col in store.columns else None
+
+def _record_tuple(record):
+    if record is None:
+        return pd.DataFrame(), pd.DataFrame(), []
+    return record['original'], record['imputed'], record['analysis_cols']
+
+def get_data(station=None):
+    """Retorna los datasets para usar en otras páginas
+
+    station=None retorna la estación por defecto. Con una estación (p. ej.
+    'Tiantan') retorna su tupla (original, imputado, columnas), cargándola si
+    aún no está en memoria; con una lista retorna {estación: tupla}.
+    
+    Con snapshots activos las columnas son vistas de solo lectura sobre
+    archivos mapeados en memoria: no modificarlas en sitio (usar .copy()).
+    Mientras la carga no termina se retornan DataFrames vacíos.
+    """
+    if station is not None:
+        if isinstance(station, (list, tuple, set)):
+            return {key: _record_tuple(record) for key, record in load_stations(station).items()}
+        return _record_tuple(load_station(station))
+    
+    if df_original is None or df_imputed is None:
+        return pd.DataFrame(), pd.DataFrame(), []
     return df_original, df_imputed, analysis_cols
 
 def get_missing_analysis():
@@ -207,31 +972,419 @@ def get_missing_analysis():
     miss_after = miss_after[miss_after > 0].sort_values(ascending=False)
     
     # Classification types
-    types = {col: classify_missing_type(col, df_orig) for col in df_orig.columns if df_orig[col].isna().sum() > 0}
+    types = classify_missing_types(df_orig)
     
     return miss_before, miss_after, types
 
-def get_ks_test_results():
-    """Prueba KS para variables que tuvieron NA originalmente"""
-    df_orig, df_imp, _ = get_data()
-    
-    if df_orig.empty:
-        return []
-    
-    had_na = [c for c in df_orig.columns if df_orig[c].isna().sum() > 0 and c in get_analysis_columns(df_orig)]
-    ks_rows = []
-    
-    for c in had_na:
-        orig_vals = df_orig[c].dropna().values
-        new_vals = df_imp[c].dropna().values
-        if len(orig_vals) < 2 or len(new_vals) < 2:
-            ks_rows.append((c, np.nan, np.nan, "insuficientes datos"))
+def _ks_row(col, orig_vals, new_vals):
+    """Fila de resultado KS (variable, estadístico, p, nota)"""
+    if len(orig_vals) < 2 or len(new_vals) < 2:
+        return (col, np.nan, np.nan, "insuficientes datos")
+    try:
+        stat, p = ks_2samp(orig_vals, new_vals)
+        note = "No cambio significativo" if p > 0.05 else "Cambio significativo"
+        return (col, float(stat), float(p), note)
+    except Exception as e:
+        return (col, np.nan, np.nan, f"error: {e}")
+
+# Tamaño máximo de muestra para el cálculo exacto de p en ks_2samp (modo 'auto')
+_KS_EXACT_MAX_N = 10000
+
+def ks_2samp_sorted(a_sorted, b_sorted):
+    """Estadístico KS de dos muestras a partir de arrays ya ordenados
+
+    Evita re-ordenar columnas reutilizadas entre comparaciones. Para muestras
+    grandes usa la misma distribución asintótica que scipy (kstwo); para
+    muestras pequeñas delega en ks_2samp (p exacto).
+    """
+    n1, n2 = len(a_sorted), len(b_sorted)
+    if max(n1, n2) <= _KS_EXACT_MAX_N:
+        return ks_2samp(a_sorted, b_sorted)
+    data_all = np.concatenate([a_sorted, b_sorted])
+    cdf1 = np.searchsorted(a_sorted, data_all, side='right') / n1
+    cdf2 = np.searchsorted(b_sorted, data_all, side='right') / n2
+    d = float(np.max(np.abs(cdf1 - cdf2)))
+    m, n = sorted([float(n1), float(n2)], reverse=True)
+    en = m * n / (m + n)
+    p = float(np.clip(kstwo.sf(d, np.round(en)), 0, 1))
+    return d, p
+
+def get_sorted_values(frame, col, station=None):
+    """Valores válidos de una columna ordenados, cacheados por estación y versión
+
+    frame: 'original' o 'imputed'. Array vacío si los datos no están listos.
+    """
+    record = _station_record(station)
+    if record is None or col not in record[frame].columns:
+        return np.array([], dtype=np.float64)
+    key = (record['station'], record['version'], frame, col)
+    if key not in _sorted_cache:
+        df = record[frame]
+        values = df[col].dropna().to_numpy(dtype=np.float64)
+        _sorted_cache[key] = np.sort(values)
+    return _sorted_cache[key]
+
+def get_series_pyramid(col, frame='imputed', station=None):
+    """Pirámide temporal (ver utils.downsampling) de una columna, cacheada por versión
+
+    Sirve ventanas visibles a la resolución adecuada sin recorrer el frame
+    completo en cada zoom. Retorna None si no hay datos o columna.
+    """
+    record = _station_record(station)
+    if record is None:
+        return None
+    df = record[frame]
+    if df.empty or col not in df.columns or 'datetime' not in df.columns:
+        return None
+    key = (record['station'], record['version'], frame, col)
+    if key not in _pyramid_cache:
+        pyramid = TimePyramid(
+            df['datetime'].to_numpy(),
+            df[col].to_numpy(dtype=np.float64, na_value=np.nan),
+        )
+        # Niveles diario y semanal desde las medias ya calculadas al cargar
+        store = record['resampled'] if frame == 'imputed' else None
+        if store is not None and col in store.columns:
+            for level in ('daily', 'weekly'):
+                pyramid.seed_level(level, store.index(level).to_numpy(), store.values(level, col))
+        _pyramid_cache[key] = pyramid
+    return _pyramid_cache[key]
+
+def get_autocorrelation(col, station=None):
+    """ACF/PACF con bandas hasta ACF_MAX_LAGS, cacheadas por versión
+
+    Se calculan una vez por variable (ver utils.autocorrelation) y los lags
+    menores se sirven recortando con slice_lags. Retorna None si no hay datos.
+    """
+    record = _station_record(station)
+    if record is None:
+        return None
+    key = (record['station'], record['version'], col)
+    if key not in _autocorrelation_cache:
+        df = record['imputed']
+        if df.empty or col not in df.columns:
+            return None
+        values = df[col].dropna().to_numpy(dtype=np.float64)
+        if len(values) < 2:
+            return None
+        _autocorrelation_cache[key] = autocorrelation(values, ACF_MAX_LAGS)
+    return _autocorrelation_cache[key]
+
+def get_outlier_scores(col, window, station=None):
+    """Puntajes de atípico de la serie diaria de col con una ventana de window días
+
+    Todos los métodos se calculan juntos una vez por (versión, estación,
+    columna, ventana); cambiar método o umbral no recalcula nada. Retorna
+    None si los datos no están listos o la columna no existe.
+    """
+    record = _station_record(station)
+    daily = get_resampled('daily', col, record['station']) if record else None
+    if daily is None:
+        return None
+    key = (record['station'], record['version'], col, int(window))
+    with _outlier_lock:
+        if key in _outlier_cache:
+            _outlier_cache.move_to_end(key)
+            return _outlier_cache[key]
+    scores = OutlierScores(daily.index.to_numpy(), daily.to_numpy(), window)
+    with _outlier_lock:
+        _outlier_cache[key] = scores
+        while len(_outlier_cache) > OUTLIER_CACHE_SIZE:
+            _outlier_cache.popitem(last=False)
+    return scores
+
+def _analysis_executor():
+    global _analysis_pool
+    if _analysis_pool is None:
+        try:
+            # spawn: seguro aunque el servidor tenga hilos activos
+            ctx = multiprocessing.get_context('spawn')
+            _analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS, mp_context=ctx)
+        except Exception as e:
+            print(f"⚠️  Pool de procesos no disponible para análisis ({e}), se usan hilos")
+            _analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    return _analysis_pool
+
+def _submit_analysis(fn, *args):
+    """Encolar una tarea en el pool de análisis (llamar con _analysis_lock)
+
+    Si un proceso hijo murió (p. ej. el OOM killer) el pool queda roto y
+    rechaza toda tarea nueva: se descarta, se crea otro y se reintenta una vez.
+    """
+    global _analysis_pool
+    try:
+        return _analysis_executor().submit(fn, *args)
+    except BrokenProcessPool as e:
+        print(f"⚠️  Pool de análisis roto ({e}), se crea uno nuevo")
+        _analysis_pool.shutdown(wait=False, cancel_futures=True)
+        _analysis_pool = None
+        return _analysis_executor().submit(fn, *args)
+
+def shutdown_analysis_pool():
+    """Cancelar las tareas pendientes del pool de análisis
+
+    La llama el hook worker_exit de gunicorn (y atexit): sin esto la salida
+    espera todas las tareas encoladas (descomposiciones, ADF/KPSS) y supera
+    el timeout de un reinicio ordenado. Solo terminan las que ya corren.
+    """
+    global _analysis_pool
+    pool, _analysis_pool = _analysis_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(shutdown_analysis_pool)
+
+def _store_stationarity(key, future):
+    if future.cancelled():
+        with _analysis_lock:
+            _stationarity_pending.pop(key, None)
+        return
+    try:
+        result = future.result()
+    except Exception as e:
+        result = {'variable': key[2], 'error': str(e)}
+    with _analysis_lock:
+        _stationarity_pending.pop(key, None)
+        # Estación liberada mientras corría la prueba: no volver a retenerla
+        if key[0] in _stations:
+            _stationarity_cache[key] = result
+    if SNAPSHOT_ENABLED and 'error' not in result:
+        station, version, col = key
+        save_artifact(station_table(station), f"stationarity_{version}_{col}", result)
+
+def request_stationarity_tests(columns=None, station=None):
+    """Encolar ADF/KPSS (utils.stationarity) para las columnas sin resultado
+
+    Cada columna se prueba una vez por versión de datos en un pool de
+    procesos de fondo; los resultados se guardan junto al snapshot para que
+    los demás workers no repitan el cálculo. No bloquea.
+    """
+    record = _station_record(station)
+    if record is None or record['imputed'].empty:
+        return
+    df, version = record['imputed'], record['version']
+    if columns is None:
+        columns = [c for c in record['analysis_cols'] if pd.api.types.is_numeric_dtype(df[c])]
+    for col in columns:
+        if col not in df.columns:
             continue
+        key = (record['station'], version, col)
+        with _analysis_lock:
+            if key in _stationarity_cache or key in _stationarity_pending:
+                continue
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                _stationarity_cache[key] = {'variable': col, 'error': 'variable no numérica'}
+                continue
+            cached = (load_artifact(record['table'], f"stationarity_{version}_{col}")
+                      if SNAPSHOT_ENABLED else None)
+            if cached is not None:
+                _stationarity_cache[key] = cached
+                continue
+            values = df[col].dropna().to_numpy(dtype=np.float64)
+            try:
+                future = _submit_analysis(stationarity_tests, col, values)
+            except Exception as e:
+                # Registrar el error: la pestaña lo muestra y deja de consultar
+                print(f"⚠️  No se pudo encolar ADF/KPSS de {col}: {e}")
+                _stationarity_cache[key] = {'variable': col, 'error': f"no se pudo encolar: {e}"}
+                continue
+            _stationarity_pending[key] = future
+        future.add_done_callback(functools.partial(_store_stationarity, key))
+
+def get_stationarity_result(col, station=None):
+    """Resultado ADF/KPSS de una columna, o None mientras se calcula
+
+    Si la columna no estaba encolada, la encola (cálculo bajo demanda).
+    """
+    record = _station_record(station)
+    if record is None:
+        return None
+    key = (record['station'], record['version'], col)
+    if key not in _stationarity_cache:
+        request_stationarity_tests([col], record['station'])
+    return _stationarity_cache.get(key)
+
+def _decomposition_artifact(key):
+    """(tabla de la estación, nombre) del artifact de una descomposición"""
+    station, version, col, model, period, method = key
+    return station_table(station), f"decomposition_{version}_{col}_{model}_{period}_{method}"
+
+def _remember_decomposition(key, result):
+    """Guardar en el LRU las pirámides de un resultado de decompose()"""
+    pyramids = [TimePyramid(result['times'], result[c]) for c in COMPONENTS]
+    with _analysis_lock:
+        _decomposition_cache[key] = pyramids
+        _decomposition_cache.move_to_end(key)
+        while len(_decomposition_cache) > DECOMPOSITION_CACHE_SIZE:
+            _decomposition_cache.popitem(last=False)
+    return pyramids
+
+def _cached_decomposition(key):
+    """Pirámides ya calculadas (memoria o artifact del snapshot), o None"""
+    with _analysis_lock:
+        if key in _decomposition_cache:
+            _decomposition_cache.move_to_end(key)
+            return _decomposition_cache[key]
+    result = load_artifact(*_decomposition_artifact(key)) if SNAPSHOT_ENABLED else None
+    return _remember_decomposition(key, result) if result is not None else None
+
+def _store_decomposition(key, future):
+    with _analysis_lock:
+        _decomposition_pending.pop(key, None)
+    if future.cancelled():
+        return
+    try:
+        result = future.result()
+    except ValueError as e:
+        # Error propio de los datos (p. ej. multiplicativo con ceros): se recuerda
+        print(f"⚠️  Descomposición {key[2:]} fallida: {e}")
+        _decomposition_errors[key] = str(e)
+        return
+    except Exception as e:
+        # Fallo del pool (proceso terminado, pool roto): la próxima solicitud reintenta
+        print(f"⚠️  Descomposición {key[2:]} interrumpida: {e}")
+        return
+    if key[0] in _stations:
+        _remember_decomposition(key, result)
+    if SNAPSHOT_ENABLED:
+        save_artifact(*_decomposition_artifact(key), result)
+
+def request_decompositions(columns=None, periods=DECOMPOSITION_PERIODS,
+                           models=DECOMPOSITION_MODELS, methods=DECOMPOSITION_METHODS,
+                           station=None):
+    """Encolar en el pool de fondo las descomposiciones que falten
+
+    Por defecto: DECOMPOSITION_PRECOMPUTE_COLUMNS (o la primera variable de
+    análisis) × DECOMPOSITION_PERIODS × ambos modelos × ambos métodos.
+    """
+    record = _station_record(station)
+    if record is None or record['imputed'].empty:
+        return
+    station, version = record['station'], record['version']
+    if columns is None:
+        columns = DECOMPOSITION_PRECOMPUTE_COLUMNS or record['analysis_cols'][:1]
+    for col in columns:
+        pyramid = get_series_pyramid(col, station=station)
+        if pyramid is None:
+            continue
+        times, values = pyramid.level('hourly')
+        for period in periods:
+            for model in models:
+                for method in methods:
+                    key = (station, version, col, model, int(period), method)
+                    if key in _decomposition_errors or _cached_decomposition(key) is not None:
+                        continue
+                    with _analysis_lock:
+                        if key in _decomposition_pending:
+                            continue
+                        try:
+                            future = _submit_analysis(
+                                decompose, times, values, model, int(period), method)
+                        except Exception as e:
+                            print(f"⚠️  No se pudo encolar la descomposición de {col}: {e}")
+                            continue
+                        _decomposition_pending[key] = future
+                    future.add_done_callback(functools.partial(_store_decomposition, key))
+
+def get_decomposition(col, model='additive', period=24, method='classical', station=None):
+    """Pirámides de (serie, tendencia, estacionalidad, residual), cacheadas por versión
+
+    Usa el resultado precalculado o el que ya está corriendo en el pool; si
+    no existe, lo calcula aquí. En ambos casos encola el otro modelo del
+    mismo período y método, así alternar aditivo/multiplicativo no espera.
+    Retorna None si la variable no tiene datos; los errores de la
+    descomposición se propagan como ValueError. Si el pool falla (proceso
+    terminado), se calcula aquí.
+    """
+    record = _station_record(station)
+    if record is None:
+        return None
+    station = record['station']
+    key = (station, record['version'], col, model, int(period), method)
+    if key in _decomposition_errors:
+        raise ValueError(_decomposition_errors[key])
+    pyramids = _cached_decomposition(key)
+    if pyramids is not None:
+        return pyramids
+    pyramid = get_series_pyramid(col, station=station)
+    if pyramid is None or len(pyramid.level('hourly')[0]) == 0:
+        return None
+
+    request_decompositions([col], periods=[period], methods=[method],
+                           models=[m for m in DECOMPOSITION_MODELS if m != model], station=station)
+    with _analysis_lock:
+        future = _decomposition_pending.get(key)
+    result = None
+    if future is not None and not future.cancel():
+        # Ya en ejecución en el pool: esperar ese resultado
+        try:
+            result = future.result()
+        except ValueError as e:
+            raise ValueError(str(e)) from e
+        except Exception as e:
+            print(f"⚠️  Descomposición {key[2:]} interrumpida en el pool ({e}), se calcula aquí")
+    if result is None:
+        times, values = pyramid.level('hourly')
         try:
-            stat, p = ks_2samp(orig_vals, new_vals)
-            note = "No cambio significativo" if p > 0.05 else "Cambio significativo"
-            ks_rows.append((c, float(stat), float(p), note))
+            result = decompose(times, values, model, int(period), method)
+        except ValueError as e:
+            _decomposition_errors[key] = str(e)
+            raise
         except Exception as e:
-            ks_rows.append((c, np.nan, np.nan, f"error: {e}"))
+            raise ValueError(str(e)) from e
+        if SNAPSHOT_ENABLED:
+            save_artifact(*_decomposition_artifact(key), result)
+    return _remember_decomposition(key, result)
+
+def ks_compare(col, candidate_values, station=None):
+    """Comparar una imputación candidata contra la distribución original
+
+    Reutiliza la columna original ya ordenada; solo se ordena el candidato.
+    """
+    orig_sorted = get_sorted_values('original', col, station)
+    candidate = np.asarray(candidate_values, dtype=np.float64)
+    candidate = np.sort(candidate[~np.isnan(candidate)])
+    if len(orig_sorted) < 2 or len(candidate) < 2:
+        return (col, np.nan, np.nan, "insuficientes datos")
+    stat, p = ks_2samp_sorted(orig_sorted, candidate)
+    note = "No cambio significativo" if p > 0.05 else "Cambio significativo"
+    return (col, float(stat), float(p), note)
+
+def get_ks_test_results(presorted=False, station=None):
+    """Prueba KS para variables que tuvieron NA originalmente
+
+    Se calcula una vez por versión de datos y se guarda junto al snapshot.
+    presorted solo cambia cómo se calcula (arrays ordenados cacheados y
+    ks_2samp_sorted), no el resultado: ambas variantes comparten la caché.
+    Sin pool de procesos: una estación tarda menos de un segundo en serie,
+    menos que arrancar el pool.
+    """
+    record = _station_record(station)
+    if record is None or record['original'].empty:
+        return []
+    df_orig, df_imp = record['original'], record['imputed']
+    station = record['station']
+    
+    memo_key = (station, record['version'])
+    cache_key = f"ks_{record['version']}"
+    if memo_key in _ks_cache:
+        return _ks_cache[memo_key]
+    if SNAPSHOT_ENABLED:
+        cached = load_artifact(record['table'], cache_key)
+        if cached is not None:
+            _ks_cache[memo_key] = cached
+            return cached
+    
+    analysis = set(get_analysis_columns(df_orig))
+    had_na = [c for c in df_orig.columns if c in analysis and df_orig[c].isna().any()]
+    
+    if presorted:
+        ks_rows = [ks_compare(c, get_sorted_values('imputed', c, station), station) for c in had_na]
+    else:
+        ks_rows = [_ks_row(c, df_orig[c].dropna().to_numpy(), df_imp[c].dropna().to_numpy())
+                   for c in had_na]
     
-    return ks_rows
\ No newline at end of file
+    _ks_cache[memo_key] = ks_rows
+    if SNAPSHOT_ENABLED:
+        save_artifact(record['table'], cache_key, ks_rows)
+    return ks_rows
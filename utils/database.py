@@ -1,27 +1,370 @@
 # utils/database.py
+import hashlib
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text, MetaData, Table, select, types as sqltypes
+from sqlalchemy.pool import QueuePool
 import os
+import tempfile
+import threading
+import time
+
+# Configuración del pool de conexiones (sobrescribible por variables de entorno)
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'True').lower() == 'true'
+
+# Filas por bloque en la carga con cursor del lado del servidor
+DEFAULT_CHUNKSIZE = int(os.environ.get('DB_CHUNKSIZE', 50000))
+
+# Métodos de carga de tablas completas: read_sql_table, cursor por bloques o COPY
+LOAD_METHODS = ('sql', 'stream', 'copy')
+DEFAULT_LOAD_METHOD = os.environ.get('DB_LOAD_METHOD', 'copy')
+
+# Clave entera ordenable de cada lectura horaria (YYYYMMDDHH)
+TIME_KEY_SQL = "year * 1000000 + month * 10000 + day * 100 + hour"
+
+# Tamaño en memoria del buffer de COPY antes de pasar a disco
+COPY_SPOOL_MAX_SIZE = 64 * 1024 * 1024
+# Marca de NULL en la salida de COPY: distinta de la cadena vacía, que es un
+# valor válido en columnas de texto
+COPY_NULL = r'\N'
+
+# Registro de engines por proceso: {url: engine}
+_engines = {}
+_engines_pid = os.getpid()
+_engines_lock = threading.Lock()
+
+
+class PoolStats:
+    """Contadores de uso del pool (checkouts y tiempos de espera)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record(self, wait, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self):
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'total_wait_s': self.total_wait,
+                'avg_wait_s': self.total_wait / attempts if attempts else 0.0,
+                'max_wait_s': self.max_wait,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide el tiempo de espera en cada checkout"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # dispose() recrea el pool; conservar las estadísticas acumuladas
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def _discard_inherited_engines():
+    """Descartar engines heredados del proceso padre (p. ej. workers de gunicorn)"""
+    global _engines, _engines_pid
+    for engine in _engines.values():
+        # close=False: no cerrar los sockets que siguen siendo del padre
+        engine.dispose(close=False)
+    _engines = {}
+    _engines_pid = os.getpid()
+
+def _reset_after_fork():
+    global _engines_lock
+    _engines_lock = threading.Lock()
+    _discard_inherited_engines()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 def get_db_connection():
-    """Obtener conexión a PostgreSQL"""
+    """Obtener el engine compartido (con pool) hacia PostgreSQL"""
     DATABASE_URL = os.environ.get('DATABASE_URL')
     if not DATABASE_URL:
         raise ValueError("DATABASE_URL no está configurada")
-    
-    engine = create_engine(DATABASE_URL)
+
+    with _engines_lock:
+        if _engines_pid != os.getpid():
+            _discard_inherited_engines()
+
+        engine = _engines.get(DATABASE_URL)
+        if engine is None:
+            engine = create_engine(
+                DATABASE_URL,
+                poolclass=TimedQueuePool,
+                pool_size=POOL_SIZE,
+                max_overflow=POOL_MAX_OVERFLOW,
+                pool_timeout=POOL_TIMEOUT,
+                pool_recycle=POOL_RECYCLE,
+                pool_pre_ping=POOL_PRE_PING,
+            )
+            _engines[DATABASE_URL] = engine
     return engine
 
-def load_table(table_name):
-    """Cargar una tabla completa desde PostgreSQL"""
+def get_pool_stats():
+    """Estadísticas del pool de cada engine activo en este proceso"""
+    stats = {}
+    for url, engine in list(_engines.items()):
+        pool = engine.pool
+        info = {
+            'pid': _engines_pid,
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        }
+        if isinstance(pool, TimedQueuePool):
+            info.update(pool.stats.as_dict())
+        stats[engine.url.render_as_string(hide_password=True)] = info
+    return stats
+
+def dispose_engines():
+    """Cerrar todas las conexiones del pool de este proceso"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+def _numpy_dtype(sql_type):
+    """Tipo NumPy destino para un tipo de columna SQL"""
+    if isinstance(sql_type, sqltypes.Boolean):
+        return np.dtype(object)
+    if isinstance(sql_type, sqltypes.Integer):
+        return np.dtype('int64')
+    if isinstance(sql_type, (sqltypes.Float, sqltypes.Numeric)):
+        return np.dtype('float64')
+    if isinstance(sql_type, (sqltypes.DateTime, sqltypes.Date)):
+        return np.dtype('datetime64[ns]')
+    return np.dtype(object)
+
+def _rows_to_columns(rows, dtypes):
+    """Convertir un bloque de filas en arrays NumPy tipados (uno por columna)"""
+    arrays = []
+    for values, dtype in zip(zip(*rows), dtypes):
+        if dtype.kind == 'i' and None in values:
+            # Enteros con nulos: se promueven a float64 con NaN
+            dtype = np.dtype('float64')
+        arrays.append(np.array(values, dtype=dtype))
+    return arrays
+
+def iter_table_chunks(table_name, chunksize=DEFAULT_CHUNKSIZE):
+    """Recorrer una tabla en bloques usando un cursor del lado del servidor
+
+    Cada bloque se entrega como dict {columna: ndarray} ya tipado, de modo que
+    solo un bloque de filas vive como objetos Python a la vez.
+    """
     engine = get_db_connection()
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    names = [col.name for col in table.columns]
+    dtypes = [_numpy_dtype(col.type) for col in table.columns]
+
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, max_row_buffer=chunksize
+        ).execute(select(table))
+        for rows in result.partitions(chunksize):
+            yield dict(zip(names, _rows_to_columns(rows, dtypes)))
+
+def _load_table_chunked(table_name, chunksize):
+    """Acumular los bloques por columna y concatenar una sola vez al final"""
+    parts = {}
+    for chunk in iter_table_chunks(table_name, chunksize=chunksize):
+        for name, values in chunk.items():
+            parts.setdefault(name, []).append(values)
+
+    if not parts:
+        return pd.DataFrame()
+    columns = {name: np.concatenate(chunks) for name, chunks in parts.items()}
+    return pd.DataFrame(columns, copy=False)
+
+def parse_copy_csv(stream, dtypes=None):
+    """Parsear la salida de COPY ... (FORMAT csv, HEADER) con el parser en C de pandas
+
+    Acepta cualquier stream binario (buffer de COPY o un volcado grabado).
+    Se espera COPY con NULL COPY_NULL: solo esa marca es NULL y la cadena
+    vacía ("") se conserva. En columnas float también 'NaN' (así exporta
+    PostgreSQL los NaN).
+    """
+    dtypes = dtypes or {}
+    read_dtypes = {name: dtype for name, dtype in dtypes.items()
+                   if dtype.kind in ('f', 'O')}
+    parse_dates = [name for name, dtype in dtypes.items() if dtype.kind == 'M']
+    na_values = {name: [COPY_NULL, 'NaN'] if dtype.kind == 'f' else [COPY_NULL]
+                 for name, dtype in dtypes.items()}
+    return pd.read_csv(
+        stream,
+        dtype=read_dtypes,
+        parse_dates=parse_dates,
+        keep_default_na=False,
+        na_values=na_values or [COPY_NULL],
+    )
+
+def _load_table_copy(table_name):
+    """Volcar la tabla con COPY TO STDOUT y parsearla de forma columnar"""
+    engine = get_db_connection()
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    dtypes = {col.name: _numpy_dtype(col.type) for col in table.columns}
+    quoted = engine.dialect.identifier_preparer.format_table(table)
+
+    raw = engine.raw_connection()
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=COPY_SPOOL_MAX_SIZE, mode='w+b') as buffer:
+            cursor = raw.cursor()
+            cursor.copy_expert(
+                f"COPY {quoted} TO STDOUT WITH (FORMAT csv, HEADER true, NULL '{COPY_NULL}')", buffer)
+            cursor.close()
+            buffer.seek(0)
+            return parse_copy_csv(buffer, dtypes)
+    finally:
+        raw.close()
+
+def load_table(table_name, chunksize=None, method=None):
+    """Cargar una tabla completa desde PostgreSQL
+
+    method: 'sql' (read_sql_table), 'stream' (cursor del lado del servidor,
+    bloques de chunksize filas convertidos a columnas NumPy) o 'copy'
+    (COPY TO STDOUT en CSV parseado de forma columnar; solo PostgreSQL).
+    Por compatibilidad, sin method se usa 'stream' si hay chunksize.
+    """
+    if method is None:
+        method = 'stream' if chunksize else 'sql'
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Método de carga desconocido: {method}")
+
+    engine = get_db_connection()
+    if method == 'copy' and engine.dialect.name != 'postgresql':
+        print(f"⚠️  COPY no disponible para {engine.dialect.name}, usando cursor por bloques")
+        method = 'stream'
+
     try:
+        if method == 'copy':
+            try:
+                return _load_table_copy(table_name)
+            except Exception as e:
+                print(f"⚠️  COPY falló para {table_name} ({e}), usando cursor por bloques")
+                method = 'stream'
+        if method == 'stream':
+            return _load_table_chunked(table_name, chunksize or DEFAULT_CHUNKSIZE)
         df = pd.read_sql_table(table_name, engine)
         return df
     except Exception as e:
         print(f"Error cargando tabla {table_name}: {e}")
         return pd.DataFrame()
 
+def benchmark_load_methods(table_name, methods=LOAD_METHODS, repeat=3, chunksize=DEFAULT_CHUNKSIZE):
+    """Comparar tiempos de carga de una tabla entre métodos
+
+    Retorna un DataFrame con el mejor y el promedio de `repeat` corridas.
+    """
+    rows = []
+    for method in methods:
+        timings = []
+        n_rows = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            df = load_table(table_name, chunksize=chunksize, method=method)
+            timings.append(time.perf_counter() - start)
+            n_rows = len(df)
+            del df
+        rows.append({
+            'method': method,
+            'rows': n_rows,
+            'best_s': min(timings),
+            'mean_s': sum(timings) / len(timings),
+        })
+
+    result = pd.DataFrame(rows)
+    baseline = result.loc[result['method'] == 'sql', 'best_s']
+    if not baseline.empty:
+        result['speedup_vs_sql'] = baseline.iloc[0] / result['best_s']
+    return result
+
+def get_table_fingerprint(table_name):
+    """Huella de una tabla: número de filas, última marca temporal y hash del esquema
+
+    Retorna None si la base de datos no está disponible.
+    """
+    try:
+        engine = get_db_connection()
+        columns = inspect(engine).get_columns(table_name)
+        schema = '|'.join(f"{col['name']}:{col['type']}" for col in columns)
+        names = {col['name'] for col in columns}
+        quoted = engine.dialect.identifier_preparer.quote(table_name)
+
+        if {'year', 'month', 'day', 'hour'}.issubset(names):
+            max_expr = f"MAX({TIME_KEY_SQL})"
+        else:
+            max_expr = "NULL"
+        with engine.connect() as conn:
+            n_rows, max_key = conn.execute(
+                text(f"SELECT COUNT(*), {max_expr} FROM {quoted}")
+            ).one()
+
+        return {
+            'table': table_name,
+            'rows': int(n_rows),
+            'max_key': int(max_key) if max_key is not None else None,
+            'schema': hashlib.sha1(schema.encode('utf-8')).hexdigest(),
+        }
+    except Exception as e:
+        print(f"Error obteniendo huella de {table_name}: {e}")
+        return None
+
+def load_rows_after(table_name, max_key):
+    """Cargar solo las lecturas posteriores a una clave YYYYMMDDHH
+
+    Retorna None si la consulta falla (distinto de un DataFrame vacío).
+    """
+    engine = get_db_connection()
+    quoted = engine.dialect.identifier_preparer.quote(table_name)
+    query = text(
+        f"SELECT * FROM {quoted} WHERE {TIME_KEY_SQL} > :max_key "
+        f"ORDER BY year, month, day, hour"
+    )
+    try:
+        return pd.read_sql(query, engine, params={'max_key': int(max_key)})
+    except Exception as e:
+        print(f"Error cargando filas nuevas de {table_name}: {e}")
+        return None
+
 def load_data_from_query(query):
     """Ejecutar una consulta SQL y retornar DataFrame"""
     engine = get_db_connection()
@@ -0,0 +1,64 @@
+# utils/decomposition.py - Descomposición estacional (clásica o STL) de una serie horaria
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.seasonal import STL, seasonal_decompose
+
+DECOMPOSITION_METHODS = ('classical', 'stl')
+DECOMPOSITION_MODELS = ('additive', 'multiplicative')
+COMPONENTS = ('series', 'trend', 'seasonal', 'resid')
+
+# Fracción de cada ventana LOESS que STL salta entre evaluaciones: con
+# períodos largos (8760) la tendencia usa ventanas de ~17k puntos y sin
+# saltos el ajuste tarda minutos; con saltos queda en pocos segundos
+STL_JUMP_FRACTION = 0.05
+STL_SEASONAL_WINDOW = 7
+
+
+def _odd(x):
+    x = int(np.ceil(x))
+    return x if x % 2 else x + 1
+
+def _stl_components(series, period):
+    trend_window = _odd(1.5 * period / (1 - 1.5 / STL_SEASONAL_WINDOW))
+    low_pass_window = _odd(period + 1)
+    result = STL(
+        series, period=period, seasonal=STL_SEASONAL_WINDOW, robust=True,
+        trend_jump=max(1, int(STL_JUMP_FRACTION * trend_window)),
+        low_pass_jump=max(1, int(STL_JUMP_FRACTION * low_pass_window)),
+    ).fit()
+    return result.trend, result.seasonal, result.resid
+
+def decompose(times, values, model='additive', period=24, method='classical'):
+    """Descomponer una serie en tendencia, estacionalidad y residual
+
+    times/values sin NaN y en orden temporal. method 'classical' usa
+    seasonal_decompose (medias móviles); 'stl' usa STL robusto, que tolera
+    valores atípicos. STL es aditivo: el modelo multiplicativo se obtiene
+    descomponiendo el logaritmo y volviendo con exp (requiere valores > 0).
+
+    Función de módulo (se ejecuta en el pool de procesos). Retorna un dict
+    con 'times' y un array por componente de COMPONENTS.
+    """
+    if method not in DECOMPOSITION_METHODS:
+        raise ValueError(f"Método de descomposición desconocido: {method}")
+    series = pd.Series(np.asarray(values, dtype=np.float64),
+                       index=pd.DatetimeIndex(times))
+
+    if method == 'stl':
+        if model == 'multiplicative':
+            if (series <= 0).any():
+                raise ValueError("El modelo multiplicativo requiere valores positivos")
+            trend, seasonal, resid = (np.exp(c) for c in _stl_components(np.log(series), period))
+        else:
+            trend, seasonal, resid = _stl_components(series, period)
+    else:
+        result = seasonal_decompose(series, model=model, period=period)
+        trend, seasonal, resid = result.trend, result.seasonal, result.resid
+
+    return {
+        'times': series.index.to_numpy(),
+        'series': series.to_numpy(),
+        'trend': np.asarray(trend, dtype=np.float64),
+        'seasonal': np.asarray(seasonal, dtype=np.float64),
+        'resid': np.asarray(resid, dtype=np.float64),
+    }
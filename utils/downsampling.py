@@ -0,0 +1,262 @@
+# utils/downsampling.py - Pirámide temporal y reducción LTTB para gráficos de series largas
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Puntos máximos por traza enviados al navegador
+PLOT_POINT_BUDGET = int(os.environ.get('PLOT_POINT_BUDGET', 2000))
+# Entrada máxima de LTTB en múltiplos del presupuesto: por encima se usa un
+# nivel más grueso de la pirámide, así el costo por solicitud queda acotado
+PYRAMID_MAX_RATIO = int(os.environ.get('PYRAMID_MAX_RATIO', 50))
+
+PYRAMID_LEVELS = ('hourly', 'daily', 'weekly')
+LEVEL_LABELS = {'hourly': 'Horaria', 'daily': 'Diaria', 'weekly': 'Semanal'}
+_LEVEL_STEP = {
+    'hourly': np.timedelta64(1, 'h'),
+    'daily': np.timedelta64(1, 'D'),
+    'weekly': np.timedelta64(7, 'D'),
+}
+# 1970-01-05 fue lunes: las semanas empiezan en lunes
+_WEEK_ORIGIN = np.datetime64('1970-01-05T00:00:00', 'ns')
+
+
+def lttb_indices(x, y, n_out):
+    """Índices elegidos por Largest-Triangle-Three-Buckets
+
+    x e y son arrays float sin NaN, con x creciente. Conserva el primer y el
+    último punto; de cada bucket intermedio elige el punto que forma el
+    triángulo de mayor área con el punto anterior elegido y el promedio del
+    bucket siguiente.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Límites de los n_out - 2 buckets intermedios (sin el primer/último punto)
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    # Promedio del bucket siguiente a cada bucket (el último usa el punto final)
+    next_x = np.append(sums_x[1:] / sizes[1:], x[-1])
+    next_y = np.append(sums_y[1:] / sizes[1:], y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        ax, ay = x[a], y[a]
+        # Doble del área del triángulo (A, B, C) para cada candidato B
+        area = np.abs((ax - next_x[i]) * (by - ay) - (ax - bx) * (next_y[i] - ay))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+def lttb(times, values, n_out=PLOT_POINT_BUDGET):
+    """Reducir una serie temporal a n_out puntos con LTTB (ignora NaN)"""
+    times = np.asarray(times, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+    ok = ~np.isnan(values) & ~np.isnat(times)
+    times, values = times[ok], values[ok]
+    idx = lttb_indices(times.astype(np.int64).astype(np.float64), values, n_out)
+    return times[idx], values[idx]
+
+def resample_mean(times, values, level):
+    """Media por hora/día/semana (lunes) con NumPy; omite los buckets vacíos"""
+    times = np.asarray(times, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+    ok = ~np.isnan(values) & ~np.isnat(times)
+    times, values = times[ok], values[ok]
+    if len(times) == 0:
+        return times, values
+
+    step = _LEVEL_STEP[level]
+    codes = (times - _WEEK_ORIGIN) // step
+    first = codes.min()
+    codes = codes - first
+    counts = np.bincount(codes)
+    sums = np.bincount(codes, weights=values)
+    present = np.flatnonzero(counts)
+    bucket_times = _WEEK_ORIGIN + (present + first) * step
+    return bucket_times, sums[present] / counts[present]
+
+
+class TimePyramid:
+    """Serie a resolución horaria, diaria y semanal (medias)
+
+    Los niveles gruesos se calculan al primer uso. window() elige el nivel
+    más fino cuyo tramo visible cabe en PYRAMID_MAX_RATIO × presupuesto y lo
+    reduce con LTTB, de modo que la respuesta tiene a lo sumo `budget` puntos
+    sin importar cuántos años haya cargados.
+    """
+
+    def __init__(self, times, values):
+        times = np.asarray(times, dtype='datetime64[ns]')
+        values = np.asarray(values, dtype=np.float64)
+        ok = ~np.isnan(values) & ~np.isnat(times)
+        times, values = times[ok], values[ok]
+        if len(times) > 1 and (np.diff(times) < np.timedelta64(0, 'ns')).any():
+            order = np.argsort(times, kind='stable')
+            times, values = times[order], values[order]
+        self._levels = {'hourly': (times, values)}
+
+    @classmethod
+    def from_series(cls, series):
+        """Construir desde una Serie con índice datetime"""
+        return cls(series.index.to_numpy(), series.to_numpy(dtype=np.float64, na_value=np.nan))
+
+    def seed_level(self, name, times, values):
+        """Usar un nivel ya agregado (p. ej. de ResampleStore) en lugar de calcularlo"""
+        times = np.asarray(times, dtype='datetime64[ns]')
+        values = np.asarray(values, dtype=np.float64)
+        ok = ~np.isnan(values)
+        self._levels[name] = (times[ok], values[ok])
+
+    def level(self, name):
+        """(tiempos, valores) de un nivel de la pirámide"""
+        if name not in self._levels:
+            times, values = self._levels['hourly']
+            self._levels[name] = resample_mean(times, values, name)
+        return self._levels[name]
+
+    def _bounds(self, name, start, end):
+        times = self.level(name)[0]
+        lo = 0 if start is None else int(np.searchsorted(times, np.datetime64(start, 'ns'), side='left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, np.datetime64(end, 'ns'), side='right'))
+        return lo, hi
+
+    def choose_level(self, start=None, end=None, budget=PLOT_POINT_BUDGET):
+        """Nivel más fino cuyo tramo [start, end] no supera PYRAMID_MAX_RATIO × budget"""
+        limit = budget * PYRAMID_MAX_RATIO
+        for name in PYRAMID_LEVELS:
+            lo, hi = self._bounds(name, start, end)
+            if hi - lo <= limit:
+                return name
+        return PYRAMID_LEVELS[-1]
+
+    def window(self, start=None, end=None, budget=PLOT_POINT_BUDGET, level=None):
+        """Tramo visible reducido: retorna (tiempos, valores, nivel)"""
+        name = level or self.choose_level(start, end, budget)
+        lo, hi = self._bounds(name, start, end)
+        times, values = self.level(name)
+        times, values = times[lo:hi], values[lo:hi]
+        idx = lttb_indices(times.astype(np.int64).astype(np.float64), values, budget)
+        return times[idx], values[idx], name
+
+
+RESAMPLE_LEVELS = ('daily', 'weekly', 'monthly')
+
+
+def _calendar_units(times, level):
+    """Inicio del día/semana (lunes)/mes de cada instante, como datetime64"""
+    days = times.astype('datetime64[D]')
+    if level == 'daily':
+        return days
+    if level == 'weekly':
+        origin = _WEEK_ORIGIN.astype('datetime64[D]')
+        return days - (days - origin) % np.timedelta64(7, 'D')
+    if level == 'monthly':
+        return times.astype('datetime64[M]')
+    raise ValueError(f"Nivel de agregación desconocido: {level}")
+
+
+class ResampleStore:
+    """Medias diarias, semanales (lunes) y mensuales de varias columnas
+
+    Equivale a set_index('datetime').resample('D'/'W-MON'/'MS').mean() sobre
+    una grilla de calendario completa (períodos sin datos en NaN, con la
+    etiqueta al inicio del período), pero se calcula una sola vez para todas
+    las columnas. Cada nivel es un bloque columnar: values() y column()
+    retornan vistas sin copia.
+    """
+
+    def __init__(self, times, columns):
+        times = np.asarray(times, dtype='datetime64[ns]')
+        valid = ~np.isnat(times)
+        times = times[valid]
+        self.columns = list(columns)
+        self._positions = {col: j for j, col in enumerate(self.columns)}
+        self._levels = {}
+        for level in RESAMPLE_LEVELS:
+            units = _calendar_units(times, level)
+            if len(units) == 0:
+                index = pd.DatetimeIndex([], name='datetime')
+                block = np.empty((0, len(self.columns)), order='F')
+            else:
+                first, last = units.min(), units.max()
+                codes = (units - first).astype(np.int64)
+                if level == 'weekly':
+                    codes //= 7
+                nb = int(codes.max()) + 1
+                step = np.timedelta64(7, 'D') if level == 'weekly' else 1
+                index = pd.DatetimeIndex((first + np.arange(nb) * step).astype('datetime64[ns]'), name='datetime')
+                block = np.empty((nb, len(self.columns)), order='F')
+                for j, col in enumerate(self.columns):
+                    values = np.asarray(columns[col], dtype=np.float64)[valid]
+                    ok = ~np.isnan(values)
+                    counts = np.bincount(codes, weights=ok, minlength=nb)
+                    sums = np.bincount(codes, weights=np.where(ok, values, 0.0), minlength=nb)
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        block[:, j] = np.where(counts > 0, sums / counts, np.nan)
+            self._levels[level] = (index, block)
+
+    @classmethod
+    def from_frame(cls, df, columns, datetime_col='datetime'):
+        """Construir desde un DataFrame horario"""
+        columns = [c for c in columns if c in df.columns]
+        return cls(df[datetime_col].to_numpy(),
+                   {c: df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in columns})
+
+    def index(self, level):
+        """Etiquetas (inicio de período) de un nivel"""
+        return self._levels[level][0]
+
+    def values(self, level, col):
+        """Medias de una columna en un nivel (vista del bloque, NaN si vacío)"""
+        return self._levels[level][1][:, self._positions[col]]
+
+    def column(self, level, col):
+        """Serie con índice datetime de una columna en un nivel (sin copia)"""
+        return pd.Series(self.values(level, col), index=self.index(level), name=col, copy=False)
+
+
+_RANGE_ITEM_KEY = re.compile(r'^xaxis\d*\.range\[([01])\]$')
+_RANGE_KEY = re.compile(r'^xaxis\d*\.range$')
+_AUTORANGE_KEY = re.compile(r'^xaxis\d*\.autorange$')
+
+def relayout_x_range(relayout_data):
+    """Rango X visible a partir del relayoutData de un dcc.Graph
+
+    Retorna (inicio, fin) tras un zoom/desplazamiento, (None, None) si se
+    restableció la vista completa y None si el evento no afectó al eje X
+    (zoom vertical, cambio de modo, etc.). Acepta cualquier eje xaxisN.
+    """
+    if not relayout_data:
+        return None
+    bounds = [None, None]
+    for key, value in relayout_data.items():
+        match = _RANGE_ITEM_KEY.match(key)
+        if match:
+            bounds[int(match.group(1))] = value
+        elif _RANGE_KEY.match(key) and isinstance(value, (list, tuple)) and len(value) == 2:
+            bounds = list(value)
+        elif _AUTORANGE_KEY.match(key) and value:
+            return None, None
+    if bounds[0] is None or bounds[1] is None:
+        return None
+    try:
+        start, end = (pd.Timestamp(b).to_datetime64() for b in bounds)
+    except (ValueError, TypeError):
+        return None
+    return (start, end) if start <= end else (end, start)
+
+def downsample_series(series, start=None, end=None, budget=PLOT_POINT_BUDGET, level=None):
+    """Reducir una Serie con índice datetime para graficar: (tiempos, valores, nivel)"""
+    if series is None or len(series) == 0:
+        return np.array([], dtype='datetime64[ns]'), np.array([]), 'hourly'
+    return TimePyramid.from_series(series).window(start, end, budget, level)
@@ -0,0 +1,286 @@
+# utils/figure_cache.py - Caché de salidas de callbacks (figuras Plotly y componentes)
+import functools
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from dash import ctx, no_update
+from plotly.io.json import to_json_plotly
+
+from utils.data_loader import get_data_version
+
+# Tamaño máximo (bytes de JSON) de la caché en memoria de cada proceso
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get('FIGURE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# Directorio del nivel en disco compartido por los workers (vacío = desactivado)
+FIGURE_CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', '')
+# Tamaño máximo del nivel en disco; se revisa cada FIGURE_CACHE_PRUNE_EVERY escrituras
+FIGURE_CACHE_DIR_MAX_BYTES = int(os.environ.get('FIGURE_CACHE_DIR_MAX_BYTES', 512 * 1024 * 1024))
+FIGURE_CACHE_PRUNE_EVERY = 50
+FIGURE_CACHE_ENABLED = os.environ.get('FIGURE_CACHE_ENABLED', 'True').lower() == 'true'
+
+
+def _normalize(value):
+    """Forma canónica de un argumento de callback para la clave"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    return value
+
+def make_key(name, version, args):
+    """Clave estable: callback + versión de los datos + argumentos normalizados
+
+    Empieza por la versión ('<versión>_<hash>') para poder descartar en disco
+    las entradas de versiones anteriores.
+    """
+    payload = json.dumps([name, version, _normalize(list(args))], sort_keys=True, default=str)
+    return f"{version}_{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+class FigureCache:
+    """LRU en memoria acotada por tamaño + nivel opcional en disco
+
+    Guarda la salida del callback ya serializada a JSON (Plotly serializa
+    tanto figuras como componentes de Dash), de modo que una vista repetida
+    solo decodifica JSON sin volver a pasar por pandas ni por Plotly.
+
+    En disco, al escribir la primera entrada de una versión nueva se borran
+    las de otras versiones, y el total se acota a disk_max_bytes borrando
+    primero los archivos usados hace más tiempo.
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES, directory=FIGURE_CACHE_DIR,
+                 disk_max_bytes=FIGURE_CACHE_DIR_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0,
+                          'disk_evictions': 0}
+        self._disk_version = None
+        self._disk_writes = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, key, text):
+        size = len(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = text
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= len(old)
+                self._counters['evictions'] += 1
+
+    def get(self, key):
+        """JSON guardado para la clave, o None"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return text
+
+        if self.directory:
+            try:
+                with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except OSError:
+                text = None
+            if text is not None:
+                self._remember(key, text)
+                self._count('disk_hits')
+                try:
+                    # Marcar como usado: la poda borra primero los más antiguos
+                    os.utime(self._disk_path(key))
+                except OSError:
+                    pass
+                return text
+
+        self._count('misses')
+        return None
+
+    def put(self, key, text):
+        """Guardar el JSON en memoria y, si está activado, en disco"""
+        self._remember(key, text)
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Escritura atómica: otro worker nunca lee un archivo a medias
+            tmp_path = self._disk_path(f"{key}.{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir la figura en caché de disco: {e}")
+            return
+
+        version = key.split('_', 1)[0]
+        with self._lock:
+            self._disk_writes += 1
+            new_version = version != self._disk_version
+            self._disk_version = version
+            due = self._disk_writes % FIGURE_CACHE_PRUNE_EVERY == 0
+        if new_version or due:
+            self.prune_disk(keep_version=version)
+
+    def _disk_files(self):
+        """[(mtime, tamaño, ruta)] de las entradas en disco"""
+        files = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return files
+        for name in names:
+            if not name.endswith('.json') or '.tmp' in name:
+                # Escrituras en curso de otros workers
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def prune_disk(self, keep_version=None):
+        """Borrar del disco otras versiones y lo más antiguo por encima de disk_max_bytes
+
+        Con keep_version=None solo se aplica el límite de tamaño.
+        """
+        if not self.directory:
+            return
+        removed = 0
+        files = []
+        for mtime, size, path in self._disk_files():
+            if keep_version is not None and not os.path.basename(path).startswith(f"{keep_version}_"):
+                removed += self._remove(path)
+            else:
+                files.append((mtime, size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            removed += self._remove(path)
+            total -= size
+        if removed:
+            with self._lock:
+                self._counters['disk_evictions'] += removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            # Otro worker ya lo borró
+            return 0
+
+    def clear(self, disk=True):
+        """Vaciar la caché en memoria y, con disk, también el nivel en disco"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if disk and self.directory:
+            for _, _, path in self._disk_files():
+                self._remove(path)
+
+    def stats(self):
+        """Contadores de aciertos/fallos y ocupación"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update(entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+figure_cache = FigureCache()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=figure_cache._reset_after_fork)
+
+
+class Uncached:
+    """Salida de un callback que se envía al navegador pero no se guarda
+
+    Para las ramas de error: un fallo transitorio (BD, pool de análisis) no
+    debe quedar fijo en la caché durante toda la versión de los datos.
+    """
+
+    def __init__(self, result):
+        self.result = result
+
+def uncached(*outputs):
+    """Marcar la salida (una o varias) de un callback para no cachearla"""
+    return Uncached(outputs if len(outputs) > 1 else outputs[0])
+
+def _contains_no_update(result):
+    if isinstance(result, (list, tuple)):
+        return any(r is no_update for r in result)
+    return result is no_update
+
+def _encode(result):
+    """JSON de la salida (figura, componentes o tupla de ellos)"""
+    multi = isinstance(result, (list, tuple))
+    value = to_json_plotly(list(result) if multi else result, engine='json')
+    return f'{{"multi": {"true" if multi else "false"}, "value": {value}}}'
+
+def _decode(text):
+    payload = json.loads(text)
+    return tuple(payload['value']) if payload['multi'] else payload['value']
+
+def cached_callback(name, use_trigger=False, cache=None):
+    """Memoizar un callback por versión de los datos y argumentos
+
+    use_trigger agrega a la clave el id del input que disparó el callback,
+    para los callbacks cuyo resultado depende de él (p. ej. zoom vs. cambio
+    de variable). No se guarda nada mientras los datos no estén listos,
+    cuando la salida contiene no_update ni cuando viene marcada con uncached().
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            target = cache or figure_cache
+            version = get_data_version()
+            if not FIGURE_CACHE_ENABLED or version is None:
+                result = func(*args)
+                return result.result if isinstance(result, Uncached) else result
+
+            key_args = list(args)
+            if use_trigger:
+                key_args.append(str(ctx.triggered_id))
+            key = make_key(name, version, key_args)
+
+            text = target.get(key)
+            if text is not None:
+                return _decode(text)
+
+            result = func(*args)
+            if isinstance(result, Uncached):
+                return result.result
+            if not _contains_no_update(result):
+                target.put(key, _encode(result))
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,72 @@
+# utils/outliers.py - Puntajes de atípicos (z global, z móvil, MAD y residual estacional)
+import numpy as np
+
+from utils.downsampling import lttb
+from utils.rolling import rolling_mean_std
+
+OUTLIER_METHODS = {
+    'zscore': 'Z-score global',
+    'rolling_z': 'Z-score móvil',
+    'mad': 'MAD robusto',
+    'seasonal': 'Residual estacional',
+}
+DEFAULT_OUTLIER_METHOD = 'zscore'
+# Escala del MAD para que el puntaje sea comparable a un z-score (Iglewicz-Hoaglin)
+MAD_SCALE = 0.6745
+
+
+def _robust_z(values):
+    """(x - mediana) / MAD escalado; NaN si el MAD es cero"""
+    ok = ~np.isnan(values)
+    if not ok.any():
+        return np.full(len(values), np.nan)
+    median = np.median(values[ok])
+    mad = np.median(np.abs(values[ok] - median))
+    if mad == 0:
+        return np.full(len(values), np.nan)
+    return MAD_SCALE * (values - median) / mad
+
+
+class OutlierScores:
+    """Puntajes de atípico de una serie temporal regular para todos los métodos
+
+    Se calculan juntos, una vez por (variable, ventana): z global, z móvil
+    sobre la ventana (media/desviación móviles terminadas en cada punto),
+    puntaje robusto MAD y MAD del residual tras quitar la climatología
+    mensual. Cambiar el umbral o el método solo compara arrays ya hechos;
+    baseline es la serie reducida con LTTB para graficar de fondo.
+    """
+
+    def __init__(self, times, values, window):
+        self.times = np.asarray(times, dtype='datetime64[ns]')
+        self.values = np.asarray(values, dtype=np.float64)
+        self.window = int(window)
+        values = self.values
+        ok = ~np.isnan(values)
+        self.valid_count = int(ok.sum())
+        self.baseline = lttb(self.times, values)
+
+        mean = values[ok].mean() if ok.any() else np.nan
+        std = values[ok].std(ddof=1) if ok.sum() > 1 else np.nan
+        rolling_mean, rolling_std = rolling_mean_std(
+            values, self.window, center=False, min_periods=max(self.window, 2))
+        # Desviación móvil = volatilidad de la ventana
+        self.volatility = rolling_std
+
+        months = self.times.astype('datetime64[M]').astype(np.int64) % 12
+        counts = np.bincount(months[ok], minlength=12)
+        sums = np.bincount(months[ok], weights=values[ok], minlength=12)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            climatology = sums / counts
+            self.scores = {
+                'zscore': (values - mean) / std,
+                'rolling_z': (values - rolling_mean) / rolling_std,
+                'mad': _robust_z(values),
+                'seasonal': _robust_z(values - climatology[months]),
+            }
+
+    def outlier_indices(self, method=DEFAULT_OUTLIER_METHOD, threshold=2.0):
+        """Posiciones con |puntaje| > threshold (los puntajes NaN no cuentan)"""
+        score = self.scores[method]
+        with np.errstate(invalid='ignore'):
+            return np.flatnonzero(np.abs(score) > threshold)
@@ -0,0 +1,68 @@
+# utils/rolling.py - Media y desviación móviles en O(n) sobre la serie ordenada
+import numpy as np
+
+# Ventanas disponibles en la pestaña de estacionariedad (horas)
+ROLLING_WINDOWS = {
+    24: '1 día',
+    168: '1 semana',
+    720: '30 días',
+    2160: '90 días',
+}
+DEFAULT_ROLLING_WINDOW = 168
+
+
+def hourly_grid(times, values):
+    """Ubicar la serie en una grilla horaria regular: (tiempos, valores con NaN)
+
+    Las horas sin dato quedan en NaN, así una ventana de k posiciones cubre
+    exactamente k horas aunque la serie tenga huecos.
+    """
+    times = np.asarray(times, dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+    if len(times) == 0:
+        return times, values
+    hour = np.timedelta64(1, 'h')
+    start = times.min().astype('datetime64[h]').astype('datetime64[ns]')
+    positions = ((times - start) // hour).astype(np.int64)
+    grid = np.full(int(positions.max()) + 1, np.nan)
+    grid[positions] = values
+    return start + np.arange(len(grid)) * hour, grid
+
+def rolling_mean_std(values, window, center=True, min_periods=None):
+    """Media y desviación estándar (ddof=1) móviles con sumas acumuladas
+
+    O(n) para cualquier ventana; ignora NaN como pandas rolling y deja NaN
+    donde la ventana tiene menos de min_periods valores (por defecto la
+    mitad de la ventana). Los valores se centran en su media antes de
+    acumular para no perder precisión en la varianza.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if min_periods is None:
+        min_periods = max(window // 2, 2)
+    ok = ~np.isnan(values)
+    if n == 0 or not ok.any():
+        return np.full(n, np.nan), np.full(n, np.nan)
+    x = np.where(ok, values - values[ok].mean(), 0.0)
+
+    # Ventana [end - window, end): termina en i + 1, o adelantada (window - 1) // 2
+    # posiciones si es centrada (mismo criterio que pandas rolling(center=True))
+    end = np.arange(1, n + 1) + ((window - 1) // 2 if center else 0)
+    start = np.clip(end - window, 0, n)
+    end = np.minimum(end, n)
+
+    def window_sums(a):
+        c = np.concatenate(([0.0], np.cumsum(a)))
+        return c[end] - c[start]
+
+    count = window_sums(ok.astype(np.float64))
+    total = window_sums(x)
+    total_sq = window_sums(x * x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        var = (total_sq - total * mean) / (count - 1)
+    var = np.maximum(var, 0.0)
+    enough = count >= min_periods
+    mean = np.where(enough, mean + values[ok].mean(), np.nan)
+    std = np.where(enough & (count > 1), np.sqrt(var), np.nan)
+    return mean, std
@@ -0,0 +1,179 @@
+# utils/snapshot.py - Caché local columnar de los DataFrames cargados
+import json
+import os
+import pickle
+import shutil
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join('data', 'snapshots'))
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', 'True').lower() == 'true'
+
+META_FILE = 'meta.json'
+FORMAT_VERSION = 1
+
+
+def _snapshot_path(name):
+    return os.path.join(SNAPSHOT_DIR, name)
+
+def _encode_column(series):
+    """Separar una columna en un array NumPy guardable y su metadata"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), {
+            'kind': 'category',
+            'categories': series.cat.categories.tolist(),
+            'ordered': bool(series.cat.ordered),
+        }
+    if series.dtype == object:
+        # Texto: códigos enteros + valores únicos (-1 = faltante)
+        codes, uniques = pd.factorize(series)
+        return codes, {'kind': 'object', 'categories': uniques.tolist()}
+    return series.to_numpy(), {'kind': 'array'}
+
+def _decode_column(values, info):
+    """Reconstruir una columna a partir del array guardado"""
+    if info['kind'] == 'category':
+        return pd.Categorical.from_codes(
+            values, categories=info['categories'], ordered=info['ordered']
+        )
+    if info['kind'] == 'object':
+        return pd.Categorical.from_codes(values, categories=info['categories']).astype(object)
+    return values
+
+@contextmanager
+def snapshot_lock(name):
+    """Bloqueo exclusivo entre procesos para construir/leer un snapshot"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, f"{name}.lock"), 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def try_process_lock(name):
+    """Tomar sin esperar un bloqueo exclusivo que dura lo que el proceso
+
+    Retorna el archivo abierto (mantenerlo referenciado: cerrarlo libera el
+    bloqueo) o None si otro proceso ya lo tiene. Si el proceso muere, el
+    sistema libera el bloqueo y otro proceso puede tomarlo.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    lock_file = open(os.path.join(SNAPSHOT_DIR, f"{name}.lock"), 'w')
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+    return lock_file
+
+def read_meta(name):
+    """Leer la metadata de un snapshot (None si no existe)"""
+    try:
+        with open(os.path.join(_snapshot_path(name), META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('format') != FORMAT_VERSION:
+        return None
+    return meta
+
+def save_snapshot(name, frames, fingerprint):
+    """Guardar DataFrames como un directorio de columnas .npy
+
+    frames: dict {nombre: DataFrame}. La escritura es atómica: se escribe en un
+    directorio temporal y se renombra al final.
+    """
+    target = _snapshot_path(name)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp = f"{target}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp)
+
+    try:
+        meta = {'format': FORMAT_VERSION, 'fingerprint': fingerprint, 'frames': {}}
+        for frame_name, df in frames.items():
+            os.makedirs(os.path.join(tmp, frame_name))
+            columns = []
+            for i, col in enumerate(df.columns):
+                values, info = _encode_column(df[col])
+                np.save(os.path.join(tmp, frame_name, f"{i}.npy"), values, allow_pickle=False)
+                info['name'] = col
+                columns.append(info)
+            meta['frames'][frame_name] = {'rows': len(df), 'columns': columns}
+
+        with open(os.path.join(tmp, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        old = None
+        if os.path.exists(target):
+            old = f"{target}.old-{uuid.uuid4().hex}"
+            os.rename(target, old)
+        os.rename(tmp, target)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+def load_snapshot(name, fingerprint=None, mmap=True):
+    """Cargar un snapshot si su huella coincide
+
+    Con fingerprint=None se acepta cualquier snapshot existente. Con mmap los
+    arrays numéricos se mapean en memoria (solo lectura) en lugar de copiarse.
+    Retorna dict {nombre: DataFrame} o None.
+    """
+    meta = read_meta(name)
+    if meta is None:
+        return None
+    if fingerprint is not None and meta.get('fingerprint') != fingerprint:
+        return None
+
+    path = _snapshot_path(name)
+    mmap_mode = 'r' if mmap else None
+    frames = {}
+    try:
+        for frame_name, frame_meta in meta['frames'].items():
+            data = {}
+            for i, info in enumerate(frame_meta['columns']):
+                values = np.load(os.path.join(path, frame_name, f"{i}.npy"),
+                                 mmap_mode=mmap_mode, allow_pickle=False)
+                data[info['name']] = _decode_column(values, info)
+            frames[frame_name] = pd.DataFrame(data, copy=False)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️  Snapshot {name} ilegible: {e}")
+        return None
+    return frames
+
+def _artifact_path(name, key):
+    return os.path.join(_snapshot_path(name), 'artifacts', f"{key}.pkl")
+
+def save_artifact(name, key, obj):
+    """Guardar un resultado derivado junto al snapshot (se borra con él)"""
+    path = _artifact_path(name, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+        with open(tmp, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️  No se pudo guardar {key}: {e}")
+
+def load_artifact(name, key):
+    """Leer un resultado derivado guardado junto al snapshot (None si no existe)"""
+    try:
+        with open(_artifact_path(name, key), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
@@ -0,0 +1,47 @@
+# utils/stationarity.py - Pruebas formales de estacionariedad (ADF y KPSS)
+import warnings
+
+import numpy as np
+from statsmodels.tsa.stattools import adfuller, kpss
+
+STATIONARITY_ALPHA = 0.05
+
+
+def _verdict(adf_p, kpss_p, alpha=STATIONARITY_ALPHA):
+    """Conclusión combinada: ADF (H0 raíz unitaria) y KPSS (H0 estacionaria)"""
+    adf_stationary = adf_p < alpha
+    kpss_stationary = kpss_p >= alpha
+    if adf_stationary and kpss_stationary:
+        return 'estacionaria'
+    if not adf_stationary and not kpss_stationary:
+        return 'no estacionaria'
+    if adf_stationary:
+        return 'estacionaria en diferencias'
+    return 'estacionaria en tendencia'
+
+def stationarity_tests(col, values):
+    """ADF (autolag AIC) y KPSS (nivel) sobre una serie sin NaN
+
+    Función de módulo para poder ejecutarse en un pool de procesos. Nunca
+    lanza: ante un error retorna {'variable', 'error'}.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 20:
+        return {'variable': col, 'error': 'insuficientes datos'}
+    try:
+        adf_stat, adf_p, adf_lags, nobs, adf_crit, _ = adfuller(values, autolag='AIC')
+        with warnings.catch_warnings():
+            # KPSS acota el p-valor a [0.01, 0.1] y lo avisa con un warning
+            warnings.simplefilter('ignore')
+            kpss_stat, kpss_p, kpss_lags, kpss_crit = kpss(values, regression='c', nlags='auto')
+    except Exception as e:
+        return {'variable': col, 'error': str(e)}
+    return {
+        'variable': col,
+        'nobs': int(nobs),
+        'adf': {'stat': float(adf_stat), 'pvalue': float(adf_p), 'lags': int(adf_lags),
+                'critical': {k: float(v) for k, v in adf_crit.items()}},
+        'kpss': {'stat': float(kpss_stat), 'pvalue': float(kpss_p), 'lags': int(kpss_lags),
+                 'critical': {k: float(v) for k, v in kpss_crit.items()}},
+        'verdict': _verdict(adf_p, kpss_p),
+    }